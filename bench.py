@@ -0,0 +1,1082 @@
+#!/usr/bin/env python3
+"""
+MedEvac-Gemma Benchmarks
+Micro-benchmarks for the latency-critical stages of the pipeline
+
+Usage:
+  python3 bench.py handoff [--seconds 15] [--model ASR_MODEL_PATH]
+  python3 bench.py ring [--seconds 20]
+  python3 bench.py vad [--model ASR_MODEL_PATH] [--lead 3] [--tail 5]
+  python3 bench.py structured [--server URL] [--eval full_eval.csv] [--limit N]
+  python3 bench.py lexicon [--eval full_eval.csv]
+  python3 bench.py mist [--eval full_eval.csv]
+  python3 bench.py beam --model ASR_MODEL_PATH [--eval full_eval.csv] [--width 4 8 16]
+  python3 bench.py tts [--backend espeak]
+  python3 bench.py bargein [--runs 20]
+  python3 bench.py gateway [--url http://HOST:8090] [--clients 8] [--reports 4] [--ws]
+  python3 bench.py asrbatch --model ASR_MODEL_PATH [--clips 32] [--batch 1 4 8] [--window 5]
+  python3 bench.py onnx --model ASR_MODEL_PATH --onnx ONNX_DIR [--clips 16]
+  python3 bench.py startup --model ASR_MODEL_PATH [--runs 3] [--llm-boot 0] [--drop-caches]
+  python3 bench.py longform --model ASR_MODEL_PATH [--minutes 2 10 30]
+"""
+
+import argparse
+import collections
+import csv
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from medevac.capture import AudioBuffer, RingBuffer, SegmentRecorder
+from medevac.config import (ASR_BATCH_WINDOW_MS, GATEWAY_QUEUE, LEXICON_CORRECTION, SAMPLE_RATE,
+                            SERVER_URL)
+
+# =========================
+# CONFIGURATION
+# =========================
+BLOCK = 512  # Frames per sounddevice callback
+REPEATS = 20
+CANCEL_TARGET_MS = 100  # Barge-in must silence the answer and free the slot within this
+SAMPLE_RESPONSE = """ASSESSMENT:
+Casualty with GSW to left thigh, bleeding controlled by tourniquet, in compensated shock.
+
+ACTION:
+1. Apply tourniquet high and tight.
+2. Pack the wound with hemostatic gauze.
+3. Monitor distal perfusion.
+4. Reassess in 2 hours.
+
+WARNING:
+Watch for signs of hemorrhagic shock."""
+
+# =========================
+# UTILITIES
+# =========================
+
+def timed(fn, repeats=REPEATS):
+    """Median wall time of fn() in milliseconds"""
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(times)
+
+def fake_callbacks(seconds):
+    """Blocks shaped like sounddevice InputStream callback data"""
+    rng = np.random.default_rng(0)
+    audio = rng.standard_normal(int(seconds * SAMPLE_RATE)).astype(np.float32) * 0.1
+    return [audio[i:i + BLOCK].reshape(-1, 1) for i in range(0, len(audio), BLOCK)]
+
+# =========================
+# CAPTURE → ASR HANDOFF
+# =========================
+
+def bench_handoff(args):
+    """Old list + temp WAV + ffmpeg path vs in-memory AudioBuffer view"""
+    import soundfile as sf
+
+    blocks = fake_callbacks(args.seconds)
+
+    def old_capture():
+        chunks = [b.copy() for b in blocks]
+        audio = np.concatenate(chunks, axis=0)
+        temp_file = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
+        sf.write(temp_file.name, audio, SAMPLE_RATE)
+        temp_file.close()
+        return temp_file.name
+
+    def old_path():
+        path = old_capture()
+        try:
+            if shutil.which("ffmpeg"):
+                from transformers.pipelines.audio_utils import ffmpeg_read
+                with open(path, "rb") as f:
+                    ffmpeg_read(f.read(), SAMPLE_RATE)
+        finally:
+            os.unlink(path)
+
+    buffer = AudioBuffer(SAMPLE_RATE)
+
+    def new_path():
+        buffer.clear()
+        for b in blocks:
+            buffer.append(b)
+        return buffer.asr_input()
+
+    print(f"\nClip: {args.seconds:.0f}s in {len(blocks)} callbacks of {BLOCK} frames")
+    if not shutil.which("ffmpeg"):
+        print("⚠ ffmpeg not found, old path timed without the decode subprocess")
+    old_ms = timed(old_path)
+    new_ms = timed(new_path)
+    print(f"  temp WAV + ffmpeg : {old_ms:8.2f} ms")
+    print(f"  in-memory view    : {new_ms:8.2f} ms")
+
+    if args.model:
+        from transformers import pipeline
+        asr = pipeline("automatic-speech-recognition", model=args.model,
+                       device=-1, trust_remote_code=True)
+
+        def old_asr():
+            path = old_capture()
+            try:
+                asr(path, chunk_length_s=20, stride_length_s=2)
+            finally:
+                os.unlink(path)
+
+        def new_asr():
+            asr(new_path(), chunk_length_s=20, stride_length_s=2)
+
+        new_asr()  # warm-up
+        print(f"  clip-to-text (file)   : {timed(old_asr, 5):8.2f} ms")
+        print(f"  clip-to-text (memory) : {timed(new_asr, 5):8.2f} ms")
+
+# =========================
+# RING BUFFER CAPTURE
+# =========================
+
+def bench_ring(args):
+    """Audio-callback and key-event cost of the ring buffer, and segment read-out"""
+    from medevac.metrics import percentiles
+
+    blocks = fake_callbacks(args.seconds)
+    ring = RingBuffer(SAMPLE_RATE)
+    recorder = SegmentRecorder(ring)
+    buffer = AudioBuffer(SAMPLE_RATE)
+
+    def per_call(fn):
+        times = []
+        for _ in range(REPEATS):
+            for b in blocks:
+                t0 = time.perf_counter()
+                fn(b)
+                times.append((time.perf_counter() - t0) * 1e6)
+            buffer.clear()
+        return percentiles(times, (50, 99))
+
+    keys = []
+    for _ in range(REPEATS):
+        recorder.begin()
+        for b in blocks:
+            ring.write(b)
+        t0 = time.perf_counter()
+        segment = recorder.end()
+        keys.append((time.perf_counter() - t0) * 1e6)
+        recorder.jobs.get()
+    read_ms = timed(lambda: ring.read(segment.start, segment.end))
+
+    ring_us, buffer_us = per_call(ring.write), per_call(buffer.append)
+    key = percentiles(keys, (50, 99))
+    print(f"\nCallback blocks of {BLOCK} frames, {args.seconds:.0f}s segments")
+    print(f"  ring write      : p50 {ring_us['p50']:6.1f} µs  p99 {ring_us['p99']:6.1f} µs")
+    print(f"  buffer append   : p50 {buffer_us['p50']:6.1f} µs  p99 {buffer_us['p99']:6.1f} µs")
+    print(f"  key up (queue)  : p50 {key['p50']:6.1f} µs  p99 {key['p99']:6.1f} µs")
+    print(f"  segment read-out: {read_ms:6.2f} ms (worker thread)")
+
+# =========================
+# VAD
+# =========================
+
+def held_key_clip(audio, lead_s, tail_s, seed=0):
+    """Pad a clip with its own background noise, like a key held before and after speaking"""
+    from medevac.vad import frame_features, frames
+
+    energy_db, _ = frame_features(audio)
+    quiet = frames(audio)[energy_db <= np.percentile(energy_db, 10)]
+    rng = np.random.default_rng(seed)
+
+    def noise(seconds):
+        return quiet[rng.integers(0, len(quiet), int(seconds / 0.02))].reshape(-1)
+
+    return np.concatenate([noise(lead_s), audio[:len(audio) // quiet.shape[1] * quiet.shape[1]],
+                           noise(tail_s)])
+
+def bench_vad(args):
+    """Audio removed by VAD and ASR time with / without it on the demo clips"""
+    from medevac.asr import load_asr, load_audio, transcribe
+    from medevac.vad import trim_silence
+
+    asr = load_asr(args.model) if args.model else None
+    for path in args.wavs:
+        clip = held_key_clip(load_audio(path), args.lead, args.tail)
+        trimmed, removed = trim_silence(clip)
+        vad_ms = timed(lambda: trim_silence(clip), 10)
+        print(f"\n{path} + {args.lead:.0f}s/{args.tail:.0f}s of background noise: "
+              f"{len(clip) / SAMPLE_RATE:.1f}s → {len(trimmed) / SAMPLE_RATE:.1f}s "
+              f"({removed:.1f}s removed, VAD {vad_ms:.1f} ms)")
+        if asr is not None:
+            def run(audio):
+                return lambda: transcribe(asr, {"array": audio, "sampling_rate": SAMPLE_RATE})
+            run(clip)()  # warm-up
+            print(f"  ASR untrimmed : {timed(run(clip), 3):8.0f} ms")
+            print(f"  ASR trimmed   : {timed(run(trimmed), 3):8.0f} ms")
+
+# =========================
+# STRUCTURED OUTPUT
+# =========================
+
+def bench_structured(args):
+    """Free-form vs grammar-constrained generation on the eval transcripts"""
+    import requests
+
+    from medevac.asr import clean_transcription
+    from medevac.llm import build_prompt, completion_payload
+    from medevac.metrics import percentiles
+    from medevac.response import parse_response
+
+    with open(args.eval, newline="") as f:
+        transcripts = [clean_transcription(r[args.column]) for r in csv.DictReader(f)]
+    transcripts = transcripts[:args.limit]
+
+    session = requests.Session()
+    modes = {"free-form": False, "grammar": True}
+    results = {mode: {"tokens": [], "latency": [], "parsed": 0} for mode in modes}
+
+    # Alternate modes per transcript so both see the same cache and load
+    for transcript in transcripts:
+        for mode, structured in modes.items():
+            payload = completion_payload(build_prompt(transcript), structured=structured)
+            t0 = time.perf_counter()
+            response = session.post(f"{args.server}/completion", json=payload, timeout=60)
+            latency = time.perf_counter() - t0
+            response.raise_for_status()
+            body = response.json()
+            result = results[mode]
+            result["tokens"].append(body.get("tokens_predicted")
+                                    or (body.get("timings") or {}).get("predicted_n", 0))
+            result["latency"].append(latency)
+            try:
+                parse_response(body.get("content", ""))
+                result["parsed"] += 1
+            except ValueError:
+                pass
+
+    print(f"\n{len(transcripts)} transcripts ({args.column}) on {args.server}")
+    print(f"  {'mode':<10} {'tokens p50':>10} {'latency p50':>12} {'p95':>7} {'parsed':>8}")
+    for mode, result in results.items():
+        tokens = statistics.median(result["tokens"])
+        latency = percentiles(result["latency"])
+        print(f"  {mode:<10} {tokens:10.0f} {latency['p50']:11.2f}s {latency['p95']:6.2f}s "
+              f"{result['parsed'] / len(transcripts):8.0%}")
+
+# =========================
+# LEXICON CORRECTION
+# =========================
+
+def bench_lexicon(args):
+    """Correction time per transcript and WER before/after on the eval transcripts"""
+    from medevac.asr import clean_transcription
+    from medevac.lexicon import Lexicon
+    from medevac.metrics import percentiles, wer
+
+    with open(args.eval, newline="") as f:
+        rows = list(csv.DictReader(f))
+
+    t0 = time.perf_counter()
+    lexicon = Lexicon()
+    print(f"\nIndex built in {(time.perf_counter() - t0) * 1000:.1f} ms "
+          f"({len(lexicon.canonical)} words, {len(lexicon.index)} deletion keys)")
+
+    # Cold: word cache emptied before every transcript; warm: repeated words cached
+    print(f"  {'column':<14} {'µs cold p50':>11} {'p99':>6} {'µs warm p50':>11} "
+          f"{'WER before':>10} {'after':>7} {'changed':>8}")
+    for column in args.columns:
+        transcripts = [clean_transcription(r[column]) for r in rows]
+        cold, warm = [], []
+        for transcript in transcripts:
+            lexicon.correct_word.cache_clear()
+            t0 = time.perf_counter()
+            lexicon.correct(transcript)
+            cold.append(time.perf_counter() - t0)
+        for _ in range(REPEATS):
+            for transcript in transcripts:
+                t0 = time.perf_counter()
+                lexicon.correct(transcript)
+                warm.append(time.perf_counter() - t0)
+
+        corrected = [lexicon.correct(t) for t in transcripts]
+        before = statistics.mean(wer(r["gt"], t) for r, t in zip(rows, transcripts))
+        after = statistics.mean(wer(r["gt"], t) for r, t in zip(rows, corrected))
+        changed = sum(t != c for t, c in zip(transcripts, corrected))
+        cold_us = {k: v * 1e6 for k, v in percentiles(cold, (50, 99)).items()}
+        warm_us = statistics.median(warm) * 1e6
+        print(f"  {column:<14} {cold_us['p50']:11.0f} {cold_us['p99']:6.0f} {warm_us:11.0f} "
+              f"{before:10.3f} {after:7.3f} {changed:5d}/{len(rows)}")
+
+# =========================
+# MIST EXTRACTION
+# =========================
+
+def bench_mist(args):
+    """Extraction time, field coverage, agreement with the ground truth and prompt size"""
+    from medevac.asr import clean_transcription
+    from medevac.lexicon import correct_transcript
+    from medevac.llm import build_prompt
+    from medevac.metrics import percentiles
+    from medevac.mist import extract_mist
+
+    with open(args.eval, newline="") as f:
+        rows = list(csv.DictReader(f))
+    truth = [extract_mist(clean_transcription(r["gt"])) for r in rows]
+    vitals = ("spo2", "hr", "rr", "bp")
+
+    print(f"\n{len(rows)} transcripts; vitals and triage compared with the gt column's record")
+    print(f"  {'column':<14} {'µs p50':>7} {'p99':>6} " + " ".join(f"{v:>5}" for v in vitals)
+          + f" {'agree':>6} {'triage':>7} {'prompt chars':>12} {'compact':>8}")
+    for column in args.columns:
+        transcripts = [correct_transcript(clean_transcription(r[column])) for r in rows]
+        times = []
+        for _ in range(REPEATS):
+            for transcript in transcripts:
+                t0 = time.perf_counter()
+                extract_mist(transcript)
+                times.append(time.perf_counter() - t0)
+        records = [extract_mist(t) for t in transcripts]
+
+        found = [sum(getattr(r, v) is not None for r in records) for v in vitals]
+        pairs = [(getattr(r, v), getattr(t, v)) for r, t in zip(records, truth) for v in vitals
+                 if getattr(t, v) is not None]
+        agree = sum(got == want for got, want in pairs) / max(len(pairs), 1)
+        same_triage = sum(r.triage == t.triage for r, t in zip(records, truth)) / len(rows)
+        full = statistics.mean(len(build_prompt(t)) for t in transcripts)
+        compact = statistics.mean(len(build_prompt(r.compact() if not r.empty else t))
+                                  for r, t in zip(records, transcripts))
+        us = {k: v * 1e6 for k, v in percentiles(times, (50, 99)).items()}
+        print(f"  {column:<14} {us['p50']:7.0f} {us['p99']:6.0f} "
+              + " ".join(f"{n:5d}" for n in found)
+              + f" {agree:6.0%} {same_triage:7.0%} {full:12.0f} {compact:8.0f}")
+
+    categories = collections.Counter(t.triage for t in truth)
+    print("  gt triage: " + ", ".join(f"{k or 'undetermined'} {n}" for k, n in
+                                      categories.most_common()))
+    print("  (about 4 prompt chars per token)")
+
+# =========================
+# CTC BEAM SEARCH
+# =========================
+
+def bench_beam(args):
+    """Greedy vs (biased) prefix beam search: decode time and WER on the eval audio"""
+    from medevac.asr import clean_transcription, decode_ids, load_asr, load_audio
+    from medevac.beam import beam_decode, chunk_logits
+    from medevac.eval_runner import read_manifest
+    from medevac.lexicon import correct_transcript
+    from medevac.metrics import percentiles, wer
+
+    rows = [r for r in read_manifest(args.eval)[:args.limit] if os.path.exists(r["path"])]
+    if not rows:
+        print(f"❌ None of the recordings in {args.eval} were found")
+        return
+    asr = load_asr(args.model)
+    # The acoustic model runs once per recording; only decoding is timed
+    logits = [chunk_logits(asr, load_audio(r["path"])) for r in rows]
+
+    decoders = {"greedy": lambda l: decode_ids(asr, l.argmax(axis=-1))}
+    for width in args.width:
+        decoders[f"beam {width}"] = lambda l, w=width: beam_decode(asr, l, w, biased=False)
+        decoders[f"beam {width} + bias"] = lambda l, w=width: beam_decode(asr, l, w)
+
+    frames = statistics.median(len(l) for l in logits)
+    print(f"\n{len(rows)} recordings (median {frames:.0f} CTC frames)")
+    print(f"  {'decoder':<16} {'ms p50':>7} {'p95':>7} {'WER':>7} {'+ lexicon':>10}")
+    for name, decode in decoders.items():
+        times, texts = [], []
+        for l in logits:
+            t0 = time.perf_counter()
+            texts.append(clean_transcription(decode(l)))
+            times.append((time.perf_counter() - t0) * 1000)
+        stats = percentiles(times, (50, 95))
+        raw = statistics.mean(wer(r["gt"], t) for r, t in zip(rows, texts))
+        fixed = statistics.mean(wer(r["gt"], correct_transcript(t)) for r, t in zip(rows, texts))
+        print(f"  {name:<16} {stats['p50']:7.1f} {stats['p95']:7.1f} {raw:7.3f} {fixed:10.3f}")
+
+# =========================
+# TTS
+# =========================
+
+class RealtimeOutput:
+    """Stand-in speaker: 'plays' a clip by sleeping for its duration, block by block"""
+
+    def __init__(self):
+        from medevac.tts import PLAY_BLOCK_S
+
+        self.block = PLAY_BLOCK_S
+        self.first = None
+        self.playing = threading.Event()
+
+    def play(self, samples, sample_rate, stop=None):
+        if self.first is None:
+            self.first = time.perf_counter()
+        self.playing.set()
+        end = time.perf_counter() + len(samples) / sample_rate
+        while (remaining := end - time.perf_counter()) > 0:
+            if stop is not None and stop.is_set():
+                break
+            time.sleep(min(self.block, remaining))
+        self.playing.clear()
+
+    def close(self):
+        pass
+
+def bench_tts(args):
+    """Blocking synthesize-then-play vs pipelined speaker, cold and warm cache"""
+    from medevac.tts import AudioCache, SentenceChunker, Speaker, make_backend
+
+    backend, namespace = make_backend(args.backend)
+    chunker = SentenceChunker()
+    chunks = chunker.feed(SAMPLE_RESPONSE) + chunker.flush()
+
+    def blocking():
+        output = RealtimeOutput()
+        t0 = time.perf_counter()
+        for chunk in chunks:
+            output.play(backend.synthesize(chunk), backend.sample_rate)
+        return output.first - t0, time.perf_counter() - t0
+
+    def pipelined(cache):
+        output = RealtimeOutput()
+        speaker = Speaker(backend, output, cache)
+        t0 = time.perf_counter()
+        for chunk in chunks:
+            speaker(chunk)
+        speaker.wait()
+        total = time.perf_counter() - t0
+        speaker.close()
+        return output.first - t0, total
+
+    cache_dir = tempfile.mkdtemp(prefix="tts_cache_")
+    try:
+        cache = AudioCache(cache_dir, namespace or args.backend)
+        results = {"blocking": blocking(),
+                   "pipelined, cold cache": pipelined(cache)}
+        results["pipelined, warm cache"] = pipelined(cache)
+    finally:
+        shutil.rmtree(cache_dir)
+
+    print(f"\n{len(chunks)} chunks, {args.backend} backend, real-time playback")
+    print(f"  {'mode':<24} {'first audio':>11} {'total':>8}")
+    for mode, (first, total) in results.items():
+        print(f"  {mode:<24} {first * 1000:9.0f}ms {total:7.2f}s")
+
+# =========================
+# BARGE-IN
+# =========================
+
+def wait_until(condition, timeout=5.0):
+    """Poll until condition() is true; returns the time it became true, or None"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return time.time()
+        time.sleep(0.001)
+    return None
+
+def bench_bargein(args):
+    """Time from cancel() to LLM stopped, server slot free and audio silent"""
+    from medevac.metrics import percentiles
+    from medevac.llm import LLMClient
+    from medevac.pipeline import Pipeline, mic_report
+    from medevac.stub_server import StubServer
+    from medevac.tts import Speaker, make_backend
+
+    # One slot, so a slot still held by the cancelled request would block the next report
+    stub = StubServer(slots=1, token_delay=args.token_delay).start()
+    output = RealtimeOutput()
+    speaker = Speaker(make_backend("stub")[0], output)
+    transcripts = iter(range(1, args.runs + 1))
+    asr = lambda audio, **kwargs: {"text": f"Casualty {next(transcripts)} GSW left thigh"}
+    pipeline = Pipeline(asr, LLMClient([stub.url]), speak_fn=speaker,
+                        vad=False, lexicon=False)
+    silence = {"array": np.zeros(SAMPLE_RATE, dtype=np.float32), "sampling_rate": SAMPLE_RATE}
+
+    results = {"LLM stopped": [], "slot free": [], "audio stopped": []}
+    for _ in range(args.runs):
+        report = pipeline.submit(mic_report(audio=silence))
+        # Barge in while the answer is being spoken and still generated
+        if wait_until(output.playing.is_set) is None:
+            raise RuntimeError("no speech started")
+        speaker.cancel_latency = None
+        pipeline.cancel()
+        t_slot = wait_until(lambda: not stub.slots()[0]["is_processing"])
+        wait_until(lambda: speaker.cancel_latency is not None)
+        report.wait()
+        results["LLM stopped"].append(report.timings.get("cancel_llm"))
+        results["slot free"].append(t_slot and t_slot - report.cancelled)
+        results["audio stopped"].append(speaker.cancel_latency)
+
+    pipeline.close()
+    speaker.close()
+    stub.stop()
+
+    print(f"\n{args.runs} barge-ins, stub server at {args.token_delay * 1000:.0f} ms/token, "
+          f"target {CANCEL_TARGET_MS} ms")
+    print(f"  {'':<14} {'p50':>7} {'p99':>7} {'max':>7}")
+    for name, values in results.items():
+        missed = sum(v is None for v in values)
+        values = [v * 1000 for v in values if v is not None]
+        stats = percentiles(values)
+        worst = max(values, default=float("nan"))
+        verdict = "✓" if values and not missed and worst < CANCEL_TARGET_MS else "❌"
+        note = f"  ({missed} never stopped)" if missed else ""
+        print(f"  {name:<14} {stats['p50']:6.1f}ms {stats['p99']:6.1f}ms {worst:6.1f}ms "
+              f"{verdict}{note}")
+
+# =========================
+# GATEWAY LOAD
+# =========================
+
+class LoadClient:
+    """One radio: sends its reports one after another, retrying when refused"""
+
+    def __init__(self, url, name, wav, reports, websocket=False):
+        self.url = url
+        self.name = name
+        self.wav = wav
+        self.reports = reports
+        self.websocket = websocket
+        self.results = []  # (latency, first sentence, queue wait, error)
+        self.rejected = 0
+
+    def run(self):
+        ws = None
+        if self.websocket:
+            from medevac.gateway import connect_websocket
+
+            ws = connect_websocket(self.url.replace("http", "ws", 1) + "/v1/stream",
+                                   {"X-Client-Id": self.name})
+        for _ in range(self.reports):
+            while True:
+                t0 = time.perf_counter()
+                events = self._ws_report(ws) if ws else self._http_report()
+                retry = self._record(t0, events)
+                if retry is None:
+                    break
+                self.rejected += 1
+                time.sleep(retry)
+        if ws:
+            ws.close()
+            ws.sock.close()
+
+    def _http_report(self):
+        import requests
+
+        response = requests.post(f"{self.url}/v1/report", data=self.wav, stream=True, timeout=120,
+                                 headers={"Content-Type": "audio/wav", "X-Client-Id": self.name})
+        if response.status_code != 200:
+            yield dict(response.json(), event="rejected", status=response.status_code)
+            return
+        for line in response.iter_lines():
+            if line:
+                yield json.loads(line)
+
+    def _ws_report(self, ws):
+        from medevac.gateway import decode_audio
+
+        pcm = (decode_audio(self.wav, "audio/wav") * 32767).astype("<i2").tobytes()
+        step = SAMPLE_RATE // 10 * 2  # 100 ms frames, as a radio would stream them
+        for i in range(0, len(pcm), step):
+            ws.send(pcm[i:i + step])
+        ws.send_json({"type": "end"})
+        while True:
+            opcode, data = ws.recv()
+            if opcode == ws.CLOSE:
+                yield {"event": "error", "error": "connection closed"}
+                return
+            yield json.loads(data)
+
+    def _record(self, t0, events):
+        """Consume one report's events; returns seconds to wait before a retry, or None"""
+        first = None
+        for event in events:
+            kind = event["event"]
+            if kind == "rejected":
+                return event.get("retry_after") or 1.0
+            if kind == "sentence" and first is None:
+                first = time.perf_counter() - t0
+            if kind in ("result", "error"):
+                timings = event.get("timings", {})
+                queue_wait = timings.get("queue", 0) + timings.get("llm_queue", 0)
+                self.results.append((time.perf_counter() - t0, first, queue_wait,
+                                     event.get("error")))
+                return None
+        self.results.append((time.perf_counter() - t0, first, None, "no result"))
+        return None
+
+def run_load(url, args, wav):
+    """Run every client against the gateway; returns (clients, seconds)"""
+    clients = [LoadClient(url, f"medic-{i}", wav, args.reports, args.ws)
+               for i in range(args.clients)]
+    threads = [threading.Thread(target=c.run) for c in clients]
+    t0 = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return clients, time.perf_counter() - t0
+
+def print_load(label, clients, seconds):
+    from medevac.metrics import percentiles
+
+    results = [r for c in clients for r in c.results]
+    ok = [r for r in results if r[3] is None]
+    errors = collections.Counter(r[3] for r in results if r[3] is not None)
+    latency = percentiles([r[0] for r in ok])
+    first = percentiles([r[1] for r in ok if r[1] is not None])
+    queue_wait = percentiles([r[2] for r in ok if r[2] is not None])
+    print(f"\n{label}")
+    print(f"  {len(ok)}/{len(results)} answered in {seconds:.1f}s "
+          f"({len(ok) / seconds:.2f} reports/s), {sum(c.rejected for c in clients)} refused "
+          f"and retried")
+    for error, n in errors.most_common():
+        print(f"  ❌ {n} × {error[:70]}")
+    if ok:
+        print(f"  {'':<16} {'p50':>7} {'p95':>7} {'p99':>7}")
+        for name, stats in (("latency", latency), ("first sentence", first),
+                            ("queue wait", queue_wait)):
+            if stats["p50"] is not None:
+                print(f"  {name:<16} {stats['p50']:6.2f}s {stats['p95']:6.2f}s "
+                      f"{stats['p99']:6.2f}s")
+
+def bench_gateway(args):
+    """Concurrent clients against the gateway; in-process with a stub llama-server by default"""
+    with open(args.wav, "rb") as f:
+        wav = f.read()
+    if args.url:
+        clients, seconds = run_load(args.url.rstrip("/"), args, wav)
+        print_load(f"{args.clients} clients × {args.reports} reports on {args.url}",
+                   clients, seconds)
+        return
+
+    import itertools
+
+    from medevac.gateway import Gateway, GatewayServer
+    from medevac.llm import LLMClient
+    from medevac.stub_server import StubServer
+
+    # Admission sized to the server's slots vs one LLM request per report, all at once
+    modes = {"admission control": (None, args.queue),
+             "no admission control": (args.clients * args.reports, args.clients * args.reports)}
+    for label, (llm_workers, max_queued) in modes.items():
+        stub = StubServer(slots=args.slots, token_delay=args.token_delay).start()
+        ids = itertools.count(1)
+        asr = lambda audio, **kwargs: {"text": f"Casualty {next(ids)} GSW left thigh HR 122"}
+        llm = LLMClient([stub.url])
+        llm.healthy()
+        gateway = Gateway(asr, llm, llm_workers=llm_workers, max_queued=max_queued, vad=False,
+                          batch=1)
+        server = GatewayServer(gateway, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        clients, seconds = run_load(server.url, args, wav)
+        print_load(f"{label}: {args.clients} clients × {args.reports} reports, "
+                   f"{'WebSocket' if args.ws else 'HTTP'}, stub server with {args.slots} slots",
+                   clients, seconds)
+
+        server.shutdown()
+        server.server_close()
+        gateway.close()
+        stub.stop()
+
+# =========================
+# ASR MICRO-BATCHING
+# =========================
+
+def report_clips(wavs, n, seed=0):
+    """n report-length clips (2-12 s) cut from the demo recordings"""
+    from medevac.asr import load_audio
+
+    audio = np.concatenate([load_audio(path) for path in wavs])
+    rng = np.random.default_rng(seed)
+    clips = []
+    for _ in range(n):
+        length = int(rng.uniform(2, 12) * SAMPLE_RATE)
+        start = int(rng.integers(0, len(audio) - length))
+        clips.append(audio[start:start + length])
+    return clips
+
+def bench_asrbatch(args):
+    """A burst of clips one at a time vs micro-batched, throughput and latency"""
+    import torch
+
+    from medevac.asr import load_asr, transcribe, warm_asr
+    from medevac.batching import BatchTranscriber
+    from medevac.metrics import percentiles
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    asr = load_asr(args.model)
+    warm_asr(asr)
+    clips = report_clips(args.wavs, args.clips)
+    audio_s = sum(len(c) for c in clips) / SAMPLE_RATE
+
+    # Baseline: the pipeline on each clip in turn, all clips arriving at t0
+    t0 = time.perf_counter()
+    reference, latency = [], []
+    for clip in clips:
+        reference.append(transcribe(asr, {"array": clip, "sampling_rate": SAMPLE_RATE}))
+        latency.append(time.perf_counter() - t0)
+    results = {"one at a time": (time.perf_counter() - t0, latency, len(clips), "")}
+
+    for batch in args.batch:
+        batcher = BatchTranscriber(asr, max_batch=batch, window_ms=args.window)
+        batcher.transcribe(clips[0])  # warm-up at this batch shape
+        batcher.batches = batcher.clips = batcher.padding = batcher.samples = 0
+        t0 = time.perf_counter()
+        futures = [batcher.submit(clip) for clip in clips]
+        latency, texts = [], []
+        for future in futures:
+            texts.append(future.result())
+            latency.append(time.perf_counter() - t0)
+        wall = max(latency)
+        # A lone clip pays the wait window with nothing to share it with
+        lone = timed(lambda: batcher.transcribe(clips[0]), 5)
+        batcher.close()
+        same = sum(t == r for t, r in zip(texts, reference))
+        results[f"batch {batch}"] = (wall, latency, same,
+                                     f"{batcher.clips / max(batcher.batches, 1):.1f} / "
+                                     f"{lone:.0f}ms")
+
+    print(f"\n{len(clips)} clips, {audio_s:.0f}s of audio, all arriving at once; "
+          f"{torch.get_num_threads()} torch threads, {args.window} ms window")
+    print(f"  {'mode':<14} {'wall':>7} {'audio s/s':>10} {'p50':>7} {'p95':>7} "
+          f"{'same text':>10}  mean batch / lone clip")
+    for mode, (wall, latency, same, note) in results.items():
+        stats = percentiles(latency)
+        print(f"  {mode:<14} {wall:6.2f}s {audio_s / wall:10.1f} {stats['p50']:6.2f}s "
+              f"{stats['p95']:6.2f}s {same:>5}/{len(clips):<4}  {note}")
+
+# =========================
+# ONNX RUNTIME BACKEND
+# =========================
+
+def onnx_child(args):
+    """One backend in a fresh process: load, first transcript, then per-clip latency"""
+    from medevac.metrics import peak_rss_mb
+
+    clips = report_clips(args.wavs, args.clips)
+    t0 = time.time()
+    from medevac.asr import load_asr, transcribe
+
+    if args.child == "torch":
+        asr = load_asr(args.model, backend="torch")
+    else:
+        from medevac.onnx_asr import OnnxASR
+        asr = OnnxASR(args.onnx, quantized=args.child == "onnx int8")
+    loaded = time.time()
+    texts = [transcribe(asr, {"array": clips[0], "sampling_rate": SAMPLE_RATE})]
+    ready = time.time()
+
+    latency = []
+    for clip in clips[1:]:
+        t1 = time.perf_counter()
+        texts.append(transcribe(asr, {"array": clip, "sampling_rate": SAMPLE_RATE}))
+        latency.append(time.perf_counter() - t1)
+    print(json.dumps({"start": t0, "loaded": loaded, "ready": ready, "latency": latency,
+                      "texts": texts, "rss": peak_rss_mb(), "torch": "torch" in sys.modules}))
+
+def bench_onnx(args):
+    """torch pipeline vs ONNX Runtime fp32/int8: cold start, latency, peak RSS, parity"""
+    from medevac.metrics import percentiles
+
+    results = {}
+    for backend in ("torch", "onnx fp32", "onnx int8"):
+        cmd = [sys.executable, os.path.abspath(__file__), "onnx", "--child", backend,
+               "--model", args.model, "--onnx", args.onnx, "--clips", str(args.clips), *args.wavs]
+        spawned = time.time()
+        out = subprocess.run(cmd, stdout=subprocess.PIPE, text=True, check=True).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        result["spawned"] = spawned
+        results[backend] = result
+
+    audio_s = sum(len(c) for c in report_clips(args.wavs, args.clips)[1:]) / SAMPLE_RATE
+    reference = results["torch"]["texts"]
+    print(f"\n{args.clips} report clips ({audio_s:.0f}s timed after the first), one process per backend")
+    print(f"  {'backend':<10} {'to ready':>9} {'import+load':>12} {'first':>7} {'p50':>7} "
+          f"{'p95':>7} {'audio s/s':>10} {'peak RSS':>9} {'same text':>10}")
+    for backend, r in results.items():
+        stats = percentiles(r["latency"])
+        same = sum(t == ref for t, ref in zip(r["texts"], reference))
+        torch_note = "" if r["torch"] else "  (no torch)"
+        print(f"  {backend:<10} {r['ready'] - r['spawned']:8.2f}s {r['loaded'] - r['start']:11.2f}s "
+              f"{r['ready'] - r['loaded']:6.2f}s {stats['p50'] * 1000:5.0f}ms "
+              f"{stats['p95'] * 1000:5.0f}ms {audio_s / sum(r['latency']):10.1f} "
+              f"{r['rss']:7.0f}MB {same:>5}/{len(reference):<4}{torch_note}")
+
+# =========================
+# STARTUP
+# =========================
+
+STARTUP_MODES = {
+    # Old behaviour: internet probe, then each step after the previous one
+    "sequential": {"parallel": False, "check_net": True},
+    "parallel": {"parallel": True, "check_net": False},
+}
+
+def startup_child(args):
+    """initialize_system() in a fresh process, then one report's worth of ASR"""
+    from medevac.asr import transcribe
+    from medevac.llm import LLMClient
+    from medevac.pipeline import initialize_system
+    from medevac.startup import Startup
+
+    mode = STARTUP_MODES[args.child]
+    startup = Startup(parallel=mode["parallel"])
+    asr = initialize_system(args.model, LLMClient([args.server]), startup, mode["check_net"])
+    if asr is None:
+        raise SystemExit(1)
+    ready = time.time()
+    clip = report_clips(args.wavs, 1)[0]
+    transcribe(asr, {"array": clip, "sampling_rate": SAMPLE_RATE})
+    steps = {name: (step.start - startup.started, step.end - startup.started)
+             for name, step in startup.steps.items()}
+    print(json.dumps({"started": startup.started, "ready": ready, "steps": steps,
+                      "first_asr": time.time() - ready}))
+
+def drop_page_cache():
+    """Empty the OS page cache, as after a power cycle (Linux, root only)"""
+    subprocess.run(["sync"], check=True)
+    with open("/proc/sys/vm/drop_caches", "w") as f:
+        f.write("3\n")
+
+def bench_startup(args):
+    """Process start → ready for the old sequential startup vs the parallel one"""
+    from medevac.metrics import percentiles
+    from medevac.stub_server import StubServer
+
+    stub = StubServer(slots=args.slots).start()
+    results = {mode: [] for mode in STARTUP_MODES}
+    for _ in range(args.runs):
+        for mode in STARTUP_MODES:
+            if args.drop_caches:
+                drop_page_cache()
+            if args.llm_boot:
+                # llama-server still loading its model when we start
+                stub.healthy = False
+                threading.Timer(args.llm_boot, lambda: setattr(stub, "healthy", True)).start()
+            cmd = [sys.executable, os.path.abspath(__file__), "startup", "--child", mode,
+                   "--model", args.model, "--server", stub.url, *args.wavs]
+            spawned = time.time()
+            out = subprocess.run(cmd, stdout=subprocess.PIPE, text=True, check=True).stdout
+            result = json.loads(out.strip().splitlines()[-1])
+            result["spawned"] = spawned
+            results[mode].append(result)
+    stub.stop()
+
+    print(f"\n{args.runs} cold process starts per mode"
+          + (", page cache dropped before each" if args.drop_caches else "")
+          + (f", llama-server healthy {args.llm_boot:.1f}s after start" if args.llm_boot else ""))
+    print(f"  {'mode':<11} {'to ready p50':>12} {'max':>7} {'imports':>8} {'startup':>8} "
+          f"{'first ASR':>10}")
+    for mode, runs in results.items():
+        to_ready = percentiles([r["ready"] - r["spawned"] for r in runs])
+        worst = max(r["ready"] - r["spawned"] for r in runs)
+        imports = statistics.median(r["started"] - r["spawned"] for r in runs)
+        startup = statistics.median(r["ready"] - r["started"] for r in runs)
+        first = statistics.median(r["first_asr"] for r in runs)
+        print(f"  {mode:<11} {to_ready['p50']:11.2f}s {worst:6.2f}s {imports:7.2f}s "
+              f"{startup:7.2f}s {first * 1000:8.0f}ms")
+    for mode, runs in results.items():
+        print(f"\n  {mode} (last run):")
+        for name, (start, end) in runs[-1]["steps"].items():
+            print(f"    {name:<11} {start:6.2f} → {end:6.2f}s")
+
+# =========================
+# LONG-FORM TRANSCRIPTION
+# =========================
+
+def write_radio_net(path, minutes, wavs, seed=0):
+    """A long recording of report clips separated by hiss, written a clip at a time"""
+    import soundfile as sf
+
+    rng = np.random.default_rng(seed)
+    clips = report_clips(wavs, 16, seed)
+    total = int(minutes * 60 * SAMPLE_RATE)
+    written = 0
+    with sf.SoundFile(path, "w", samplerate=SAMPLE_RATE, channels=1, subtype="PCM_16") as f:
+        while written < total:
+            gap = int(rng.uniform(2, 20) * SAMPLE_RATE)
+            hiss = rng.standard_normal(gap).astype(np.float32) * 0.003
+            block = np.concatenate([hiss, clips[int(rng.integers(len(clips)))]])[:total - written]
+            f.write(block)
+            written += len(block)
+
+def longform_child(args):
+    """One transcription in a fresh process: segments, throughput, peak RSS"""
+    from medevac.asr import clean_transcription, load_asr, transcribe
+    from medevac.lexicon import correct_transcript
+    from medevac.longform import LongformTranscriber
+    from medevac.metrics import peak_rss_mb
+
+    asr = load_asr(args.model)
+    loaded_rss = peak_rss_mb()
+    t0 = time.perf_counter()
+    if args.child == "pipeline":
+        # The old path: the pipeline decodes the whole file before chunking it
+        text = transcribe(asr, args.wav)
+        wall = time.perf_counter() - t0
+        text = clean_transcription(text)
+        if LEXICON_CORRECTION:  # as each long-form segment is
+            text = correct_transcript(text)
+        segments, audio_s = 1, None
+    else:
+        transcriber = LongformTranscriber(asr)
+        texts = [segment["text"] for segment in transcriber.segments(args.wav)]
+        wall = time.perf_counter() - t0
+        text, segments, audio_s = " ".join(texts), len(texts), transcriber.audio_s
+    print(json.dumps({"wall": wall, "audio_s": audio_s, "segments": segments, "text": text,
+                      "loaded_rss": loaded_rss, "rss": peak_rss_mb()}))
+
+def bench_longform(args):
+    """Whole-file pipeline vs streamed long-form transcription: peak RSS, audio s/s, parity"""
+    from medevac.metrics import wer
+
+    modes = ["longform"] + (["pipeline"] if args.pipeline else [])
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for minutes in args.minutes:
+            wav = os.path.join(tmp, f"net_{minutes:g}min.wav")
+            write_radio_net(wav, minutes, args.wavs)
+            for mode in modes:
+                cmd = [sys.executable, os.path.abspath(__file__), "longform", "--child", mode,
+                       "--model", args.model, "--wav", wav]
+                out = subprocess.run(cmd, stdout=subprocess.PIPE, text=True, check=True).stdout
+                rows.append((minutes, mode, json.loads(out.strip().splitlines()[-1])))
+            os.remove(wav)
+
+    print("\nSynthetic radio net (report clips between stretches of hiss), one process per run")
+    print(f"  {'minutes':>7} {'mode':<9} {'wall':>8} {'audio s/s':>10} {'segments':>9} "
+          f"{'RSS after load':>15} {'peak RSS':>9}")
+    for minutes, mode, r in rows:
+        audio_s = r["audio_s"] or minutes * 60
+        print(f"  {minutes:7g} {mode:<9} {r['wall']:7.1f}s {audio_s / r['wall']:10.1f} "
+              f"{r['segments']:9} {r['loaded_rss']:13.0f}MB {r['rss']:7.0f}MB")
+
+    # Streaming should not change what is heard: compare with the whole-file transcript
+    texts = {(minutes, mode): r["text"] for minutes, mode, r in rows}
+    if args.pipeline:
+        print("\nParity: WER of the long-form transcript against the whole-file one")
+        for minutes in args.minutes:
+            error = wer(texts[minutes, "pipeline"], texts[minutes, "longform"])
+            print(f"  {minutes:7g} min {error:.3f}")
+
+# =========================
+# MAIN
+# =========================
+
+def main():
+    parser = argparse.ArgumentParser(description="MedEvac-Gemma benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("handoff", help="capture → ASR handoff overhead")
+    p.add_argument("--seconds", type=float, default=15)
+    p.add_argument("--model", help="ASR model path for end-to-end clip-to-text timing")
+    p.set_defaults(func=bench_handoff)
+
+    p = sub.add_parser("ring", help="live capture ring buffer and segment queue")
+    p.add_argument("--seconds", type=float, default=20)
+    p.set_defaults(func=bench_ring)
+
+    p = sub.add_parser("vad", help="silence trimming before ASR")
+    p.add_argument("wavs", nargs="*", default=["audio/Demo1.wav", "audio/Demo2.wav"])
+    p.add_argument("--lead", type=float, default=3, help="seconds of noise before speech")
+    p.add_argument("--tail", type=float, default=5, help="seconds of noise after speech")
+    p.add_argument("--model", help="ASR model path to time transcription")
+    p.set_defaults(func=bench_vad)
+
+    p = sub.add_parser("structured", help="free-form vs grammar-constrained LLM output")
+    p.add_argument("--server", default=SERVER_URL)
+    p.add_argument("--eval", default="medevac-gemma_notebooks/full_eval.csv")
+    p.add_argument("--column", default="asr_custom", help="transcript column to prompt with")
+    p.add_argument("--limit", type=int)
+    p.set_defaults(func=bench_structured)
+
+    p = sub.add_parser("lexicon", help="post-ASR TCCC term correction")
+    p.add_argument("--eval", default="medevac-gemma_notebooks/full_eval.csv")
+    p.add_argument("--columns", nargs="+", default=["asr_custom", "asr_baseline"])
+    p.set_defaults(func=bench_lexicon)
+
+    p = sub.add_parser("mist", help="rule-based MIST extraction and triage ahead of the LLM")
+    p.add_argument("--eval", default="medevac-gemma_notebooks/full_eval.csv")
+    p.add_argument("--columns", nargs="+", default=["gt", "asr_custom", "asr_baseline"])
+    p.set_defaults(func=bench_mist)
+
+    p = sub.add_parser("beam", help="greedy vs biased beam search CTC decoding")
+    p.add_argument("--model", required=True, help="ASR model path")
+    p.add_argument("--eval", default="medevac-gemma_notebooks/full_eval.csv")
+    p.add_argument("--limit", type=int)
+    p.add_argument("--width", type=int, nargs="+", default=[4, 8, 16], help="beam widths")
+    p.set_defaults(func=bench_beam)
+
+    p = sub.add_parser("tts", help="speech synthesis + playback")
+    p.add_argument("--backend", default="stub", help="say, espeak, piper or stub")
+    p.set_defaults(func=bench_tts)
+
+    p = sub.add_parser("bargein", help="cancelling generation and speech on a new report")
+    p.add_argument("--runs", type=int, default=REPEATS)
+    p.add_argument("--token-delay", type=float, default=0.03, help="stub server seconds per token")
+    p.set_defaults(func=bench_bargein)
+
+    p = sub.add_parser("gateway", help="multi-client gateway under load")
+    p.add_argument("--url", help="running gateway (default: in-process with a stub llama-server)")
+    p.add_argument("--clients", type=int, default=8)
+    p.add_argument("--reports", type=int, default=4, help="reports per client, sent in turn")
+    p.add_argument("--ws", action="store_true", help="stream audio over WebSocket")
+    p.add_argument("--wav", default="audio/Demo1.wav")
+    p.add_argument("--slots", type=int, default=2, help="stub server slots")
+    p.add_argument("--queue", type=int, default=GATEWAY_QUEUE, help="gateway queue limit")
+    p.add_argument("--token-delay", type=float, default=0.02, help="stub server seconds per token")
+    p.set_defaults(func=bench_gateway)
+
+    p = sub.add_parser("asrbatch", help="micro-batched CTC inference on CPU")
+    p.add_argument("--model", required=True, help="ASR model path")
+    p.add_argument("wavs", nargs="*", default=["audio/Demo1.wav", "audio/Demo2.wav"])
+    p.add_argument("--clips", type=int, default=32)
+    p.add_argument("--batch", type=int, nargs="+", default=[1, 4, 8], help="max batch sizes")
+    p.add_argument("--window", type=float, default=ASR_BATCH_WINDOW_MS, help="wait window, ms")
+    p.add_argument("--threads", type=int, help="torch intra-op threads")
+    p.set_defaults(func=bench_asrbatch)
+
+    p = sub.add_parser("onnx", help="torch vs ONNX Runtime int8 ASR backend")
+    p.add_argument("--model", required=True, help="ASR model path (torch backend)")
+    p.add_argument("--onnx", required=True, help="export directory from python -m medevac.onnx_asr")
+    p.add_argument("wavs", nargs="*", default=["audio/Demo1.wav", "audio/Demo2.wav"])
+    p.add_argument("--clips", type=int, default=16)
+    p.add_argument("--child", help=argparse.SUPPRESS)
+    p.set_defaults(func=lambda args: onnx_child(args) if args.child else bench_onnx(args))
+
+    p = sub.add_parser("startup", help="time-to-ready: sequential vs parallel startup")
+    p.add_argument("--model", required=True, help="ASR model path")
+    p.add_argument("wavs", nargs="*", default=["audio/Demo1.wav", "audio/Demo2.wav"])
+    p.add_argument("--runs", type=int, default=3)
+    p.add_argument("--slots", type=int, default=2, help="stub server slots")
+    p.add_argument("--llm-boot", type=float, default=0.0,
+                   help="seconds until the stub server reports healthy")
+    p.add_argument("--drop-caches", action="store_true",
+                   help="drop the page cache before each start (Linux, root)")
+    p.add_argument("--server", help=argparse.SUPPRESS)
+    p.add_argument("--child", help=argparse.SUPPRESS)
+    p.set_defaults(func=lambda args: startup_child(args) if args.child else bench_startup(args))
+
+    p = sub.add_parser("longform", help="bounded-memory transcription of long recordings")
+    p.add_argument("--model", required=True, help="ASR model path")
+    p.add_argument("wavs", nargs="*", default=["audio/Demo1.wav", "audio/Demo2.wav"])
+    p.add_argument("--minutes", type=float, nargs="+", default=[2, 10, 30])
+    p.add_argument("--pipeline", action="store_true",
+                   help="also run the whole-file pipeline (memory grows with the file)")
+    p.add_argument("--wav", help=argparse.SUPPRESS)
+    p.add_argument("--child", help=argparse.SUPPRESS)
+    p.set_defaults(func=lambda args: longform_child(args) if args.child else bench_longform(args))
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+"""
+MedEvac-Gemma shared runtime
+Building blocks used by chat.py and the demo scripts
+"""
@@ -0,0 +1,354 @@
+"""
+MedEvac-Gemma ASR helpers
+Model loading, transcript cleanup and incremental CTC transcription
+
+Usage (parity check against a whole-clip decode):
+  python -m medevac.asr verify MODEL_PATH audio/Demo1.wav audio/Demo2.wav
+"""
+
+import argparse
+import inspect
+import re
+import threading
+import time
+
+import numpy as np
+
+from medevac.capture import AudioBuffer
+from medevac.config import (ASR_BACKEND, ASR_DECODER, CHUNK_LENGTH_S, ONNX_THREADS,
+                            SAMPLE_RATE, STRIDE_LENGTH_S, VAD)
+from medevac.trace import tracer
+from medevac.vad import has_speech
+
+# =========================
+# CONFIGURATION
+# =========================
+WINDOW_S = 4.0  # New audio decoded per window while the key is held
+STRIDE_S = 1.0  # Context added on each side of a window, then discarded
+
+# =========================
+# AUDIO UTILITIES
+# =========================
+
+def to_mono(audio):
+    """Average channels of a (frames, channels) array"""
+    if audio.ndim == 2:
+        return audio.mean(axis=1, dtype=np.float32)
+    return audio.astype(np.float32, copy=False)
+
+def resample(audio, orig_sr, target_sr=SAMPLE_RATE):
+    """Band-limited FFT resample of a mono float32 array"""
+    if orig_sr == target_sr or len(audio) == 0:
+        return audio.astype(np.float32, copy=False)
+    n_out = int(round(len(audio) * target_sr / orig_sr))
+    spectrum = np.fft.rfft(audio)
+    n_bins = n_out // 2 + 1
+    if n_bins <= len(spectrum):
+        spectrum = spectrum[:n_bins]
+    else:
+        spectrum = np.pad(spectrum, (0, n_bins - len(spectrum)))
+    out = np.fft.irfft(spectrum, n_out) * (n_out / len(audio))
+    return out.astype(np.float32)
+
+def load_audio(path):
+    """Read a WAV file as mono float32 at SAMPLE_RATE"""
+    import soundfile as sf
+
+    with tracer.span("asr.load", path=path):
+        audio, sr = sf.read(path, dtype="float32")
+        with tracer.span("asr.resample", orig_sr=sr):
+            return resample(to_mono(audio), sr)
+
+# =========================
+# MODEL
+# =========================
+
+def load_asr(model_path, backend=ASR_BACKEND, threads=ONNX_THREADS):
+    """Load the CTC model as a transformers ASR pipeline, or its ONNX export
+
+    `threads` sets ONNX Runtime's intra-op threads; torch uses its own
+    global setting.
+    """
+    if backend == "onnx":
+        from medevac.onnx_asr import OnnxASR
+        return OnnxASR(model_path, threads=threads)
+
+    import torch
+    from transformers import pipeline
+
+    device = 0 if torch.backends.mps.is_available() else -1
+    return instrument_asr(pipeline(
+        "automatic-speech-recognition",
+        model=model_path,
+        device=device,
+        trust_remote_code=True
+    ))
+
+def instrument_asr(asr):
+    """Trace the pipeline's feature extraction, model forward and CTC decode"""
+    preprocess, forward, postprocess = asr.preprocess, asr.forward, asr.postprocess
+
+    def traced_chunks(chunks):
+        done = object()
+        while True:
+            with tracer.span("asr.features"):
+                chunk = next(chunks, done)
+            if chunk is done:
+                return
+            yield chunk
+
+    def traced_preprocess(*args, **kwargs):
+        # Chunked pipelines yield their inputs lazily; time the work behind each one
+        start = time.time()
+        inputs = preprocess(*args, **kwargs)
+        if inspect.isgenerator(inputs):
+            return traced_chunks(inputs)
+        tracer.record("asr.features", start, time.time())
+        return inputs
+
+    def traced_forward(*args, **kwargs):
+        with tracer.span("asr.forward"):
+            return forward(*args, **kwargs)
+
+    def traced_postprocess(*args, **kwargs):
+        with tracer.span("asr.decode"):
+            return postprocess(*args, **kwargs)
+
+    asr.preprocess = traced_preprocess
+    asr.forward = traced_forward
+    asr.postprocess = traced_postprocess
+    return asr
+
+def warm_asr(asr):
+    """Pre-warm ASR model with silent audio"""
+    silent_audio = np.zeros(SAMPLE_RATE, dtype=np.float32)
+    _ = asr({"array": silent_audio, "sampling_rate": SAMPLE_RATE})
+
+def transcribe(asr, audio, decoder=ASR_DECODER):
+    """Transcribe a pipeline input ({"array", "sampling_rate"} or a path)"""
+    if decoder == "beam":
+        from medevac.beam import beam_transcribe
+        return beam_transcribe(asr, audio)
+    return asr(audio, chunk_length_s=CHUNK_LENGTH_S, stride_length_s=STRIDE_LENGTH_S)["text"]
+
+def clean_transcription(text):
+    """Remove <epsilon> tokens and clean up the transcription"""
+    # Remove special tokens
+    text = text.replace("<epsilon>", "")
+    text = text.replace("<s>", "").replace("</s>", "")
+    text = text.replace("[", "").replace("]", "")
+    
+    # Remove duplicate consecutive characters
+    text = re.sub(r'(.)\1+', r'\1\1', text)
+    
+    # Remove duplicate consecutive words
+    words = text.split()
+    cleaned_words = []
+    for i, word in enumerate(words):
+        if i == 0 or word.lower() != words[i-1].lower():
+            cleaned_words.append(word)
+    text = " ".join(cleaned_words)
+    
+    # Clean up extra spaces
+    text = " ".join(text.split())
+    return text.strip()
+
+# =========================
+# CTC WINDOW DECODING
+# =========================
+
+def ctc_logits(asr, audio, sample_rate=SAMPLE_RATE):
+    """Run the pipeline's feature extractor and CTC model on one window"""
+    if hasattr(asr, "ctc_batch"):  # ONNX Runtime backend
+        logits, lengths = asr.ctc_batch([audio], sample_rate)
+        return logits[0, :lengths[0]]
+
+    import torch
+    with tracer.span("asr.features"):
+        inputs = asr.feature_extractor(audio, sampling_rate=sample_rate, return_tensors="pt")
+        inputs = {k: v.to(asr.device) for k, v in inputs.items()}
+    with tracer.span("asr.forward"), torch.no_grad():
+        logits = asr.model(**inputs).logits
+    return logits[0].float().cpu().numpy()
+
+def window_logits(asr, audio, keep_start, keep_end, sample_rate=SAMPLE_RATE):
+    """CTC logits for samples [keep_start, keep_end) of `audio`
+
+    Everything outside that range is acoustic context only; its frames are
+    dropped so consecutive windows tile the clip without overlap.
+    """
+    logits = ctc_logits(asr, audio, sample_rate)
+    samples_per_frame = len(audio) / max(len(logits), 1)
+    first = int(round(keep_start / samples_per_frame))
+    last = int(round(keep_end / samples_per_frame))
+    return logits[first:last]
+
+def decode_ids(asr, ids):
+    """Collapse and detokenize CTC ids the way the HF pipeline does"""
+    with tracer.span("asr.decode"):
+        return asr.tokenizer.decode(np.asarray(ids, dtype=np.int64), skip_special_tokens=False)
+
+def decode_logits(asr, logits, decoder=ASR_DECODER):
+    """Transcript of one clip's (frames, vocab) CTC logits"""
+    if decoder == "beam":
+        from medevac.beam import beam_decode
+        return beam_decode(asr, logits)
+    return decode_ids(asr, logits.argmax(axis=-1))
+
+# =========================
+# INCREMENTAL TRANSCRIBER
+# =========================
+
+class IncrementalTranscriber:
+    """Transcribe push-to-talk audio in overlapping windows while it records
+
+    The SegmentWorker thread calls `feed()` with each block it pulls off
+    the capture queue; the call only appends under a lock, so it never
+    waits on a decode. A worker thread decodes each WINDOW_S of audio as soon as STRIDE_S of
+    right context is available, so on release only the tail is left.
+    With `vad`, windows without speech are skipped instead of decoded.
+    With the beam decoder, each window's frames advance a streaming beam
+    search, so the transcript on release needs no second pass.
+    """
+
+    def __init__(self, asr, sample_rate=SAMPLE_RATE, window_s=WINDOW_S,
+                 stride_s=STRIDE_S, on_partial=None, vad=VAD, decoder=ASR_DECODER):
+        self.asr = asr
+        self.sample_rate = sample_rate
+        self.window = int(window_s * sample_rate)
+        self.stride = int(stride_s * sample_rate)
+        self.on_partial = on_partial
+        self.vad = vad
+        self.skipped = 0  # samples of silent windows not decoded
+
+        self._buffer = AudioBuffer(sample_rate)
+        self._committed = 0  # samples already decoded into self._ids
+        self._ids = []
+        self._beam = None
+        if decoder == "beam":
+            from medevac.beam import new_decoder
+            self._beam = new_decoder(asr)
+        self._finished = False
+        self._cancelled = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def feed(self, samples):
+        """Append mono float32 samples (called from the SegmentWorker thread)"""
+        with self._cond:
+            self._buffer.append(samples)
+            self._cond.notify()
+
+    def partial(self):
+        """Transcript of the audio decoded so far"""
+        if self._beam is not None:
+            return decode_ids(self.asr, self._beam.ids())
+        return decode_ids(self.asr, self._ids)
+
+    def finish(self):
+        """Decode the remaining tail and return the full transcript"""
+        with self._cond:
+            self._finished = True
+            self._cond.notify()
+        self._thread.join()
+        return self.partial()
+
+    def cancel(self):
+        """Stop decoding without waiting; the audio is no longer wanted"""
+        with self._cond:
+            self._finished = self._cancelled = True
+            self._cond.notify()
+
+    def audio(self):
+        """View of all samples fed so far"""
+        with self._cond:
+            return self._buffer.view()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._finished and \
+                        len(self._buffer) < self._committed + self.window + self.stride:
+                    self._cond.wait()
+                finished = self._finished
+                if self._cancelled:
+                    return
+
+            if len(self._buffer) >= self._committed + self.window + self.stride:
+                self._decode(self._committed + self.window)
+                continue
+
+            if finished:
+                if len(self._buffer) > self._committed:
+                    self._decode(len(self._buffer))
+                return
+
+    def _decode(self, end):
+        audio = self.audio()
+        start = self._committed
+        ctx_start = max(0, start - self.stride)
+        ctx_end = min(len(audio), end + self.stride)
+        if self.vad and not has_speech(audio[:ctx_end], start, end, self.sample_rate):
+            # A blank keeps CTC from merging repeats across the gap
+            self._ids.append(self.asr.tokenizer.pad_token_id)
+            if self._beam is not None:
+                self._beam.gap()
+            self.skipped += end - start
+            self._committed = end
+            return
+        with tracer.span("asr.window", seconds=(end - start) / self.sample_rate):
+            logits = window_logits(self.asr, audio[ctx_start:ctx_end],
+                                   start - ctx_start, end - ctx_start, self.sample_rate)
+        if self._beam is not None:
+            from medevac.beam import log_softmax
+            with tracer.span("asr.beam", frames=len(logits)):
+                self._beam.feed(log_softmax(logits))
+        else:
+            self._ids.extend(logits.argmax(axis=-1).tolist())
+        self._committed = end
+        if self.on_partial is not None:
+            self.on_partial(self.partial())
+
+# =========================
+# PARITY CHECK
+# =========================
+
+def verify(model_path, paths, block=1024):
+    """Compare incremental and whole-clip transcripts for WAV files"""
+    asr = load_asr(model_path)
+    all_match = True
+
+    for path in paths:
+        audio = load_audio(path)
+        whole = transcribe(asr, {"array": audio, "sampling_rate": SAMPLE_RATE})
+
+        inc = IncrementalTranscriber(asr)
+        for i in range(0, len(audio), block):
+            inc.feed(audio[i:i + block])
+        t0 = time.time()
+        text = inc.finish()
+        tail_time = time.time() - t0
+
+        match = text.strip() == whole.strip()
+        all_match &= match
+        print(f"\n{path}")
+        print(f"  whole-clip : {whole.strip()}")
+        print(f"  incremental: {text.strip()}")
+        print(f"  match: {match} | decode after release: {tail_time:.2f}s")
+
+    return all_match
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental ASR parity check")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("verify", help="compare incremental vs whole-clip decode")
+    p.add_argument("model_path")
+    p.add_argument("wavs", nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "verify":
+        raise SystemExit(0 if verify(args.model_path, args.wavs) else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""
+MedEvac-Gemma noise augmentation
+Mix battlefield noise into a synthesized dataset, many variants per clip
+
+The noise bank (helicopter, radio static, ...) is decoded and resampled
+once into raw float32 files that every worker memory-maps, so no worker
+decodes noise again. Clips are mixed in batches: each clip is read once and
+all of its variants are produced by one vectorized NumPy pass, so ten
+variants cost little more than one apart from writing them. Noise choice,
+offset and SNR come from a generator seeded by (seed, clip index), so the
+output does not depend on batching or worker count. Clean clips are never
+overwritten; results go to a separate tree with their own metadata.csv.
+
+Usage:
+  python -m medevac.augment medasr_dataset/metadata.csv --out medasr_noisy
+      --noise helicopter.wav radio_static.wav copter_pass.wav
+      [--variants 10] [--snr 5 15] [--seed 0] [--workers N] [--batch 16]
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+# =========================
+# CONFIGURATION
+# =========================
+SNR_RANGE = (5.0, 15.0)  # dB, as in the dataset notebook
+BATCH = 16  # Clips mixed per task
+PEAK = 0.99  # Mixed clips louder than this are scaled down (SNR unchanged)
+
+# =========================
+# NOISE BANK
+# =========================
+
+class NoiseBank:
+    """Noise recordings as memory-mapped float32 arrays at one sample rate"""
+
+    def __init__(self, directory):
+        with open(os.path.join(directory, "index.json")) as f:
+            index = json.load(f)
+        self.sample_rate = index["sample_rate"]
+        self.names = [entry["name"] for entry in index["noises"]]
+        self.arrays = [np.memmap(os.path.join(directory, entry["file"]), dtype=np.float32,
+                                 mode="r", shape=(entry["samples"],))
+                       for entry in index["noises"]]
+
+    @staticmethod
+    def build(noise_files, directory, sample_rate):
+        """Decode + resample each noise file once; reuses files already built"""
+        import soundfile as sf
+
+        from medevac.asr import resample, to_mono
+
+        os.makedirs(directory, exist_ok=True)
+        noises = []
+        for path in noise_files:
+            name = os.path.splitext(os.path.basename(path))[0]
+            file = f"{name}.{sample_rate}.f32"
+            target = os.path.join(directory, file)
+            if not os.path.exists(target):
+                audio, sr = sf.read(path, dtype="float32")
+                audio = resample(to_mono(audio), sr, sample_rate)
+                audio.astype(np.float32).tofile(f"{target}.tmp")
+                os.replace(f"{target}.tmp", target)
+            samples = os.path.getsize(target) // 4
+            noises.append({"name": name, "file": file, "samples": samples})
+
+        with open(os.path.join(directory, "index.json"), "w") as f:
+            json.dump({"sample_rate": sample_rate, "noises": noises}, f, indent=2)
+        return NoiseBank(directory)
+
+# =========================
+# MIXING
+# =========================
+
+def mix_batch(clips, bank, variants, seeds, snr_range=SNR_RANGE):
+    """Mix `variants` noisy copies of each clip in one vectorized pass
+
+    Returns (mixed, params): mixed[i][k] is variant k of clip i and
+    params[i][k] = (noise name, offset, snr_db).
+    """
+    lengths = np.array([len(c) for c in clips])
+    if not lengths.all():
+        raise ValueError(f"clip {int(np.argmin(lengths))} is empty; nothing to mix noise into")
+    n_rows = len(clips) * variants
+    max_len = lengths.max()
+
+    # Per-clip generators keep results independent of batch composition
+    choices = np.empty(n_rows, dtype=int)
+    offsets = np.empty(n_rows, dtype=np.int64)
+    snrs = np.empty(n_rows)
+    for i, seed in enumerate(seeds):
+        rng = np.random.default_rng(seed)
+        rows = slice(i * variants, (i + 1) * variants)
+        choices[rows] = rng.integers(0, len(bank.arrays), variants)
+        offsets[rows] = rng.integers(0, np.iinfo(np.int64).max, variants)
+        snrs[rows] = rng.uniform(*snr_range, variants)
+
+    clean = np.zeros((len(clips), max_len), dtype=np.float32)
+    for i, clip in enumerate(clips):
+        clean[i, :len(clip)] = clip
+    clean = np.repeat(clean, variants, axis=0)
+    row_len = np.repeat(lengths, variants)
+
+    # Contiguous slices of the memory-mapped noise; only the mixing math needs the batch
+    noise = np.zeros_like(clean)
+    for row in range(n_rows):
+        array = bank.arrays[choices[row]]
+        offsets[row] %= len(array)
+        noise[row, :row_len[row]] = wrap_slice(array, offsets[row], row_len[row])
+
+    # Powers over each row's true length, so padding never changes the result
+    clean_power = np.repeat([float(np.dot(c, c)) / len(c) for c in clips], variants)
+    noise_power = np.array([float(np.dot(n[:l], n[:l])) / l for n, l in zip(noise, row_len)])
+    scale = np.sqrt(clean_power / (10 ** (snrs / 10) * np.maximum(noise_power, 1e-12)))
+    mixed = clean + noise * scale[:, None].astype(np.float32)
+
+    peak = np.abs(mixed).max(axis=1)
+    mixed /= np.maximum(peak / PEAK, 1.0)[:, None].astype(np.float32)
+
+    out = [[mixed[i * variants + k, :lengths[i]] for k in range(variants)]
+           for i in range(len(clips))]
+    params = [[(bank.names[choices[i * variants + k]], int(offsets[i * variants + k]),
+                float(snrs[i * variants + k])) for k in range(variants)]
+              for i in range(len(clips))]
+    return out, params
+
+def wrap_slice(array, offset, length):
+    """`length` samples of `array` from `offset`, tiling past the end"""
+    if offset + length <= len(array):
+        return array[offset:offset + length]
+    reps = -(-(offset + length) // len(array))
+    return np.tile(array, reps)[offset:offset + length]
+
+# =========================
+# WORKERS
+# =========================
+
+_bank = None
+
+def _init_worker(bank_dir):
+    global _bank
+    _bank = NoiseBank(bank_dir)
+
+def _augment_batch(job):
+    rows, out_dir, variants, seed, snr_range = job
+    import soundfile as sf
+
+    clips = []
+    kept = []
+    for row in rows:
+        audio, sr = sf.read(row["audio"], dtype="float32")
+        if sr != _bank.sample_rate:
+            raise ValueError(f"{row['audio']} is {sr} Hz, noise bank is {_bank.sample_rate} Hz")
+        if not len(audio):
+            print(f"⚠ Skipping {row['audio']}: no samples")
+            continue
+        clips.append(audio.mean(axis=1, dtype=np.float32) if audio.ndim == 2 else audio)
+        kept.append(row)
+    rows = kept
+    if not rows:
+        return []
+
+    mixed, params = mix_batch(clips, _bank, variants,
+                              [(seed, row["index"]) for row in rows], snr_range)
+    results = []
+    for row, row_mixed, row_params in zip(rows, mixed, params):
+        for k, (audio, (noise, _, snr)) in enumerate(zip(row_mixed, row_params)):
+            path = variant_path(out_dir, row["audio"], k)
+            sf.write(f"{path}.tmp", audio, _bank.sample_rate, format="WAV", subtype="PCM_16")
+            os.replace(f"{path}.tmp", path)
+            results.append({"audio": path, "text": row["text"], "clean": row["audio"],
+                            "noise": noise, "snr_db": round(snr, 2)})
+    return results
+
+def variant_path(out_dir, clean_path, k):
+    stem = os.path.splitext(os.path.basename(clean_path))[0]
+    return os.path.join(out_dir, "audio", f"{stem}_n{k:02d}.wav")
+
+# =========================
+# RUNNER
+# =========================
+
+def augment_dataset(metadata_csv, out_dir, noise_files, variants=1, seed=0,
+                    snr_range=SNR_RANGE, workers=None, batch=BATCH):
+    """Write `variants` noisy copies of every clip; returns the new metadata.csv path"""
+    import soundfile as sf
+
+    with open(metadata_csv, newline="", encoding="utf-8") as f:
+        rows = [dict(r, index=i) for i, r in enumerate(csv.DictReader(f))]
+    if not rows:
+        print("❌ No clips in metadata")
+        return None
+
+    sample_rate = sf.info(rows[0]["audio"]).samplerate
+    bank_dir = os.path.join(out_dir, "noise_bank")
+    bank = NoiseBank.build(noise_files, bank_dir, sample_rate)
+    os.makedirs(os.path.join(out_dir, "audio"), exist_ok=True)
+    print(f"✓ Noise bank: {', '.join(bank.names)} at {sample_rate} Hz (memory-mapped)")
+
+    todo = [r for r in rows
+            if not all(os.path.exists(variant_path(out_dir, r["audio"], k))
+                       for k in range(variants))]
+    jobs = [(todo[i:i + batch], out_dir, variants, seed, snr_range)
+            for i in range(0, len(todo), batch)]
+    workers = max(1, min(workers or os.cpu_count() or 1, len(jobs) or 1))
+    print(f"✓ {len(rows)} clips × {variants} variants, {len(rows) - len(todo)} clips done, "
+          f"{len(todo)} to go on {workers} worker(s)")
+
+    start = time.time()
+    results = []
+    if jobs:
+        with multiprocessing.Pool(workers, initializer=_init_worker,
+                                  initargs=(bank_dir,)) as pool:
+            for batch_results in pool.imap_unordered(_augment_batch, jobs):
+                results.extend(batch_results)
+        elapsed = time.time() - start
+        print(f"✓ Mixed {len(results)} variants in {elapsed:.1f}s "
+              f"({len(results) / elapsed:.1f} variants/s)")
+
+    return write_metadata(out_dir, rows, variants, results)
+
+def write_metadata(out_dir, rows, variants, results):
+    """metadata.csv for every variant on disk, merged with earlier runs, in clip order"""
+    path = os.path.join(out_dir, "metadata.csv")
+    known = {}
+    if os.path.exists(path):
+        with open(path, newline="", encoding="utf-8") as f:
+            known = {r["audio"]: r for r in csv.DictReader(f)}
+    known.update({r["audio"]: r for r in results})
+
+    fields = ["audio", "text", "clean", "noise", "snr_db"]
+    with open(f"{path}.tmp", "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        for row in rows:
+            for k in range(variants):
+                entry = known.get(variant_path(out_dir, row["audio"], k))
+                if entry is not None and os.path.exists(entry["audio"]):
+                    writer.writerow({key: entry[key] for key in fields})
+    os.replace(f"{path}.tmp", path)
+    print(f"✓ Wrote {path}")
+    return path
+
+# =========================
+# MAIN
+# =========================
+
+def main():
+    parser = argparse.ArgumentParser(description="Battlefield noise augmentation")
+    parser.add_argument("metadata", help="metadata.csv of clean clips (audio, text)")
+    parser.add_argument("--out", default="medasr_noisy")
+    parser.add_argument("--noise", nargs="+", required=True, help="noise recordings")
+    parser.add_argument("--variants", type=int, default=1, help="noisy copies per clip")
+    parser.add_argument("--snr", type=float, nargs=2, default=SNR_RANGE, metavar=("MIN", "MAX"))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per core)")
+    parser.add_argument("--batch", type=int, default=BATCH)
+    args = parser.parse_args()
+
+    augment_dataset(args.metadata, args.out, args.noise, args.variants, args.seed,
+                    tuple(args.snr), args.workers, args.batch)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+MedEvac-Gemma ASR micro-batching
+Coalesce clips that arrive together into batched CTC forward passes
+
+A single clip leaves most of the CPU's SIMD width and cores idle in the
+model's matrix multiplies. BatchTranscriber collects the clips submitted
+within a few milliseconds of each other, sorts them by length into
+buckets so little of each batch is padding, and runs each bucket as one
+padded forward pass with an attention mask. Every clip's logits are then
+cut back to its own frames and decoded exactly like the single-clip path
+(greedy or beam, per ASR_DECODER), so transcripts do not depend on what
+a clip was batched with.
+
+Clips longer than CHUNK_LENGTH_S still go through the pipeline's chunked
+transcription one at a time.
+"""
+
+import concurrent.futures
+import queue
+import threading
+import time
+
+import numpy as np
+
+from medevac.asr import decode_logits, transcribe
+from medevac.config import (ASR_BATCH_MAX_PADDING, ASR_BATCH_SIZE, ASR_BATCH_WINDOW_MS,
+                            CHUNK_LENGTH_S, SAMPLE_RATE)
+from medevac.trace import tracer
+
+# =========================
+# BUCKETING
+# =========================
+
+def buckets(lengths, max_batch=ASR_BATCH_SIZE, max_padding=ASR_BATCH_MAX_PADDING):
+    """Group clip indices by length; a bucket's longest clip is at most
+    (1 + max_padding) times its shortest"""
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    groups = []
+    for i in order:
+        group = groups[-1] if groups else None
+        if (group is None or len(group) >= max_batch
+                or lengths[i] > (1 + max_padding) * max(lengths[group[0]], 1)):
+            groups.append([i])
+        else:
+            group.append(i)
+    return groups
+
+# =========================
+# BATCHED CTC
+# =========================
+
+def batch_logits(asr, clips, sample_rate=SAMPLE_RATE):
+    """CTC logits (frames, vocab) for each clip, from one padded forward pass"""
+    if hasattr(asr, "ctc_batch"):  # ONNX Runtime backend
+        logits, lengths = asr.ctc_batch(clips, sample_rate)
+        return [row[:n] for row, n in zip(logits, lengths)]
+
+    import torch
+    with tracer.span("asr.features", batch=len(clips)):
+        inputs = asr.feature_extractor(clips, sampling_rate=sample_rate, padding=True,
+                                       return_attention_mask=True, return_tensors="pt")
+        inputs = {k: v.to(asr.device) for k, v in inputs.items()}
+    with tracer.span("asr.forward", batch=len(clips)), torch.no_grad():
+        logits = asr.model(**inputs).logits
+    logits = logits.float().cpu().numpy()
+    lengths = output_lengths(asr.model, inputs, clips, logits.shape[1])
+    return [row[:n] for row, n in zip(logits, lengths)]
+
+def lengths_fn(model):
+    """The model's input-to-logit length function (Wav2Vec2 and LASR name it differently)"""
+    for name in ("_get_feat_extract_output_lengths", "_get_subsampling_output_length"):
+        fn = getattr(model, name, None)
+        if fn is not None:
+            return fn
+    return None
+
+def output_lengths(model, inputs, clips, frames):
+    """Logit frames belonging to each clip; the rest of its row saw only padding"""
+    # The model's own mask arithmetic, as it uses internally, when it has one
+    frames_fn = lengths_fn(model)
+    if frames_fn is not None and "attention_mask" in inputs:
+        return [int(n) for n in frames_fn(inputs["attention_mask"].sum(-1))]
+    longest = max(len(c) for c in clips)
+    return [int(round(frames * len(clip) / longest)) for clip in clips]
+
+# =========================
+# BATCH TRANSCRIBER
+# =========================
+
+class BatchTranscriber:
+    """Transcribe clips submitted from any thread in micro-batches
+
+    submit() returns a Future for the raw transcript (as transcribe()
+    gives it). The worker waits up to `window_ms` after the first pending
+    clip for others, then runs at most `max_batch` clips per forward pass.
+    """
+
+    def __init__(self, asr, max_batch=ASR_BATCH_SIZE, window_ms=ASR_BATCH_WINDOW_MS,
+                 max_padding=ASR_BATCH_MAX_PADDING, sample_rate=SAMPLE_RATE):
+        self.asr = asr
+        self.max_batch = max_batch
+        self.window = window_ms / 1000
+        self.max_padding = max_padding
+        self.sample_rate = sample_rate
+        self.batches = 0
+        self.clips = 0
+        self.padding = 0  # padded samples fed to the model
+        self.samples = 0  # real samples fed to the model
+        self._requests = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="asr-batch", daemon=True)
+        self._thread.start()
+
+    def submit(self, audio):
+        """Queue a mono float32 clip; returns a Future of its transcript"""
+        future = concurrent.futures.Future()
+        self._requests.put((np.asarray(audio, dtype=np.float32), future))
+        return future
+
+    def transcribe(self, audio):
+        """Blocking transcript of one clip (batched with whatever else is pending)"""
+        return self.submit(audio).result()
+
+    def transcribe_batch(self, clips):
+        """Transcripts of a list of clips, bucketed and run on the calling thread"""
+        texts = [None] * len(clips)
+        for group, group_texts in self._buckets(clips):
+            for i, text in zip(group, group_texts):
+                texts[i] = text
+        return texts
+
+    def _buckets(self, clips):
+        """(indices, transcripts) per bucket, shortest first, as each is decoded"""
+        lengths = [len(c) for c in clips]
+        limit = CHUNK_LENGTH_S * self.sample_rate
+        short = [i for i, n in enumerate(lengths) if n <= limit]
+
+        for group in buckets([lengths[i] for i in short], self.max_batch, self.max_padding):
+            group = [short[g] for g in group]
+            longest = max(max(lengths[i] for i in group), 1)
+            self.batches += 1
+            self.clips += len(group)
+            self.samples += sum(lengths[i] for i in group)
+            self.padding += sum(longest - lengths[i] for i in group)
+            logits = batch_logits(self.asr, [clips[i] for i in group], self.sample_rate)
+            yield group, [decode_logits(self.asr, row) for row in logits]
+
+        for i in (i for i, n in enumerate(lengths) if n > limit):
+            yield [i], [transcribe(self.asr, {"array": clips[i],
+                                              "sampling_rate": self.sample_rate})]
+
+    def stats(self):
+        """One-line summary of batching so far"""
+        mean = self.clips / self.batches if self.batches else 0.0
+        padding = self.padding / max(self.samples + self.padding, 1)
+        return (f"ASR batching: {self.clips} clips in {self.batches} batches "
+                f"(mean {mean:.1f}), {padding:.0%} padding")
+
+    def close(self):
+        """Finish pending clips and stop the worker"""
+        self._requests.put(None)
+        self._thread.join()
+
+    def _run(self):
+        closing = False
+        while not closing:
+            item = self._requests.get()
+            if item is None:
+                return
+            pending = [item]
+            deadline = time.perf_counter() + self.window
+            while len(pending) < self.max_batch:
+                try:
+                    item = self._requests.get(timeout=max(0.0, deadline - time.perf_counter()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    closing = True
+                    break
+                pending.append(item)
+
+            # Each bucket's clips are answered as soon as that bucket is decoded
+            futures = [future for _, future in pending]
+            try:
+                for group, texts in self._buckets([clip for clip, _ in pending]):
+                    for i, text in zip(group, texts):
+                        futures[i].set_result(text)
+            except Exception as e:
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
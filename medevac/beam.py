@@ -0,0 +1,326 @@
+"""
+MedEvac-Gemma CTC beam search
+Prefix beam search over CTC output, biased toward TCCC terms and hotwords
+
+Greedy decoding takes the best token of every frame on its own, which is
+where "Turniqu" and "Helix3" come from when the acoustic model is unsure
+for a frame or two. Prefix beam search keeps the ASR_BEAM_WIDTH most
+likely transcripts instead, each summed over all of its alignments.
+
+Transcripts are also scored against a character trie of the lexicon's
+TCCC terms and acronyms, plus ASR_HOTWORDS (callsigns, vitals). Every
+character that keeps a word on the trie earns that word's boost; if the
+word then leaves the trie or ends before a complete entry, the boost is
+taken back, so only whole terms come out ahead.
+
+Most CTC frames are almost all blank. Those only need the blank/repeat
+update, which is a few array operations over the beams. Other frames
+score the TOP_K tokens against every beam at once as a matrix; an
+extension that lands on a prefix a beam already holds is merged into it
+with a masked np.logaddexp. Prefixes are nodes of a tree, so extending
+and merging them never copies token lists.
+"""
+
+import functools
+
+import numpy as np
+
+from medevac.config import (ASR_BEAM_WIDTH, ASR_HOTWORDS, CHUNK_LENGTH_S, SAMPLE_RATE,
+                            STRIDE_LENGTH_S)
+from medevac.lexicon import ACRONYMS, TERMS
+from medevac.trace import tracer
+
+# =========================
+# CONFIGURATION
+# =========================
+TOP_K = 8  # Tokens per frame considered for extending the beams
+TOKEN_MIN = 1e-3  # ...if at least this likely
+BLANK_SKIP = 0.999  # Frames at least this sure of blank are not extended
+SHORTLIST = 2  # Extensions scored in full per frame, in multiples of the beam width
+BEAM_PRUNE = 10.0  # Beams and extensions this far (log-prob) below the best are dropped
+LEXICON_BOOST = 0.5  # Log-prob bonus per character of a TCCC term or acronym
+
+LOG_BLANK_SKIP = float(np.log(BLANK_SKIP))
+LOG_TOKEN_MIN = float(np.log(TOKEN_MIN))
+
+# =========================
+# VOCABULARY
+# =========================
+
+def log_softmax(logits):
+    """Log-probabilities over the last axis, in float32"""
+    logits = np.asarray(logits, dtype=np.float32)
+    shifted = logits - logits.max(axis=-1, keepdims=True)
+    return shifted - np.log(np.exp(shifted).sum(axis=-1, keepdims=True))
+
+def token_text(token, word_delimiter="|"):
+    """A token's text for matching against the trie; " " marks a word boundary"""
+    if token is None or (token.startswith("<") and token.endswith(">")):
+        return ""  # special tokens (<unk>, <epsilon>, ...) neither extend nor end a word
+    if token == word_delimiter:
+        return " "
+    text = token.replace("▁", " ").lower()
+    return "".join(c if c.isalnum() else " " for c in text)
+
+@functools.lru_cache(maxsize=4)
+def token_texts(tokenizer):
+    """Trie text of every token id of a CTC tokenizer"""
+    tokens = tokenizer.convert_ids_to_tokens(list(range(len(tokenizer))))
+    delimiter = getattr(tokenizer, "word_delimiter_token", None) or \
+        getattr(tokenizer, "word_delimiter", "|")
+    return tuple(token_text(t, delimiter) for t in tokens)
+
+# =========================
+# BIAS TRIE
+# =========================
+
+class BiasTrie:
+    """Character trie of boosted words; node 0 is the root, -1 is off the trie"""
+
+    def __init__(self, words):
+        self.children = [{}]
+        self.boost = [0.0]
+        self.terminal = [False]
+        for word, boost in words.items():
+            node = 0
+            for char in word.lower():
+                child = self.children[node].get(char)
+                if child is None:
+                    child = len(self.boost)
+                    self.children[node][char] = child
+                    self.children.append({})
+                    self.boost.append(0.0)
+                    self.terminal.append(False)
+                # A shared prefix earns the largest boost of the words it begins
+                self.boost[child] = max(self.boost[child], boost)
+                node = child
+            self.terminal[node] = True
+
+    def step(self, node, earned, text):
+        """(node, boost earned by the open word, change in bias) after `text`"""
+        delta = 0.0
+        for char in text:
+            if char == " ":
+                if node < 0 or not self.terminal[node]:
+                    delta -= earned
+                node, earned = 0, 0.0
+            elif node >= 0 and char in self.children[node]:
+                node = self.children[node][char]
+                earned += self.boost[node]
+                delta += self.boost[node]
+            else:
+                delta -= earned
+                node, earned = -1, 0.0
+        return node, earned, delta
+
+    def pending(self, node, earned):
+        """Boost to take back if the transcript ended inside this word"""
+        return 0.0 if node >= 0 and self.terminal[node] else earned
+
+@functools.lru_cache(maxsize=1)
+def default_trie():
+    """TCCC terms and acronyms at LEXICON_BOOST, overridden by ASR_HOTWORDS"""
+    words = {word: LEXICON_BOOST for word in list(TERMS) + list(ACRONYMS)}
+    words.update(ASR_HOTWORDS)
+    return BiasTrie(words)
+
+# =========================
+# PREFIX BEAM SEARCH
+# =========================
+
+class CTCBeamDecoder:
+    """Streaming prefix beam search over CTC log-probabilities
+
+    feed() takes (frames, vocab) log-probs as they become available;
+    ids() is the best transcript so far as CTC ids, ready for the
+    tokenizer's usual collapse-and-decode.
+    """
+
+    def __init__(self, texts, blank, beam_width=ASR_BEAM_WIDTH, trie=None, top_k=TOP_K):
+        self.texts = texts
+        self.blank = blank
+        self.beam_width = beam_width
+        self.trie = trie
+        self.top_k = top_k
+        self.frames = 0
+
+        # Prefix tree: node 0 is the empty transcript. Per node: parent, last token,
+        # bias, and the trie node and boost earned of its open word
+        self._prefixes = [(-1, -1, 0.0, 0, 0.0)]
+        self._children = {}
+
+        # Beams: prefix node, log P(ending in blank), log P(ending in its last token)
+        self.nodes = np.zeros(1, dtype=np.int64)
+        self.pb = np.zeros(1)
+        self.pnb = np.full(1, -np.inf)
+        self.bias = np.zeros(1)
+        self.last = np.full(1, -1, dtype=np.int64)
+
+    def feed(self, log_probs):
+        """Advance the beams by (frames, vocab) log-probabilities"""
+        log_probs = np.asarray(log_probs)
+        if len(log_probs) == 0:
+            return
+        # Each frame's likely tokens, for all frames at once
+        k = min(self.top_k, log_probs.shape[1] - 1)
+        scores = log_probs.copy()
+        scores[:, self.blank] = -np.inf
+        candidates = np.argpartition(scores, -k, axis=1)[:, -k:]
+        likely = np.take_along_axis(log_probs, candidates, axis=1) >= LOG_TOKEN_MIN
+        # Frames that can only continue the current prefixes are applied a run at a time
+        still = (log_probs[:, self.blank] >= LOG_BLANK_SKIP) | ~likely.any(axis=1)
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], still.astype(np.int8), [0]))))
+        t = 0
+        for start, end in zip(edges[::2], edges[1::2]):
+            for i in range(t, start):
+                self._step(log_probs[i], candidates[i][likely[i]])
+            self._still_run(log_probs[start:end])
+            t = end
+        for i in range(t, len(log_probs)):
+            self._step(log_probs[i], candidates[i][likely[i]])
+        self.frames += len(log_probs)
+
+    def gap(self):
+        """Audio left out (silence): the next token cannot merge with the last one"""
+        self.pb = np.logaddexp(self.pb, self.pnb)
+        self.pnb = np.full(len(self.pnb), -np.inf)
+
+    def ids(self):
+        """CTC ids of the best transcript, with blanks between repeated tokens"""
+        scores = np.logaddexp(self.pb, self.pnb) + self.bias
+        if self.trie is not None:
+            scores -= [self.trie.pending(*self._prefixes[n][3:]) for n in self.nodes]
+        node = int(self.nodes[int(np.argmax(scores))])
+        tokens = []
+        while node > 0:
+            node, token = self._prefixes[node][:2]
+            tokens.append(token)
+        ids = []
+        for token in reversed(tokens):
+            if ids and ids[-1] == token:
+                ids.append(self.blank)
+            ids.append(token)
+        return np.asarray(ids, dtype=np.int64)
+
+    def _still_run(self, frames):
+        """Frames that add no token, applied to every beam at once
+
+        A prefix that ends in blank after the run either never left the
+        blank state, or repeated its last token up to some frame k and
+        went blank there; cumulative sums give every k in one go.
+        """
+        if len(frames) == 1:
+            frame = frames[0]
+            repeat = np.where(self.last >= 0, frame[np.maximum(self.last, 0)], -np.inf)
+            self.pb = np.logaddexp(self.pb, self.pnb) + frame[self.blank]
+            self.pnb = self.pnb + repeat
+            return
+        blank = np.concatenate(([0.0], np.cumsum(frames[:, self.blank])))
+        repeat = np.where(self.last[:, None] >= 0, frames[:, np.maximum(self.last, 0)].T, -np.inf)
+        repeat = np.concatenate([np.zeros((len(self.last), 1)), np.cumsum(repeat, axis=1)], axis=1)
+        via_repeat = self.pnb[:, None] + repeat[:, :-1] + (blank[-1] - blank[:-1])[None, :]
+        self.pb = np.logaddexp(self.pb + blank[-1], np.logaddexp.reduce(via_repeat, axis=1))
+        self.pnb = self.pnb + repeat[:, -1]
+
+    def _step(self, frame, candidates):
+        total = np.logaddexp(self.pb, self.pnb)
+        repeat = np.where(self.last >= 0, frame[np.maximum(self.last, 0)], -np.inf)
+        stay_pb = total + frame[self.blank]
+        stay_pnb = self.pnb + repeat
+
+        # Every beam × every likely token; a repeat of the last token needs a blank between
+        extend = np.where(candidates[None, :] == self.last[:, None],
+                          self.pb[:, None], total[:, None]) + frame[candidates][None, :]
+
+        # Only the most promising extensions become prefix nodes
+        ranked = (extend + self.bias[:, None]).ravel()
+        floor = (np.logaddexp(stay_pb, stay_pnb) + self.bias).max() - BEAM_PRUNE
+        n = min(int((ranked >= floor).sum()), SHORTLIST * self.beam_width)
+        if n == 0:
+            self.pb, self.pnb = stay_pb, stay_pnb
+            return
+        best = np.argpartition(-ranked, n - 1)[:n]
+        rows, cols = np.unravel_index(best, extend.shape)
+        tokens = candidates[cols]
+        children = np.array([self._child(int(self.nodes[r]), int(c))
+                             for r, c in zip(rows, tokens)])
+        extended = extend[rows, cols]
+
+        # An extension can land on a prefix another beam already holds ("ab" + "c" = "abc").
+        # A node has one parent and one last token, so at most one extension
+        # hits each held beam and plain fancy indexing cannot drop a merge.
+        same = children[:, None] == self.nodes[None, :]
+        merged = same.any(axis=1)
+        held = same[merged].argmax(axis=1)
+        stay_pnb[held] = np.logaddexp(stay_pnb[held], extended[merged])
+        fresh = ~merged
+
+        nodes = np.concatenate([self.nodes, children[fresh]])
+        pb = np.concatenate([stay_pb, np.full(int(fresh.sum()), -np.inf)])
+        pnb = np.concatenate([stay_pnb, extended[fresh]])
+        bias = np.concatenate([self.bias, [self._prefixes[c][2] for c in children[fresh]]])
+        last = np.concatenate([self.last, tokens[fresh]])
+
+        scores = np.logaddexp(pb, pnb) + bias
+        keep = np.argsort(-scores, kind="stable")[:self.beam_width]
+        keep = keep[scores[keep] >= scores[keep[0]] - BEAM_PRUNE]
+        self.nodes, self.pb, self.pnb = nodes[keep], pb[keep], pnb[keep]
+        self.bias, self.last = bias[keep], last[keep]
+
+    def _child(self, node, token):
+        child = self._children.get((node, token))
+        if child is None:
+            _, _, bias, trie_node, earned = self._prefixes[node]
+            if self.trie is not None and token < len(self.texts):
+                trie_node, earned, delta = self.trie.step(trie_node, earned, self.texts[token])
+                bias += delta
+            child = len(self._prefixes)
+            self._children[(node, token)] = child
+            self._prefixes.append((node, token, bias, trie_node, earned))
+        return child
+
+# =========================
+# TRANSCRIPTION
+# =========================
+
+def new_decoder(asr, beam_width=ASR_BEAM_WIDTH, biased=True):
+    """A CTCBeamDecoder for this model's vocabulary"""
+    return CTCBeamDecoder(token_texts(asr.tokenizer), asr.tokenizer.pad_token_id, beam_width,
+                          default_trie() if biased else None)
+
+def beam_decode(asr, logits, beam_width=ASR_BEAM_WIDTH, biased=True):
+    """Transcript of one clip's (frames, vocab) CTC logits"""
+    from medevac.asr import decode_ids
+
+    decoder = new_decoder(asr, beam_width, biased)
+    with tracer.span("asr.beam", frames=len(logits)):
+        decoder.feed(log_softmax(logits))
+    return decode_ids(asr, decoder.ids())
+
+def chunk_logits(asr, audio, chunk_length_s=CHUNK_LENGTH_S, stride_length_s=STRIDE_LENGTH_S):
+    """CTC logits of a clip, chunked and merged like the pipeline's chunked transcription"""
+    from medevac.asr import ctc_logits
+    from medevac.longform import strided_chunks
+
+    align_to = getattr(asr, "align_to", None) or asr._align_to
+    chunk = int(round(chunk_length_s * SAMPLE_RATE / align_to) * align_to)
+    stride = int(round(stride_length_s * SAMPLE_RATE / align_to) * align_to)
+    pieces = []
+    for _, samples, left, right in strided_chunks([audio], chunk, stride):
+        logits = ctc_logits(asr, samples)
+        # Drop the frames that only overlap a neighbouring chunk's stride
+        total = int(round(len(samples) / align_to))
+        first = int(round(left / len(samples) * total))
+        last = total - int(round(right / len(samples) * total))
+        pieces.append(logits[first:last])
+    return np.concatenate(pieces) if pieces else np.zeros((0, len(asr.tokenizer)), np.float32)
+
+def beam_transcribe(asr, audio):
+    """Transcribe a pipeline input ({"array", "sampling_rate"} or a path) with beam search"""
+    from medevac.asr import load_audio, resample
+
+    if isinstance(audio, str):
+        audio = load_audio(audio)
+    else:
+        audio = resample(np.asarray(audio["array"], dtype=np.float32), audio["sampling_rate"])
+    return beam_decode(asr, chunk_logits(asr, audio))
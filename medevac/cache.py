@@ -0,0 +1,155 @@
+"""
+MedEvac-Gemma response cache
+LRU + TTL cache of LLM responses keyed on a canonical transcript
+
+A repeated report ("say again", a re-keyed transmission) usually comes back
+from ASR with small differences: a different callsign, "heart rate one
+twenty two" instead of "HR 122", other casing and punctuation.
+`canonical_transcript` folds those away so a repeat is answered from memory
+instead of paying another LLM round trip.
+"""
+
+import collections
+import re
+import threading
+import time
+import unicodedata
+
+from medevac.config import CACHE_MAX_BYTES, CACHE_SIZE, CACHE_TTL_S
+
+# =========================
+# CANONICAL FORM
+# =========================
+UNITS = {w: i for i, w in enumerate(
+    "zero one two three four five six seven eight nine ten eleven twelve thirteen "
+    "fourteen fifteen sixteen seventeen eighteen nineteen".split())}
+TENS = {w: 10 * i for i, w in enumerate(
+    "twenty thirty forty fifty sixty seventy eighty ninety".split(), 2)}
+NUMBER_WORDS = set(UNITS) | set(TENS) | {"hundred", "oh"}
+
+VITALS = [
+    (r"\bheart rate\b|\bpulse rate\b", "hr"),
+    (r"\bblood pressure\b", "bp"),
+    (r"\brespirations?(?: rate)?\b|\brespiratory rate\b|\bresp(?: rate)?\b|\bbreathing rate\b", "rr"),
+    (r"\bsp ?o2\b|\bo2 sats?\b|\bsats\b|\boxygen saturation\b|\bpulse ox\b", "spo2"),
+]
+
+# "AI, this is Helix-3 medic" / "Dustoff-2, this is Helix-3" → "medic" / "";
+# ASR may drop the hyphen ("helix 3")
+CALLSIGN = re.compile(
+    r"^(?:[a-z ]{1,12}(?:[ -]?\d+)? )?this is [a-z]+(?:[ -]?\d+)?\b|\b[a-z]+-\d+\b")
+
+def spoken_number(words):
+    """Digits for a run of number words: "one twenty two" / "one hundred twenty two" → "122" """
+    digits = ""
+    group = None
+    hundred = False
+    for word in words:
+        if word == "hundred":
+            group = (group or 1) * 100
+            hundred = True
+            continue
+        value = 0 if word == "oh" else UNITS.get(word, TENS.get(word))
+        if group is not None and hundred and group % 100 == 0:
+            group += value  # "one hundred twenty"
+        elif group is not None and group % 10 == 0 and group % 100 and value < 10:
+            group += value  # "twenty two", "one hundred twenty two"
+        else:
+            if group is not None:
+                digits += str(group)  # spoken digit groups: "one" "twenty two"
+            group, hundred = value, False
+    return digits + ("" if group is None else str(group))
+
+def canonical_transcript(text):
+    """Cache key for a cleaned transcript: no callsign, normalized vitals, folded case/space"""
+    text = unicodedata.normalize("NFKC", text).lower()  # SpO₂ → spo2
+    text = text.replace("%", " percent ")
+    text = re.sub(r"[^a-z0-9/\- ]+", " ", text)
+    text = " ".join(text.split())
+    text = CALLSIGN.sub(" ", text).replace("-", " ")
+
+    words = []
+    run = []
+    for word in text.split() + [""]:
+        # "oh" only counts inside a number ("one oh five")
+        if word in NUMBER_WORDS and (word != "oh" or run):
+            run.append(word)
+            continue
+        if run:
+            words.append(spoken_number(run))
+            run = []
+        words.append(word)
+    text = " ".join(words)
+
+    for pattern, name in VITALS:
+        text = re.sub(pattern, name, text)
+    text = re.sub(r"(\d) ?(?:over|/) ?(\d)", r"\1/\2", text)
+    return " ".join(text.split())
+
+# =========================
+# CACHE
+# =========================
+
+class ResponseCache:
+    """Thread-safe LRU cache of LLM responses with expiry and a size cap"""
+
+    def __init__(self, max_entries=CACHE_SIZE, ttl=CACHE_TTL_S, max_bytes=CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.bytes = 0
+        self._entries = collections.OrderedDict()  # key -> (expires, response)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, transcript):
+        """Cached response for the transcript, or None"""
+        key = canonical_transcript(transcript)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, transcript, response):
+        """Store a response, evicting least-recently-used entries past the caps"""
+        key = canonical_transcript(transcript)
+        size = _size(key, response)
+        if not key or size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, response)
+            self.bytes += size
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        """One printable line of counters"""
+        total = self.hits + self.misses
+        rate = self.hits / total if total else 0.0
+        return (f"Response cache: {self.hits} hits / {self.misses} misses ({rate:.0%}), "
+                f"{len(self._entries)} entries, {self.bytes / 1024:.1f} KiB")
+
+    def _remove(self, key):
+        _, response = self._entries.pop(key)
+        self.bytes -= _size(key, response)
+
+def _size(key, response):
+    return len(key.encode()) + len(response.encode())
@@ -0,0 +1,218 @@
+"""
+MedEvac-Gemma audio capture
+Preallocated recording buffer that hands numpy views straight to ASR, and
+a lock-free ring buffer with push-to-talk segments for live capture
+
+The sounddevice callback only ever writes into the ring. Key events only
+mark segment boundaries (sample positions in the ring) and hand segments
+to a bounded job queue, so neither the audio thread nor the keyboard
+listener waits on ASR, the LLM or speech.
+"""
+
+import queue
+import threading
+import time
+
+import numpy as np
+
+from medevac.config import SAMPLE_RATE
+
+# =========================
+# CONFIGURATION
+# =========================
+INITIAL_SECONDS = 30  # Covers a typical casualty report without regrowing
+GROWTH = 2.0
+RING_SECONDS = 300  # Live audio kept; a queued segment must be read before it is overwritten
+PRE_ROLL_S = 0.2  # Audio kept from just before SPACE goes down, so the first syllable survives
+SEGMENT_QUEUE = 4  # Finished recordings waiting for the processing worker
+
+# =========================
+# RECORDING BUFFER
+# =========================
+
+class AudioBuffer:
+    """Mono float32 recording buffer with geometric growth
+
+    `append()` copies callback data in once; `view()` returns a view of the
+    recorded samples with no further copies, ready to pass to the ASR
+    pipeline as {"array": ..., "sampling_rate": ...}.
+    """
+
+    def __init__(self, sample_rate=SAMPLE_RATE, initial_seconds=INITIAL_SECONDS):
+        self.sample_rate = sample_rate
+        self._data = np.zeros(int(sample_rate * initial_seconds), dtype=np.float32)
+        self._n = 0
+
+    def __len__(self):
+        return self._n
+
+    @property
+    def duration(self):
+        """Recorded length in seconds"""
+        return self._n / self.sample_rate
+
+    def clear(self):
+        """Start a new recording, keeping the allocation"""
+        self._n = 0
+
+    def append(self, samples):
+        """Copy samples (1-D, or (frames, 1) from sounddevice) into the buffer"""
+        samples = samples.reshape(-1)
+        end = self._n + len(samples)
+        if end > len(self._data):
+            capacity = len(self._data)
+            while capacity < end:
+                capacity = int(capacity * GROWTH) + 1
+            grown = np.empty(capacity, dtype=np.float32)
+            grown[:self._n] = self._data[:self._n]
+            self._data = grown
+        self._data[self._n:end] = samples
+        self._n = end
+
+    def view(self, start=0, end=None):
+        """View of recorded samples [start, end); do not write through it"""
+        end = self._n if end is None else min(end, self._n)
+        return self._data[start:end]
+
+    def asr_input(self):
+        """Pipeline input for the whole recording, without a temp file"""
+        return {"array": self.view(), "sampling_rate": self.sample_rate}
+
+# =========================
+# RING BUFFER
+# =========================
+
+class RingBuffer:
+    """Fixed-size float32 ring with one writer and any number of readers
+
+    Lock-free: the writer first announces how far it is about to write in
+    `writing`, copies the samples in, and then publishes them by advancing
+    `written`; each is a single integer store. Positions are absolute
+    sample counts since the stream started. A reader copies a range out
+    and checks afterwards against `writing`, so a range the writer has
+    lapped, or is overwriting right now, is rejected rather than torn.
+    """
+
+    def __init__(self, sample_rate=SAMPLE_RATE, seconds=RING_SECONDS):
+        self.sample_rate = sample_rate
+        self._data = np.zeros(int(sample_rate * seconds), dtype=np.float32)
+        self.written = 0  # Samples ever written; only write() changes it
+        self.writing = 0  # `written` once the write in progress (if any) is done
+
+    @property
+    def capacity(self):
+        return len(self._data)
+
+    def write(self, samples):
+        """Copy samples (1-D, or (frames, 1) from sounddevice) in; audio thread only"""
+        samples = samples.reshape(-1)
+        n = len(samples)
+        self.writing = self.written + n  # announce before touching the data
+        pos = self.written % self.capacity
+        if pos + n <= self.capacity:
+            self._data[pos:pos + n] = samples
+        else:
+            kept = samples[-self.capacity:]
+            pos = (self.written + n - len(kept)) % self.capacity
+            first = min(len(kept), self.capacity - pos)
+            self._data[pos:pos + first] = kept[:first]
+            self._data[:len(kept) - first] = kept[first:]
+        self.written = self.writing  # publish only after the copy
+
+    def read(self, start, end):
+        """Copy of samples [start, end), or None if they have been overwritten"""
+        end = min(end, self.written)
+        start = max(0, start)
+        if end <= start:
+            return np.zeros(0, dtype=np.float32)
+        if start < self.writing - self.capacity:
+            return None
+        first, last = start % self.capacity, end % self.capacity
+        if first < last:
+            out = self._data[first:last].copy()
+        else:
+            out = np.concatenate((self._data[first:], self._data[:last]))
+        # The writer may have wrapped over [start, end) while we copied, or be
+        # part-way through doing so: `writing` is advanced before the copy
+        if start < self.writing - self.capacity:
+            return None
+        return out
+
+# =========================
+# SEGMENTS
+# =========================
+
+class Segment:
+    """One push-to-talk recording: samples [start, end) of a RingBuffer"""
+
+    def __init__(self, start, started):
+        self.start = start
+        self.started = started  # wall-clock time SPACE went down
+        self.end = None
+        self.released = None  # wall-clock time SPACE came up
+        self.dropped = False  # the job queue was full
+        self._closed = threading.Event()
+
+    @property
+    def closed(self):
+        return self._closed.is_set()
+
+    def close(self, end):
+        self.end = end
+        self.released = time.time()
+        self._closed.set()
+
+    def wait(self, timeout=None):
+        """Block until the recording has ended"""
+        return self._closed.wait(timeout)
+
+class SegmentRecorder:
+    """Turns key down / key up into Segments on a job queue
+
+    With `live`, a segment is queued as soon as recording starts so the
+    worker can transcribe it while SPACE is still held; otherwise only
+    finished segments are queued. Never blocks: when the queue is full the
+    recording is dropped with a warning.
+    """
+
+    def __init__(self, ring, jobs=None, live=False, pre_roll_s=PRE_ROLL_S):
+        self.ring = ring
+        self.jobs = jobs or queue.Queue(maxsize=SEGMENT_QUEUE)
+        self.live = live
+        self.pre_roll = int(pre_roll_s * ring.sample_rate)
+        self.segment = None  # the recording in progress
+
+    @property
+    def recording(self):
+        return self.segment is not None
+
+    def begin(self):
+        """SPACE down: start a segment; returns it, or None if already recording"""
+        if self.segment is not None:
+            return None
+        self.segment = Segment(max(0, self.ring.written - self.pre_roll), time.time())
+        if self.live:
+            self._queue(self.segment)
+        return self.segment
+
+    def end(self):
+        """SPACE up: close the segment in progress; returns it, or None"""
+        segment, self.segment = self.segment, None
+        if segment is None:
+            return None
+        segment.close(self.ring.written)
+        if not self.live:
+            self._queue(segment)
+        return None if segment.dropped else segment
+
+    def stop(self):
+        """Tell the worker there are no more segments (blocks if the queue is full)"""
+        self.end()
+        self.jobs.put(None)
+
+    def _queue(self, segment):
+        try:
+            self.jobs.put_nowait(segment)
+        except queue.Full:
+            segment.dropped = True
+            print("⚠ Still busy with earlier reports; recording dropped")
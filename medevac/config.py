@@ -0,0 +1,100 @@
+"""
+MedEvac-Gemma shared configuration
+Defaults used by chat.py, demo1.py and demo2.py
+"""
+
+import sys
+
+# =========================
+# CONFIGURATION
+# =========================
+SERVER_URL = "http://localhost:8080"
+MAX_TOKENS = 90 # This can be adjusted based on expected response length and latency requirements
+TEMP = 0.7
+STOP = ["\n\n\n"]
+STRUCTURED_OUTPUT = True # Constrain output to the TCCC format with a grammar; ends after WARNING
+LLM_TIMEOUT = 30
+
+# llama-server instances on this box; requests go to the least-loaded healthy one
+LLM_ENDPOINTS = [SERVER_URL]
+LLM_BUDGET_S = 10.0 # Total time one LLM request may take, across failovers
+CONNECT_TIMEOUT = 0.5
+STALL_TIMEOUT = 3.0 # Give up on an endpoint after this long without a token
+PROBE_TIMEOUT = 0.3 # /health and /slots probes
+HEALTH_INTERVAL = 2.0 # Seconds an endpoint's health/slot state is trusted
+POOL_SIZE = 8 # Keep-alive connections per endpoint
+WARM_SLOTS = True # Prefill the system prompt into every server slot at startup
+WARM_TIMEOUT = 10.0
+LLM_STARTUP_WAIT_S = 20.0 # How long startup waits for llama-server to answer /health (it may still be booting)
+CHECK_INTERNET = False # Probe google.com at startup (blocks up to 2s on an air-gapped box)
+
+# llama-server launched and restarted by medevac.supervisor (instead of ./start_llm_server.sh)
+LLM_SUPERVISE = False # Start llama-server from chat.py / the demos and restart it if it dies
+LLAMA_SERVER = "llama-server" # Binary (or command line, e.g. "python3 -m medevac.stub_server")
+LLM_MODEL = "models/medgemma/medgemma-1.5-4b-tccc-lora-q4.gguf"
+LLAMA_PARAMS = {"ctx": 1024, "batch": 512, "ubatch": 256, "threads": 6, "threads_batch": 6,
+                "mmap": False} # Hand-tuned defaults; overridden by LLAMA_TUNED for this host
+LLAMA_FLAGS = ["-ngl", "99", "--cont-batching", "-fa", "on"] # Passed through unchanged
+LLAMA_TUNED = "llama_tuned.json" # Written by python -m medevac.supervisor --autotune
+LLAMA_LOG = "llama_server.log"
+LLAMA_RESTARTS = 5 # Crashes tolerated per LLAMA_RESTART_WINDOW_S before giving up
+LLAMA_RESTART_WINDOW_S = 300
+LLAMA_LOAD_TIMEOUT_S = 120.0 # Launch to first /health 200 (model load)
+
+SAMPLE_RATE = 16000
+ASR_BACKEND = "torch" # torch (transformers pipeline) or onnx (int8 export from python -m medevac.onnx_asr)
+ONNX_THREADS = 0 # ONNX Runtime intra-op threads; 0 lets it use every core
+VAD = True # Trim dead air and long pauses before ASR
+LEXICON_CORRECTION = True # Fix near-miss TCCC terms, callsigns and SpO₂ in transcripts
+MIST_CARD = "speak" # Preliminary MIST card + triage before the LLM answers: speak, print or None
+MIST_PROMPT = False # Send the LLM the compact MIST record instead of the transcript (fewer prompt tokens)
+ASR_DECODER = "greedy" # greedy or beam (prefix beam search biased toward TCCC terms and ASR_HOTWORDS)
+ASR_BEAM_WIDTH = 8
+ASR_HOTWORDS = {"SpO2": 1.5, "HR": 1.0, "BP": 1.0, "RR": 1.0, "GCS": 1.0} # Boost per character; add the callsigns on your net, e.g. "Helix": 1.5
+CHUNK_LENGTH_S = 20
+STRIDE_LENGTH_S = 2
+ASR_BATCH_SIZE = 1 # Clips per batched forward pass (gateway); 1 disables, try 4-8 on a multi-core host (bench.py asrbatch)
+ASR_BATCH_WINDOW_MS = 5 # How long the first pending clip waits for others to join it
+ASR_BATCH_MAX_PADDING = 0.25 # A batch's longest clip is at most this much longer than its shortest
+
+RESPONSE_CACHE = True # Answer repeated reports ("say again") without the LLM
+CACHE_SIZE = 64 # Responses kept
+CACHE_TTL_S = 600 # Seconds a cached response stays valid
+CACHE_MAX_BYTES = 256 * 1024
+
+TRACE_DIR = "traces" # Span log + Prometheus metrics; None disables tracing
+PROFILE_STAGES = False # Also dump cProfile/tracemalloc per stage (slow)
+
+TTS_BACKEND = "say" if sys.platform == "darwin" else "espeak" # say, espeak, piper, stub or null
+TTS_OUTPUT = "device" # device (speakers), file (WAVs in TTS_FILE_DIR) or null
+TTS_CACHE_DIR = "tts_cache" # Synthesized phrases by content hash; None disables
+TTS_FILE_DIR = "tts_out"
+VOICE = "Alex" # macOS say voice
+ESPEAK_VOICE = "en-us"
+PIPER_VOICE = "en_US-ryan-high.onnx"
+QUEUE_SIZE = 4 # Reports waiting between two stages before submit() blocks
+
+GATEWAY_PORT = 8090 # python -m medevac.gateway
+GATEWAY_QUEUE = 16 # Reports that may wait behind the running ones before new ones get 503
+GATEWAY_PER_CLIENT = 2 # Reports one client may have in flight before it gets 429
+GATEWAY_MAX_AUDIO_S = 120 # Longest report accepted (decoded duration)
+GATEWAY_MAX_BODY_BYTES = 64 * 1024 * 1024 # Largest upload read at all (DoS guard; any format or rate fits)
+GATEWAY_SESSION_TTL_S = 900 # Idle sessions are forgotten after this long
+
+# =========================
+# SYSTEM PROMPT
+# =========================
+SYSTEM_PROMPT = """You are MedEvac-Gemma, a Tactical Combat Casualty Care (TCCC) AI assistant.
+
+Provide ONLY this format with NO additional text. STOP after WARNING. Do not add notes, confirmations, or additional instructions.
+
+ASSESSMENT:
+[One sentence: patient status and injuries]
+
+ACTION:
+[Numbered list: 3-4 immediate interventions]
+
+WARNING:
+[One sentence: critical concern]
+
+"""
@@ -0,0 +1,278 @@
+"""
+MedEvac-Gemma batch evaluation
+Score ASR + LLM candidates on a manifest of recordings and write
+full_eval.csv-style results
+
+ASR runs in a pool of worker processes (one model load per worker) and each
+transcript goes straight to an LLM thread pool sized to the servers' slots,
+so both stages stay busy. Every finished (audio, variant) result is appended
+to a checkpoint file; rerunning the same command skips what is already done.
+
+Usage:
+  python -m medevac.eval_runner MANIFEST.csv --asr-custom MODEL_PATH
+      [--asr-baseline MODEL_PATH] [--llm-custom URL ...] [--llm-baseline URL ...]
+      [--out full_eval.csv] [--asr-workers 2] [--llm-workers N]
+
+MANIFEST.csv needs `audio` and `gt` columns; audio paths are relative to the
+manifest. full_eval.csv itself is a valid manifest.
+"""
+
+import argparse
+import concurrent.futures
+import csv
+import json
+import multiprocessing
+import os
+import threading
+import time
+
+from medevac.asr import clean_transcription, load_asr, load_audio, transcribe
+from medevac.config import ASR_BACKEND, LEXICON_CORRECTION, LLM_ENDPOINTS, SAMPLE_RATE
+from medevac.lexicon import correct_transcript
+from medevac.llm import LLMClient, build_prompt
+from medevac.metrics import percentiles, score_response, wer
+
+# =========================
+# CONFIGURATION
+# =========================
+VARIANTS = ("custom", "baseline")
+COLUMNS = (
+    ["audio", "gt"]
+    + [f"{field}_{v}" for field in ("asr", "llm", "lat", "wer", "tccc_score", "effectiveness",
+                                    "failures", "failure_severity") for v in VARIANTS]
+)
+ASR_WORKERS = 2
+
+# =========================
+# MANIFEST / CHECKPOINT
+# =========================
+
+def read_manifest(path):
+    """Rows of {"audio", "gt", "path"} with audio resolved against the manifest"""
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, newline="") as f:
+        rows = [{"audio": r["audio"], "gt": r["gt"]} for r in csv.DictReader(f)]
+    for row in rows:
+        row["path"] = os.path.join(base, row["audio"])
+    return rows
+
+def load_checkpoint(path):
+    """{(audio, variant): result} from a previous run; a torn last line is ignored"""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path) as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue
+            done[(result["audio"], result["variant"])] = result
+    return done
+
+# =========================
+# ASR WORKERS
+# =========================
+
+_models = {}
+_threads = None  # per worker process, set by _init_worker
+
+def _init_worker(threads, backend):
+    global _threads
+    _threads = threads
+    if backend != "onnx":  # ONNX Runtime takes its threads per session, in _asr_task
+        import torch
+        torch.set_num_threads(threads)
+
+def _asr_task(model_path, audio_path):
+    """Transcribe one file in a worker process; returns (text, seconds)"""
+    if model_path not in _models:
+        _models[model_path] = load_asr(model_path, threads=_threads)
+    asr = _models[model_path]
+    t0 = time.time()
+    audio = load_audio(audio_path)
+    text = transcribe(asr, {"array": audio, "sampling_rate": SAMPLE_RATE})
+    return text, time.time() - t0
+
+# =========================
+# RUNNER
+# =========================
+
+class EvalRun:
+    """One resumable evaluation of up to two ASR + LLM variants"""
+
+    def __init__(self, manifest, out, asr_models, llm_endpoints,
+                 asr_workers=ASR_WORKERS, llm_workers=None):
+        self.rows = read_manifest(manifest)
+        self.out = out
+        self.checkpoint = f"{out}.ckpt.jsonl"
+        self.asr_models = asr_models  # variant -> model path
+        self.clients = {v: LLMClient(llm_endpoints[v]) for v in asr_models}
+        self.asr_workers = asr_workers
+        self.llm_workers = llm_workers
+        self.done = load_checkpoint(self.checkpoint)
+        self.errors = {}  # (audio, variant) -> why it has no result this run (log only)
+        self._lock = threading.Lock()
+
+    def run(self):
+        """Evaluate everything not in the checkpoint, then write the CSV"""
+        todo = [(row, v) for row in self.rows for v in self.asr_models
+                if (row["audio"], v) not in self.done]
+        print(f"✓ {len(self.rows)} recordings, {len(self.done)} results checkpointed, "
+              f"{len(todo)} to run")
+
+        if todo:
+            for client in self.clients.values():
+                if not client.healthy():
+                    print("❌ llama-server is not reachable")
+                    return False
+            self._evaluate(todo)
+
+        self.write_csv()
+        self.write_latency()
+        missing = sum((row["audio"], v) not in self.done
+                      for row in self.rows for v in self.asr_models)
+        if missing:
+            for (audio, variant), error in sorted(self.errors.items()):
+                print(f"  ❌ {audio} ({variant}): {error}")
+            print(f"⚠ {missing} results failed; rerun the same command to retry them")
+        return missing == 0
+
+    def _evaluate(self, todo):
+        llm_workers = self.llm_workers or sum(
+            e.n_slots for c in self.clients.values() for e in c.endpoints if e.healthy)
+        threads = max(1, (os.cpu_count() or 1) // self.asr_workers)
+        start = time.time()
+
+        asr_pool = concurrent.futures.ProcessPoolExecutor(
+            self.asr_workers, mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker, initargs=(threads, ASR_BACKEND))
+        llm_pool = concurrent.futures.ThreadPoolExecutor(llm_workers)
+        with asr_pool, llm_pool:
+            pending = {asr_pool.submit(_asr_task, self.asr_models[v], row["path"]): (row, v)
+                       for row, v in todo}
+            llm_jobs = {}
+            for future in concurrent.futures.as_completed(pending):
+                row, variant = pending[future]
+                try:
+                    text, asr_s = future.result()
+                except Exception as e:
+                    self._failed(row, variant, f"ASR failed: {e}")
+                    continue
+                future = llm_pool.submit(self._llm_task, row, variant, text, asr_s)
+                llm_jobs[future] = (row, variant)
+            for future in concurrent.futures.as_completed(llm_jobs):
+                try:
+                    future.result()
+                except Exception as e:
+                    self._failed(*llm_jobs[future], f"LLM failed: {e}")
+
+        print(f"✓ Evaluated {len(todo)} results in {time.time() - start:.1f}s "
+              f"({self.asr_workers} ASR workers, {llm_workers} LLM workers)")
+
+    def _llm_task(self, row, variant, asr_text, asr_s):
+        transcript = clean_transcription(asr_text)
+        if LEXICON_CORRECTION:
+            transcript = correct_transcript(transcript)  # as the pipeline does
+        prompt = build_prompt(transcript)
+        response, llm_s = self.clients[variant].complete(prompt)
+        if response is None:
+            self._failed(row, variant, "LLM failed to respond")
+            return
+
+        result = {"audio": row["audio"], "variant": variant, "asr": asr_text,
+                  "llm": response, "asr_s": asr_s, "llm_s": llm_s}
+        with self._lock:
+            with open(self.checkpoint, "a") as f:
+                f.write(json.dumps(result) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.done[(row["audio"], variant)] = result
+            n = len(self.done)
+        print(f"  [{n}] {row['audio']} {variant}: WER {wer(row['gt'], asr_text):.2f} | "
+              f"ASR {asr_s:.2f}s | LLM {llm_s:.2f}s")
+
+    def _failed(self, row, variant, error):
+        print(f"❌ {row['audio']} ({variant}): {error}")
+        with self._lock:
+            self.errors[(row["audio"], variant)] = error
+
+    def write_csv(self):
+        """Write results with the full_eval.csv columns (atomically; scoring: medevac.metrics)"""
+        tmp = f"{self.out}.tmp"
+        with open(tmp, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=COLUMNS)
+            writer.writeheader()
+            for row in self.rows:
+                out = {"audio": row["audio"], "gt": row["gt"]}
+                for v in VARIANTS:
+                    result = self.done.get((row["audio"], v))
+                    if result is None:
+                        continue
+                    latency = result["asr_s"] + result["llm_s"]
+                    out.update({f"asr_{v}": result["asr"], f"llm_{v}": result["llm"],
+                                f"lat_{v}": latency, f"wer_{v}": wer(row["gt"], result["asr"])})
+                    for field, value in score_response(result["llm"], latency).items():
+                        out[f"{field}_{v}"] = value
+                writer.writerow(out)
+        os.replace(tmp, self.out)
+        print(f"✓ Results written to {self.out}")
+
+    def write_latency(self):
+        """p50/p95/p99 per stage and variant, printed and written beside the CSV"""
+        path = f"{os.path.splitext(self.out)[0]}_latency.csv"
+        stats = []
+        for v in self.asr_models:
+            results = [r for (_, variant), r in self.done.items() if variant == v]
+            stages = {
+                "asr": [r["asr_s"] for r in results],
+                "llm": [r["llm_s"] for r in results],
+                "total": [r["asr_s"] + r["llm_s"] for r in results],
+            }
+            for stage, values in stages.items():
+                stats.append(dict(variant=v, stage=stage, n=len(values), **percentiles(values)))
+
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=["variant", "stage", "n", "p50", "p95", "p99"])
+            writer.writeheader()
+            writer.writerows(stats)
+
+        print("\nLatency (s)        p50     p95     p99")
+        for s in stats:
+            if s["n"]:
+                print(f"  {s['variant']:<8} {s['stage']:<6} "
+                      f"{s['p50']:6.2f}  {s['p95']:6.2f}  {s['p99']:6.2f}")
+        print(f"✓ Latency summary written to {path}")
+
+# =========================
+# MAIN
+# =========================
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch ASR + LLM evaluation")
+    parser.add_argument("manifest", help="CSV with audio and gt columns")
+    parser.add_argument("--out", default="full_eval.csv")
+    parser.add_argument("--asr-custom", required=True, help="fine-tuned ASR model path")
+    parser.add_argument("--asr-baseline", help="baseline ASR model path")
+    parser.add_argument("--llm-custom", nargs="+", default=LLM_ENDPOINTS,
+                        help="llama-server URLs serving the fine-tuned model")
+    parser.add_argument("--llm-baseline", nargs="+",
+                        help="llama-server URLs serving the baseline model "
+                             "(default: --llm-custom)")
+    parser.add_argument("--asr-workers", type=int, default=ASR_WORKERS)
+    parser.add_argument("--llm-workers", type=int,
+                        help="concurrent LLM requests (default: total server slots)")
+    args = parser.parse_args()
+
+    asr_models = {"custom": args.asr_custom}
+    llm_endpoints = {"custom": args.llm_custom}
+    if args.asr_baseline:
+        asr_models["baseline"] = args.asr_baseline
+        llm_endpoints["baseline"] = args.llm_baseline or args.llm_custom
+
+    run = EvalRun(args.manifest, args.out, asr_models, llm_endpoints,
+                  args.asr_workers, args.llm_workers)
+    raise SystemExit(0 if run.run() else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,803 @@
+"""
+MedEvac-Gemma gateway
+HTTP + WebSocket service that lets several medics' radios or handhelds
+share one ASR model and llama-server
+
+Every upload runs the same ASR → clean_transcription → lexicon → LLM path
+as chat.py and gets its TCCC result streamed back as JSON events; uploads
+that arrive together are transcribed in one batched forward pass. Reports
+are admitted against a fixed capacity: as many run at once as llama-server
+has slots (so none waits on the server and times out), a bounded number
+queue behind them, and anything beyond that is refused at once with a
+Retry-After estimate. Each client (X-Client-Id) is a session with its own
+limit on reports in flight, so one chatty radio cannot starve the rest.
+Slow clients only hold up their own connection: workers never write to a
+socket.
+
+Usage:
+  python -m medevac.gateway --asr MODEL_PATH [--port 8090] [--llm URL ...]
+                            [--llm-workers N] [--queue 16] [--per-client 2]
+                            [--supervise]
+
+API:
+  POST /v1/report   WAV/FLAC body (audio/wav), or raw 16-bit little-endian
+                    PCM (application/octet-stream, ?rate=16000). Answers with
+                    newline-delimited JSON events; 429/503 + Retry-After when
+                    the client or the gateway is at its limit, 413 past
+                    GATEWAY_MAX_AUDIO_S, 400 for unreadable audio or a bad rate.
+  GET  /v1/stream   WebSocket. Send binary frames of 16 kHz 16-bit PCM, then
+                    the text frame {"type": "end"} to submit the report;
+                    events for every report come back as text frames.
+  GET  /v1/stats    Sessions, queue depth, latency percentiles and, with
+                    --supervise, the llama-server process state
+  GET  /health
+
+Events: queued (position, eta_s), started, transcript, mist (preliminary
+MIST record and triage), sentence (streamed as generated), then result
+(response, tccc, timings) or error.
+"""
+
+import argparse
+import base64
+import collections
+import hashlib
+import io
+import itertools
+import json
+import math
+import queue
+import socket
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import requests
+
+from medevac.asr import load_asr, resample, to_mono, transcribe, warm_asr
+from medevac.batching import BatchTranscriber
+from medevac.cache import ResponseCache
+from medevac.config import (ASR_BATCH_SIZE, GATEWAY_MAX_AUDIO_S, GATEWAY_MAX_BODY_BYTES,
+                            GATEWAY_PER_CLIENT, GATEWAY_PORT, GATEWAY_QUEUE,
+                            GATEWAY_SESSION_TTL_S, LEXICON_CORRECTION, LLM_ENDPOINTS,
+                            LLM_SUPERVISE, RESPONSE_CACHE, SAMPLE_RATE, VAD, WARM_SLOTS)
+from medevac.llm import LLMClient, StreamCancelled
+from medevac.mist import extract_mist
+from medevac.metrics import percentiles
+from medevac.pipeline import (cached_response, parse_or_none, prepare_transcript, report_prompt,
+                              sentences, store_response, stream_sentences)
+from medevac.trace import tracer
+from medevac.vad import trim_silence
+
+# =========================
+# CONFIGURATION
+# =========================
+TERMINAL_EVENTS = ("result", "error")
+SERVICE_PRIOR_S = 3.0  # Assumed seconds per report until some have finished
+SERVICE_SMOOTHING = 0.2  # Weight of the newest report in the service time estimate
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+WS_MAX_FRAME = 1 << 20
+
+# =========================
+# SESSIONS / JOBS
+# =========================
+
+class Overloaded(Exception):
+    """A report refused at admission; `status` is 429 (client) or 503 (gateway)"""
+
+    def __init__(self, status, reason, retry_after):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+class Session:
+    """One client (radio / handheld): its reports in flight and running totals"""
+
+    def __init__(self, client_id):
+        self.id = client_id
+        self.created = self.last_seen = time.time()
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def as_dict(self):
+        return {"client": self.id, "in_flight": self.in_flight, "completed": self.completed,
+                "failed": self.failed, "rejected": self.rejected,
+                "idle_s": round(time.time() - self.last_seen, 1)}
+
+class Job:
+    """One report in the gateway; events go to `sink` (a queue's put by default)"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, session, audio, sink=None):
+        self.id = next(Job._ids)
+        self.session = session
+        self.audio = audio
+        self.transcript = None
+        self.mist = None
+        self.timings = {}
+        self.submitted = time.time()
+        self.transcribed = None
+        self.cancelled = False
+        self.finished = False
+        self._stream = None
+        self.events = None
+        if sink is None:
+            self.events = queue.Queue()
+            sink = self.events.put
+        self._sink = sink
+
+    def emit(self, event, **fields):
+        self._sink(dict(event=event, report=self.id, client=self.session.id, **fields))
+
+    def cancel(self):
+        """The client went away: skip remaining stages and stop generation"""
+        self.cancelled = True
+        stream = self._stream
+        if stream is not None:
+            stream.cancel()
+
+    def __iter__(self):
+        """Events up to and including the terminal one (default sink only)"""
+        while True:
+            event = self.events.get()
+            yield event
+            if event["event"] in TERMINAL_EVENTS:
+                return
+
+# =========================
+# GATEWAY
+# =========================
+
+class Gateway:
+    """Admission control, one ASR worker and one LLM worker per server slot"""
+
+    def __init__(self, asr, llm=None, llm_workers=None, max_queued=GATEWAY_QUEUE,
+                 per_client=GATEWAY_PER_CLIENT, cache=None, vad=VAD, lexicon=LEXICON_CORRECTION,
+                 batch=ASR_BATCH_SIZE):
+        self.asr = asr
+        self.batcher = BatchTranscriber(asr, max_batch=batch) if batch > 1 else None
+        self.llm = llm or LLMClient()
+        self.cache = cache or (ResponseCache() if RESPONSE_CACHE else None)
+        self.vad = vad
+        self.lexicon = lexicon
+        # More concurrent requests than slots would only queue inside llama-server
+        self.llm_workers = llm_workers or max(1, sum(e.n_slots for e in self.llm.endpoints
+                                                     if e.healthy))
+        self.capacity = self.llm_workers + max_queued
+        self.per_client = per_client
+        self.sessions = {}
+        self.rejected = 0
+        self.latency = collections.deque(maxlen=1000)  # submit → result seconds
+        self.queue_wait = collections.deque(maxlen=1000)
+        self._in_system = 0
+        self._service_s = SERVICE_PRIOR_S
+        self._lock = threading.Lock()
+
+        # Admission bounds what these queues can hold
+        self.asr_queue = queue.Queue()
+        self.llm_queue = queue.Queue()
+        self._threads = [threading.Thread(target=self._asr_worker, name="gateway-asr",
+                                          daemon=True)]
+        self._threads += [threading.Thread(target=self._llm_worker, name=f"gateway-llm-{i}",
+                                           daemon=True) for i in range(self.llm_workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, client_id, audio, sink=None):
+        """Admit a report (mono float32 at SAMPLE_RATE) or raise Overloaded"""
+        with self._lock:
+            session = self._session(client_id)
+            if session.in_flight >= self.per_client:
+                session.rejected += 1
+                self.rejected += 1
+                raise Overloaded(429, f"{self.per_client} reports already in flight for "
+                                      f"this client", self._service_s)
+            if self._in_system >= self.capacity:
+                session.rejected += 1
+                self.rejected += 1
+                raise Overloaded(503, "gateway at capacity", self._wait_estimate(self._in_system))
+            position = max(0, self._in_system - self.llm_workers)
+            eta = self._wait_estimate(self._in_system)
+            self._in_system += 1
+            session.in_flight += 1
+
+        job = Job(session, audio, sink)
+        job.emit("queued", position=position, eta_s=round(eta, 2))
+        self.asr_queue.put(job)
+        return job
+
+    def stats(self):
+        """Snapshot for /v1/stats"""
+        with self._lock:
+            sessions = [s.as_dict() for s in self.sessions.values()]
+            in_system = self._in_system
+            service = self._service_s
+        supervisor = self.llm.supervisor
+        return {"in_system": in_system, "queued": max(0, in_system - self.llm_workers),
+                "capacity": self.capacity, "llm_workers": self.llm_workers,
+                "rejected": self.rejected, "service_s": round(service, 3),
+                "latency_s": percentiles(list(self.latency)),
+                "queue_wait_s": percentiles(list(self.queue_wait)),
+                "llm_server": supervisor.status() if supervisor is not None else None,
+                "sessions": sessions}
+
+    def close(self):
+        """Finish admitted reports and stop the workers"""
+        self.asr_queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def _session(self, client_id):
+        now = time.time()
+        for sid in [sid for sid, s in self.sessions.items()
+                    if not s.in_flight and now - s.last_seen > GATEWAY_SESSION_TTL_S]:
+            del self.sessions[sid]
+        session = self.sessions.get(client_id)
+        if session is None:
+            session = self.sessions[client_id] = Session(client_id)
+        session.last_seen = now
+        return session
+
+    def _wait_estimate(self, in_system):
+        """Seconds until a report admitted behind `in_system` others starts its LLM stage"""
+        ahead = in_system - self.llm_workers + 1
+        return max(0.0, self._service_s * ahead / self.llm_workers)
+
+    # ASR stage
+    def _asr_worker(self):
+        while True:
+            job = self.asr_queue.get()
+            if job is None:
+                if self.batcher is not None:
+                    self.batcher.close()  # hands its last reports to the LLM stage
+                for _ in range(self.llm_workers):
+                    self.llm_queue.put(None)
+                return
+            try:
+                self._asr_stage(job)
+            except Exception as e:
+                # Never lose the worker (or the job's admission slot)
+                self._finish(job, f"ASR stage error: {e}")
+
+    def _asr_stage(self, job):
+        if job.cancelled:
+            self._finish(job, "Cancelled")
+            return
+
+        t0 = time.time()
+        job.timings["queue"] = t0 - job.submitted
+        job.emit("started", queue_s=round(job.timings["queue"], 3))
+        audio, job.audio = self._trim(job.audio), None
+        if self.batcher is None:
+            self._transcribed(job, t0, lambda: transcribe(
+                self.asr, {"array": audio, "sampling_rate": SAMPLE_RATE}))
+        else:
+            # Reports that arrive together share forward passes; the rest
+            # of the stage runs on the batcher's thread when the text is ready
+            self.batcher.submit(audio).add_done_callback(
+                lambda future, job=job, t0=t0: self._transcribed(job, t0, future.result))
+
+    def _transcribed(self, job, t0, result):
+        """Clean up a transcript and pass the report on to the LLM stage"""
+        try:
+            self._transcribed_stage(job, t0, result)
+        except Exception as e:
+            # On the batcher's thread a lost exception would leave the job unanswered
+            self._finish(job, f"ASR stage error: {e}")
+
+    def _transcribed_stage(self, job, t0, result):
+        try:
+            transcript = prepare_transcript(result(), self.lexicon)
+        except Exception as e:
+            self._finish(job, f"ASR error: {e}")
+            return
+        job.transcribed = time.time()
+        job.timings["asr"] = job.transcribed - t0
+        tracer.record("gateway.asr", t0, job.transcribed, trace=job.id)
+
+        if not transcript:
+            self._finish(job, "No speech recognized")
+            return
+        job.transcript = transcript
+        job.emit("transcript", text=transcript)
+        job.mist = extract_mist(transcript)
+        job.emit("mist", **job.mist.as_dict())
+        self.llm_queue.put(job)
+
+    def _trim(self, audio):
+        if not self.vad:
+            return audio
+        trimmed, _ = trim_silence(audio, SAMPLE_RATE)
+        return trimmed
+
+    # LLM stage
+    def _llm_worker(self):
+        while True:
+            job = self.llm_queue.get()
+            if job is None:
+                return
+            try:
+                self._llm_stage(job)
+            except Exception as e:
+                self._finish(job, f"LLM stage error: {e}")
+
+    def _llm_stage(self, job):
+        if job.cancelled:
+            self._finish(job, "Cancelled")
+            return
+        t0 = time.time()
+        job.timings["llm_queue"] = t0 - job.transcribed
+        cached = cached_response(self.cache, job.transcript)
+        if cached is not None:
+            job.timings.update(llm=time.time() - t0, cached=True)
+            for chunk in sentences(cached):
+                job.emit("sentence", text=chunk)
+            self._finish(job, response=cached, parsed=parse_or_none(cached))
+            return
+
+        try:
+            response = self._generate(job)
+        except StreamCancelled:
+            self._finish(job, "Cancelled")
+            return
+        except requests.exceptions.RequestException as e:
+            self._finish(job, f"LLM server error: {e}")
+            return
+        if not response:
+            self._finish(job, "LLM failed to respond")
+            return
+        job.timings["llm"] = time.time() - t0
+        self._finish(job, response=response,
+                     parsed=store_response(self.cache, job.transcript, response))
+
+    def _generate(self, job):
+        stream = self.llm.stream(report_prompt(job.transcript, job.mist))
+        job._stream = stream
+        if job.cancelled:
+            stream.cancel()
+        with tracer.span("gateway.llm", trace=job.id):
+            response = stream_sentences(stream, lambda chunk: job.emit("sentence", text=chunk))
+        job.timings.update(ttft=stream.ttft, tokens_per_s=stream.tokens_per_s)
+        return response
+
+    def _finish(self, job, error=None, response=None, parsed=None):
+        total = time.time() - job.submitted
+        with self._lock:
+            if job.finished:
+                return  # a stage failed after already answering; count it once
+            job.finished = True
+            self._in_system -= 1
+            job.session.in_flight -= 1
+            job.session.last_seen = time.time()
+            if error:
+                job.session.failed += 1
+            else:
+                job.session.completed += 1
+                self.latency.append(total)
+                self.queue_wait.append(job.timings.get("queue", 0.0)
+                                       + job.timings.get("llm_queue", 0.0))
+                # A cache hit takes no LLM slot, so it says nothing about the wait for one
+                if "llm" in job.timings and not job.timings.get("cached"):
+                    self._service_s += SERVICE_SMOOTHING * (job.timings["llm"] - self._service_s)
+        tracer.record("gateway.report", job.submitted, time.time(), trace=job.id, error=error)
+
+        if error:
+            job.emit("error", error=error)
+            return
+        job.timings["total"] = total
+        job.emit("result", transcript=job.transcript, response=response,
+                 tccc=parsed.as_dict() if parsed is not None else None,
+                 timings={k: round(v, 3) if isinstance(v, float) else v
+                          for k, v in job.timings.items() if v is not None})
+
+# =========================
+# AUDIO
+# =========================
+
+class AudioTooLong(ValueError):
+    """An upload that decodes to more than the gateway accepts (413)"""
+
+def parse_rate(value):
+    """Sample rate of raw PCM from ?rate= or a WebSocket "end" message"""
+    try:
+        rate = int(value)
+    except (TypeError, ValueError):
+        rate = 0
+    if rate <= 0:
+        raise ValueError(f"rate must be a positive number of Hz, not {value!r}")
+    return rate
+
+def decode_audio(body, content_type, rate=SAMPLE_RATE, max_s=None):
+    """Mono float32 at SAMPLE_RATE from an uploaded file or raw 16-bit PCM
+
+    The duration is checked against `max_s` before resampling, so neither
+    a low ?rate= nor a well-compressed file can make a small upload
+    expand into a huge array.
+    """
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type in ("application/octet-stream", "audio/pcm"):
+        rate = parse_rate(rate)
+        if len(body) % 2:
+            raise ValueError("PCM body has an odd number of bytes")
+        check_duration(len(body) // 2, rate, max_s)
+        audio = np.frombuffer(body, dtype="<i2").astype(np.float32) / 32768
+        return resample(audio, rate)
+
+    import soundfile as sf
+
+    try:
+        with sf.SoundFile(io.BytesIO(body)) as f:
+            sr = f.samplerate
+            # One frame past the limit is enough to know it is too long
+            audio = f.read(-1 if max_s is None else int(max_s * sr) + 1, dtype="float32")
+    except Exception as e:
+        raise ValueError(f"Unreadable audio: {e}") from None
+    check_duration(len(audio), sr, max_s)
+    return resample(to_mono(audio), sr)
+
+def check_duration(n_samples, rate, max_s):
+    if max_s is not None and n_samples > max_s * rate:
+        raise AudioTooLong(f"reports are limited to {max_s}s")
+
+# =========================
+# WEBSOCKET
+# =========================
+
+def ws_accept_key(key):
+    return base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+
+class WebSocket:
+    """Minimal RFC 6455 framing over a socket's file objects
+
+    The server side reads masked frames and writes unmasked ones; the
+    client side (mask=True) the other way round. Fragmented messages are
+    reassembled; ping is answered with pong.
+    """
+
+    TEXT, BINARY, CLOSE, PING, PONG = 0x1, 0x2, 0x8, 0x9, 0xA
+
+    def __init__(self, rfile, wfile, mask=False):
+        self.rfile = rfile
+        self.wfile = wfile
+        self.mask = mask
+        self._write_lock = threading.Lock()
+
+    def send(self, data, opcode=None):
+        """Send a str as a text frame or bytes as a binary frame"""
+        if isinstance(data, str):
+            data, opcode = data.encode(), opcode or self.TEXT
+        opcode = opcode or self.BINARY
+        n = len(data)
+        header = bytes([0x80 | opcode])
+        mask_bit = 0x80 if self.mask else 0
+        if n < 126:
+            header += bytes([mask_bit | n])
+        elif n < 1 << 16:
+            header += bytes([mask_bit | 126]) + struct.pack("!H", n)
+        else:
+            header += bytes([mask_bit | 127]) + struct.pack("!Q", n)
+        if self.mask:
+            key = np.random.bytes(4)
+            header += key
+            data = apply_mask(data, key)
+        with self._write_lock:
+            self.wfile.write(header + data)
+            self.wfile.flush()
+
+    def send_json(self, obj):
+        self.send(json.dumps(obj))
+
+    def recv(self):
+        """(opcode, payload) of the next message; CLOSE at end of stream"""
+        message, message_opcode = [], None
+        while True:
+            head = self.rfile.read(2)
+            if len(head) < 2:
+                return self.CLOSE, b""
+            fin, opcode = head[0] & 0x80, head[0] & 0x0F
+            masked, n = head[1] & 0x80, head[1] & 0x7F
+            if n == 126:
+                n = struct.unpack("!H", self.rfile.read(2))[0]
+            elif n == 127:
+                n = struct.unpack("!Q", self.rfile.read(8))[0]
+            if n > WS_MAX_FRAME:
+                raise ValueError(f"WebSocket frame of {n} bytes")
+            key = self.rfile.read(4) if masked else None
+            payload = self.rfile.read(n)
+            if len(payload) < n:
+                return self.CLOSE, b""
+            if key is not None:
+                payload = apply_mask(payload, key)
+
+            if opcode == self.PING:
+                self.send(payload, self.PONG)
+                continue
+            if opcode == self.PONG:
+                continue
+            if opcode == self.CLOSE:
+                return self.CLOSE, payload
+            if opcode:  # first frame of a message; 0 is a continuation
+                message_opcode = opcode
+            message.append(payload)
+            if fin:
+                data = b"".join(message)
+                return message_opcode, data.decode() if message_opcode == self.TEXT else data
+
+    def close(self):
+        try:
+            self.send(b"", self.CLOSE)
+        except OSError:
+            pass
+
+def apply_mask(data, key):
+    mask = np.resize(np.frombuffer(key, dtype=np.uint8), len(data))
+    return (np.frombuffer(data, dtype=np.uint8) ^ mask).tobytes()
+
+def connect_websocket(url, headers=None, timeout=30):
+    """Client WebSocket to ws://host:port/path (used by the load client)"""
+    parts = urlsplit(url)
+    sock = socket.create_connection((parts.hostname, parts.port or 80), timeout=timeout)
+    key = base64.b64encode(np.random.bytes(16)).decode()
+    path = parts.path + (f"?{parts.query}" if parts.query else "")
+    lines = [f"GET {path or '/'} HTTP/1.1", f"Host: {parts.netloc}", "Upgrade: websocket",
+             "Connection: Upgrade", f"Sec-WebSocket-Key: {key}", "Sec-WebSocket-Version: 13"]
+    lines += [f"{k}: {v}" for k, v in (headers or {}).items()]
+    sock.sendall(("\r\n".join(lines) + "\r\n\r\n").encode())
+
+    rfile = sock.makefile("rb")
+    status = rfile.readline().decode()
+    response_headers = {}
+    while (line := rfile.readline().decode().strip()):
+        name, _, value = line.partition(":")
+        response_headers[name.strip().lower()] = value.strip()
+    if " 101 " not in status or response_headers.get("sec-websocket-accept") != ws_accept_key(key):
+        sock.close()
+        raise ConnectionError(f"WebSocket handshake failed: {status.strip()}")
+    ws = WebSocket(rfile, sock.makefile("wb"), mask=True)
+    ws.sock = sock
+    return ws
+
+# =========================
+# HTTP SERVER
+# =========================
+
+class GatewayServer(ThreadingHTTPServer):
+    """One thread per connection; all of them share the Gateway"""
+
+    daemon_threads = True
+
+    def __init__(self, gateway, host="127.0.0.1", port=GATEWAY_PORT):
+        self.gateway = gateway
+        super().__init__((host, port), GatewayHandler)
+        self.url = f"http://{host}:{self.server_address[1]}"
+
+class GatewayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    @property
+    def gateway(self):
+        return self.server.gateway
+
+    def _json(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _overloaded(self, e):
+        self._json(e.status, {"error": e.reason, "retry_after": round(e.retry_after, 2)},
+                   {"Retry-After": str(max(1, math.ceil(e.retry_after)))})
+
+    def _client_id(self, query):
+        return (self.headers.get("X-Client-Id") or query.get("client", [None])[0]
+                or self.client_address[0])
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/health":
+            self._json(200, {"status": "ok"})
+        elif url.path == "/v1/stats":
+            self._json(200, self.gateway.stats())
+        elif url.path == "/v1/stream":
+            self._websocket(parse_qs(url.query))
+        else:
+            self._json(404, {"error": "not found"})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != "/v1/report":
+            self._json(404, {"error": "not found"})
+            return
+        query = parse_qs(url.query)
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            length = -1
+        if length < 0:
+            self._json(400, {"error": "bad Content-Length"})
+            self.close_connection = True
+            return
+        # Only a bound on what we read; the duration limit is checked on the decoded audio
+        if length > GATEWAY_MAX_BODY_BYTES:
+            self._json(413, {"error": f"request body over {GATEWAY_MAX_BODY_BYTES} bytes"})
+            self.close_connection = True
+            return
+        body = self.rfile.read(length)
+        try:
+            audio = decode_audio(body, self.headers.get("Content-Type"),
+                                 query.get("rate", [SAMPLE_RATE])[0], GATEWAY_MAX_AUDIO_S)
+        except AudioTooLong as e:
+            self._json(413, {"error": str(e)})
+            return
+        except ValueError as e:
+            self._json(400, {"error": str(e)})
+            return
+
+        try:
+            job = self.gateway.submit(self._client_id(query), audio)
+        except Overloaded as e:
+            self._overloaded(e)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for event in job:
+                line = (json.dumps(event) + "\n").encode()
+                self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            job.cancel()
+            self.close_connection = True
+
+    def _websocket(self, query):
+        key = self.headers.get("Sec-WebSocket-Key")
+        if self.headers.get("Upgrade", "").lower() != "websocket" or not key:
+            self._json(400, {"error": "expected a WebSocket upgrade"})
+            return
+        self.send_response(101)
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", ws_accept_key(key))
+        self.end_headers()
+        self.wfile.flush()
+        self.close_connection = True
+
+        ws = WebSocket(self.rfile, self.wfile)
+        client_id = self._client_id(query)
+        # Workers put events here and return; only this connection's sender
+        # thread ever blocks on the client
+        outbox = queue.Queue()
+        jobs = []
+        sender = threading.Thread(target=self._send_events, args=(ws, outbox, jobs), daemon=True)
+        sender.start()
+
+        chunks, n_bytes, overflow = [], 0, False
+        try:
+            while True:
+                opcode, data = ws.recv()
+                if opcode == WebSocket.CLOSE:
+                    break
+                if opcode == WebSocket.BINARY:
+                    n_bytes += len(data)
+                    if n_bytes > GATEWAY_MAX_BODY_BYTES:
+                        overflow = True  # keep reading until "end", then refuse
+                    else:
+                        chunks.append(data)
+                    continue
+                try:
+                    message = json.loads(data)
+                except ValueError:
+                    outbox.put({"event": "error", "error": "expected JSON text frames"})
+                    continue
+                if not isinstance(message, dict) or message.get("type") != "end":
+                    continue
+                pcm, chunks, n_bytes = b"".join(chunks), [], 0
+                if overflow:
+                    overflow = False
+                    outbox.put({"event": "rejected", "status": 413,
+                                "error": f"report over {GATEWAY_MAX_BODY_BYTES} bytes"})
+                    continue
+                try:
+                    audio = decode_audio(pcm[:len(pcm) - len(pcm) % 2], "audio/pcm",
+                                         message.get("rate", SAMPLE_RATE), GATEWAY_MAX_AUDIO_S)
+                    jobs.append(self.gateway.submit(client_id, audio, sink=outbox.put))
+                except Overloaded as e:
+                    outbox.put({"event": "rejected", "status": e.status, "error": e.reason,
+                                "retry_after": round(e.retry_after, 2)})
+                except AudioTooLong as e:
+                    outbox.put({"event": "rejected", "status": 413, "error": str(e)})
+                except ValueError as e:
+                    outbox.put({"event": "rejected", "status": 400, "error": str(e)})
+        except (OSError, ValueError):
+            pass
+        finally:
+            for job in jobs:
+                job.cancel()  # nobody is left to hear the answer
+            outbox.put(None)
+            sender.join()
+            ws.close()
+
+    def _send_events(self, ws, outbox, jobs):
+        while True:
+            event = outbox.get()
+            if event is None:
+                return
+            try:
+                ws.send_json(event)
+            except OSError:
+                for job in jobs:
+                    job.cancel()
+                return
+
+# =========================
+# MAIN
+# =========================
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-client MedEvac-Gemma gateway")
+    parser.add_argument("--asr", required=True, help="ASR model path")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=GATEWAY_PORT)
+    parser.add_argument("--llm", nargs="+", default=LLM_ENDPOINTS, help="llama-server URLs")
+    parser.add_argument("--llm-workers", type=int,
+                        help="concurrent LLM requests (default: total server slots)")
+    parser.add_argument("--queue", type=int, default=GATEWAY_QUEUE,
+                        help="reports that may wait behind the running ones")
+    parser.add_argument("--per-client", type=int, default=GATEWAY_PER_CLIENT)
+    parser.add_argument("--asr-batch", type=int, default=ASR_BATCH_SIZE,
+                        help="clips per batched ASR forward pass (1 disables batching)")
+    parser.add_argument("--supervise", action="store_true", default=LLM_SUPERVISE,
+                        help="launch llama-server (medevac.supervisor) and restart it if it dies")
+    args = parser.parse_args()
+
+    llm = LLMClient(args.llm)
+    if args.supervise:
+        from medevac.supervisor import LlamaSupervisor
+        llm.supervisor = LlamaSupervisor().start()
+        if not llm.supervisor.wait_ready():
+            print(f"❌ llama-server did not start: {llm.supervisor.reason or llm.supervisor.state}")
+            raise SystemExit(1)
+    if not llm.healthy():
+        print("❌ llama-server is not reachable")
+        raise SystemExit(1)
+    if WARM_SLOTS:
+        warmed, warm_time = llm.warm_up()
+        print(f"  🔥 KV cache warmed: {warmed} slot(s) in {warm_time:.2f}s")
+
+    print("📡 Loading ASR model...")
+    asr = load_asr(args.asr)
+    warm_asr(asr)
+
+    gateway = Gateway(asr, llm, args.llm_workers, args.queue, args.per_client,
+                      batch=args.asr_batch)
+    server = GatewayServer(gateway, args.host, args.port)
+    print(f"✓ Gateway on {server.url} ({gateway.llm_workers} LLM workers, "
+          f"{gateway.capacity - gateway.llm_workers} queued, {args.per_client} per client)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+    gateway.close()
+    if gateway.batcher is not None:
+        print(gateway.batcher.stats())
+
+if __name__ == "__main__":
+    main()
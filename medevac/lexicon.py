@@ -0,0 +1,259 @@
+"""
+MedEvac-Gemma lexicon correction
+Post-ASR fix-up of near-miss TCCC terms, callsigns and vitals units
+
+medasr-mil gets most of a report right but misses in recurring ways:
+"SpO<unk>" for SpO₂, "Helix3" for Helix-3, truncated or misspelled terms
+("Turniqu", "tournique", "casuality"). A word that is not in the
+vocabulary is looked up in a SymSpell-style deletion index (whole-word
+near misses) and then in a second one built from the beginnings of TCCC
+terms (truncated words). Both lookups are dictionary hits plus a few small
+edit distances, so a transcript costs about half a millisecond with
+nothing cached and a fraction of that once its words have been seen.
+Known words, short words and numbers are left alone.
+"""
+
+import collections
+import functools
+import math
+import re
+
+# =========================
+# VOCABULARY
+# =========================
+# Domain terms: correction targets, and completable from a truncated prefix
+TERMS = """
+tourniquet tourniquets hemorrhage hemorrhaging hemostatic hemothorax pneumothorax hematoma
+casualty casualties medic corpsman airway breathing respirations respiration respiratory
+circulation capillary refill distal proximal perfusion pulses radial carotid femoral
+junctional extremity extremities laceration lacerations amputation amputations fracture
+fractures abdominal abdomen thoracic pelvic pelvis binder splint shrapnel fragment
+fragmentation penetrating perforating ricochet explosive detonation concussion
+consciousness unconscious unresponsive responsive oriented disoriented combative
+hypothermia hypothermic hyperthermia hyperthermic dehydration dehydrated hypotension
+hypotensive hypertension hypertensive hypovolemia hypovolemic hypoxia hypoxic
+tachycardia tachycardic bradycardia bradycardic tachypnea tachypneic bradypnea cyanosis
+cyanotic diaphoretic decompression
+cricothyrotomy nasopharyngeal intubation occlusive dressing packing bandage analgesia
+analgesic ketamine fentanyl morphine antibiotics tranexamic saline plasma transfusion
+resuscitation evacuation reassess reassessment monitoring systolic diastolic saturation
+oxygen protocol trauma suspected bilateral posterior anterior lateral evisceration
+controlled uncontrolled continuous hemodynamic neurological contusion hematoma emphysema
+subcutaneous rewarming immersion exposure hyperventilating hyperventilation
+hypoventilating hypoventilation unequal diminished
+""".split()
+
+# Callsign words on the net: "Helix3" / "helix 3" are written "Helix-3" wherever they appear
+CALLSIGNS = """
+Dustoff Pedro Helix Bastionblade Bastionlance Bastionwatch Blacklance Citadelspike
+Citadelveil Frostguard Frostlance Guardianveil Ironclasp Ironshade Ironspire Ironwarden
+Nightspire Overwatchforge Rampartblade Rampartveil Sentinelblade Sentinelforge
+Sentinelguard Steelspike Steelwarden Stormcitadel Stormveil Talonveil Titanforge Warblade
+Warspike Warwarden
+""".split()
+
+ACRONYMS = "MEDEVAC CASEVAC MARCH TCCC TFC CCP GSW IED TXA IV IO HR BP RR AVPU GCS TBI".split()
+
+COMMON = """
+ai this is in at with to and of the a an on for from after before during no not patient
+applied present absent intact stable unstable rapid shallow labored normal severe moderate
+mild minor major heavy weak strong dizzy anxious alert pale skin wound wounds exit entry
+bleeding blood left right upper lower ankle knee thigh femur tibia calf foot toes toe hand
+wrist forearm elbow arm bicep biceps shoulder clavicle neck face orbital jaw scalp head
+spine spinal lumbar cervical flank groin hip chest lung lungs rib ribs sternum spleen
+liver kidney bowel burns burn partial thickness confirm urgent priority routine litter
+vital vitals signs mental status pain sounds rise fall fell vehicle mounted rollover
+blast injury injuries related weapon fire gunshot fragment debris building collapse
+rooftop hatch armored seal needle delayed showing reduced limited expanding
+swelling range motion grip strength possible probable likely evac prep prepare
+continued improving worsening breath clear ears eyes responding conscious hydration
+control confirmed pulse watch spike steal following external internal interval visible
+noted rupture placement tension report unknown multiple single
+""".split()
+
+# =========================
+# PATTERNS
+# =========================
+SPO2 = re.compile(r"\bsp\s?[o0]\s?(?:2|₂|<unk>)", re.I)
+# Any word after "this is", or a CALLSIGNS word anywhere, then its number
+CALLSIGN = r"\b(?:(?<=this is )[A-Za-z]+|{words})[ -]?\d{{1,3}}\b"
+TOKEN = re.compile(r"^(\W*)(.*?)(\W*)$")
+
+MIN_LENGTH = 5  # Shorter words are never corrected
+MIN_COMMON_LENGTH = 7  # Short everyday words are too close to each other to guess at
+SUFFIXES = ("s", "es", "ed", "d", "ing", "ly")  # Inflections of a known word are known
+PREFIX_COVER = 0.7  # A truncated word must cover this much of the term
+OPPOSITES = (("hypo", "hyper"), ("brady", "tachy"), ("intra", "extra"), ("pre", "post"),
+             ("under", "over"), ("inhal", "exhal"))  # Prefixes a correction never swaps
+FORMS = ("ia", "ic", "ive", "ion", "ing", "ed", "al")  # Word-form endings a correction never swaps
+
+# =========================
+# DISTANCE
+# =========================
+
+def edit_distance(a, b, limit=None):
+    """Optimal string alignment distance (Levenshtein + adjacent transpositions)"""
+    if limit is not None and abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2, prev = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        row = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            row[j] = min(prev[j] + 1, row[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                row[j] = min(row[j], prev2[j - 2] + 1)
+        if limit is not None and min(row) > limit:
+            return limit + 1
+        prev2, prev = prev, row
+    return prev[-1]
+
+def deletes(word, distance):
+    """All strings reachable from `word` by up to `distance` deletions"""
+    out = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        out |= frontier
+    return out
+
+# =========================
+# LEXICON
+# =========================
+
+class Lexicon:
+    """Deletion indexes over a vocabulary and over the beginnings of its terms"""
+
+    def __init__(self, terms=TERMS, acronyms=ACRONYMS, common=COMMON, callsigns=CALLSIGNS,
+                 max_distance=2):
+        self.max_distance = max_distance
+        self.callsigns = {c.lower(): c for c in callsigns}
+        words = "|".join(sorted(map(re.escape, self.callsigns), key=len, reverse=True))
+        self.callsign = re.compile(CALLSIGN.format(words=words or "(?!)"), re.I)
+        self.canonical = {}  # lowercase -> preferred spelling
+        for word in list(common) + list(terms) + list(acronyms):
+            self.canonical[word.lower()] = word
+        self.terms = {t.lower() for t in terms}
+
+        self.index = collections.defaultdict(set)
+        for word in self.canonical:
+            if len(word) >= MIN_LENGTH - max_distance:
+                for variant in deletes(word, max_distance):
+                    self.index[variant].add(word)
+
+        # Truncated terms: beginnings of each TCCC term, indexed the same way
+        self.prefixes = collections.defaultdict(set)  # prefix -> terms it begins
+        self.prefix_index = collections.defaultdict(set)
+        for term in self.terms:
+            for end in range(math.ceil(PREFIX_COVER * len(term)), len(term)):
+                self.prefixes[term[:end]].add(term)
+        for prefix in self.prefixes:
+            for variant in deletes(prefix, max_distance):
+                self.prefix_index[variant].add(prefix)
+
+        self.correct_word = functools.lru_cache(maxsize=4096)(self._correct_word)
+
+    def correct(self, text):
+        """Corrected transcript; punctuation and capitalization are kept"""
+        text = SPO2.sub("SpO₂", text)
+        text = self.callsign.sub(self._callsign, text)
+        return " ".join(self._correct_token(t) for t in text.split())
+
+    def _callsign(self, match):
+        word, number = re.match(r"([A-Za-z]+)[ -]?(\d+)", match.group()).groups()
+        return f"{self.callsigns.get(word.lower(), word)}-{number}"
+
+    def _correct_token(self, token):
+        lead, core, trail = TOKEN.match(token).groups()
+        if not core:
+            return token
+        parts = [self.correct_word(part) for part in core.split("-")]
+        return lead + "-".join(parts) + trail
+
+    def _correct_word(self, word):
+        lower = word.lower()
+        if lower in self.canonical:
+            canonical = self.canonical[lower]
+            return canonical if canonical.isupper() else word
+        if len(word) < MIN_LENGTH or not word.isalpha() or self._inflected(lower):
+            return word
+
+        distance = 1 if len(word) < 8 else self.max_distance
+        variants = deletes(lower, distance)
+        best = self._nearest(lower, variants, distance) or self._complete(lower, variants, distance)
+        return word if best is None else match_case(word, self.canonical[best])
+
+    def _nearest(self, word, variants, distance):
+        """Closest vocabulary word within `distance` edits"""
+        candidates = set()
+        for variant in variants:
+            candidates |= self.index.get(variant, set())
+        if len(word) < MIN_COMMON_LENGTH:
+            candidates &= self.terms
+        scored = [(edit_distance(word, c, distance), c not in self.terms,
+                   abs(len(c) - len(word)), c)
+                  for c in candidates if not changes_meaning(word, c)]
+        scored = [s for s in scored if s[0] <= distance]
+        return min(scored)[-1] if scored else None
+
+    def _complete(self, word, variants, distance):
+        """TCCC term whose beginning the (truncated) word matches within `distance`"""
+        prefixes = set()
+        for variant in variants:
+            prefixes |= self.prefix_index.get(variant, set())
+        # ASR rarely gets the first letter wrong; requiring it avoids wild completions
+        scored = [(edit_distance(word, p, distance), len(term), term)
+                  for p in prefixes if p[0] == word[0]
+                  for term in self.prefixes[p] if not changes_meaning(word, term)]
+        scored = [s for s in scored if s[0] <= distance]
+        return min(scored)[-1] if scored else None
+
+    def _inflected(self, word):
+        return any(word.endswith(s) and word[:-len(s)] in self.canonical for s in SUFFIXES)
+
+def changes_meaning(word, candidate):
+    """True if swapping `word` for `candidate` could change what the report says
+
+    "hypertensive" is not a near miss of "hypotensive", nor "bradycardic" of
+    "bradycardia": opposite prefixes, added affixes and other word forms are
+    left as the ASR heard them.
+    """
+    forms = word_form(word), word_form(candidate)
+    return front_affix(word, candidate) or opposite_prefix(word, candidate) or \
+        (all(forms) and forms[0] != forms[1])
+
+def opposite_prefix(word, candidate):
+    """True if the words start with opposite prefixes ("hypo-" / "hyper-")"""
+    return any(word.startswith(a) and candidate.startswith(b) or
+               word.startswith(b) and candidate.startswith(a) for a, b in OPPOSITES)
+
+def word_form(word):
+    """Word-form ending of `word` ("ic", "ia", ...), "" if none"""
+    return next((f for f in FORMS if word.endswith(f)), "")
+
+def front_affix(word, candidate):
+    """True if one word is the other plus a leading affix ("conscious" / "unconscious")
+
+    Such a "correction" would flip the meaning of a report, never fix it.
+    """
+    short, long = sorted((word, candidate), key=len)
+    return len(long) - len(short) >= 2 and long.endswith(short)
+
+def match_case(original, word):
+    """Give `word` the capitalization pattern of `original`"""
+    if word.isupper() or any(c.isupper() for c in word[1:]):
+        return word  # acronyms and mixed-case units keep their own form
+    if original.isupper() and len(original) > 1:
+        return word.upper()
+    if original[0].isupper():
+        return word[0].upper() + word[1:]
+    return word
+
+@functools.lru_cache(maxsize=1)
+def default_lexicon():
+    """Shared Lexicon over the built-in TCCC vocabulary (built on first use)"""
+    return Lexicon()
+
+def correct_transcript(text):
+    """Fix near-miss TCCC terms, callsigns and SpO₂ in a cleaned transcript"""
+    return default_lexicon().correct(text)
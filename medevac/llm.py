@@ -0,0 +1,522 @@
+"""
+MedEvac-Gemma LLM access
+Pooled client for one or more llama-server endpoints
+
+The client keeps a keep-alive connection pool, routes each request to the
+least-loaded healthy endpoint (from /health and /slots), bounds every
+request by a total latency budget, and fails over to another endpoint when
+one dies or stalls mid-generation.
+
+Every slot is prefilled with the system-prompt prefix at startup and
+requests are pinned to warm slots with `id_slot`, so no report pays the
+full prefill. Slots that lose the prefix are re-warmed in the background.
+
+A stream can be cancelled from another thread (barge-in): its socket is
+shut down, which wakes the reader at once, and llama-server stops
+generating and frees the slot as soon as it sees the client gone.
+"""
+
+import collections
+import json
+import socket
+import statistics
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from medevac.config import (CONNECT_TIMEOUT, HEALTH_INTERVAL, LLM_BUDGET_S, LLM_ENDPOINTS,
+                            LLM_TIMEOUT, MAX_TOKENS, POOL_SIZE, PROBE_TIMEOUT, SERVER_URL,
+                            STALL_TIMEOUT, STOP, STRUCTURED_OUTPUT, SYSTEM_PROMPT, TEMP,
+                            WARM_TIMEOUT)
+from medevac.response import TCCC_GRAMMAR
+
+# =========================
+# REQUESTS
+# =========================
+
+# Shared by every request, so it stays in each slot's KV cache
+PROMPT_PREFIX = f"{SYSTEM_PROMPT}\n\nINPUT:\n"
+
+def build_prompt(transcript):
+    """Wrap a cleaned transcript in the TCCC system prompt"""
+    return f"{PROMPT_PREFIX}{transcript}\n\nOUTPUT:\n"
+
+def completion_payload(prompt, structured=STRUCTURED_OUTPUT):
+    """Request body for llama-server /completion"""
+    payload = {
+        "prompt": prompt,
+        "n_predict": MAX_TOKENS,
+        "temperature": TEMP,
+        "stop": STOP,
+        "cache_prompt": True
+    }
+    if structured:
+        payload["grammar"] = TCCC_GRAMMAR
+    return payload
+
+def check_server(base_url=SERVER_URL):
+    """Verify llama-server is running"""
+    try:
+        response = requests.get(f"{base_url}/health", timeout=2)
+        return response.status_code == 200
+    except requests.exceptions.RequestException:
+        return False
+
+# =========================
+# STREAMING COMPLETION
+# =========================
+
+class StreamCancelled(Exception):
+    """Raised from a stream's iterator after cancel()"""
+
+class StreamError(requests.exceptions.RequestException):
+    """A malformed event stream (bad JSON, undecodable bytes); fails over like a dropped one"""
+
+class BudgetExhausted(requests.exceptions.Timeout):
+    """A request ran past its total latency budget"""
+
+def shutdown_response(response):
+    """Shut down a streaming response's socket, waking a thread blocked reading it"""
+    sock = getattr(getattr(response.raw, "_connection", None), "sock", None)
+    if sock is None:
+        # Once reading has started urllib3 may have handed the socket to http.client
+        fp = getattr(getattr(response.raw, "_fp", None), "fp", None)
+        sock = getattr(getattr(fp, "raw", None), "_sock", None)
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+class LLMStream:
+    """Iterate over the SSE token stream of a llama-server completion
+
+    Yields text pieces as they arrive. After iteration finishes, `text`,
+    `ttft`, `latency`, `n_tokens` and `tokens_per_s` describe the request.
+    """
+
+    def __init__(self, url, payload, timeout=LLM_TIMEOUT, session=None):
+        self.url = url
+        self.payload = dict(payload, stream=True)
+        self.timeout = timeout
+        self.session = session or requests
+        self.text = ""
+        self.ttft = None
+        self.latency = 0.0
+        self.n_tokens = 0
+        self.tokens_per_s = 0.0
+        self.timings = {}
+        self.slot = None
+        self.cancelled = False
+        self._response = None
+
+    def cancel(self):
+        """Abort the request from any thread; the iterator raises StreamCancelled"""
+        self.cancelled = True
+        if self._response is not None:
+            shutdown_response(self._response)
+
+    def __iter__(self):
+        try:
+            yield from self._events()
+        except (requests.exceptions.RequestException, OSError, ValueError) as e:
+            if self.cancelled:
+                raise StreamCancelled() from None
+            if isinstance(e, requests.exceptions.RequestException):
+                raise
+            raise StreamError(f"Bad event stream from {self.url}: {e}") from e
+        if self.cancelled:
+            raise StreamCancelled()
+
+    def _events(self):
+        start = time.time()
+        t_first = None
+        finished = False
+
+        with self.session.post(self.url, json=self.payload, stream=True,
+                               timeout=self.timeout) as response:
+            self._response = response
+            if self.cancelled:
+                shutdown_response(response)  # cancelled while connecting
+            response.raise_for_status()
+
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data: "):
+                    continue
+                data = line[len("data: "):]
+                if data == "[DONE]":
+                    finished = True
+                    break
+
+                event = json.loads(data)
+                self.slot = event.get("id_slot", self.slot)
+                piece = event.get("content", "")
+                if piece:
+                    if t_first is None:
+                        t_first = time.time()
+                        self.ttft = t_first - start
+                    self.n_tokens += 1
+                    self.text += piece
+                    yield piece
+
+                if event.get("stop"):
+                    self.timings = event.get("timings") or {}
+                    finished = True
+                    break
+
+        if not finished:
+            # llama-server always ends with a stop event; EOF before it means it died
+            raise requests.exceptions.ChunkedEncodingError("Stream ended before the stop event")
+
+        end = time.time()
+        self.latency = end - start
+
+        # Prefer the server's own decode counters when they are reported
+        if self.timings.get("predicted_n"):
+            self.n_tokens = self.timings["predicted_n"]
+        if self.timings.get("predicted_per_second"):
+            self.tokens_per_s = self.timings["predicted_per_second"]
+        elif t_first is not None and self.n_tokens > 1 and end > t_first:
+            self.tokens_per_s = (self.n_tokens - 1) / (end - t_first)
+
+# =========================
+# ENDPOINTS
+# =========================
+
+class Endpoint:
+    """One llama-server instance and what the client last saw of it"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+        self.healthy = True
+        self.n_slots = 1
+        self.busy_slots = 0
+        self.busy_ids = set()  # slots /slots reports as processing
+        self.pinned = set()  # slots our own requests are using
+        self.warm = set()  # slots known to hold PROMPT_PREFIX
+        self.prefix_tokens = None
+        self.evictions = 0
+        self.in_flight = 0
+        self.last_check = 0.0
+
+    def __repr__(self):
+        state = "up" if self.healthy else "down"
+        return (f"<Endpoint {self.base_url} {state} load={self.load:.2f} "
+                f"warm={len(self.warm)}/{self.n_slots}>")
+
+    @property
+    def load(self):
+        """Busy fraction of the server's slots"""
+        return max(self.in_flight, self.busy_slots) / max(self.n_slots, 1)
+
+# =========================
+# CLIENT
+# =========================
+
+class LLMClient:
+    """Keep-alive, load-balancing llama-server client with failover"""
+
+    def __init__(self, endpoints=LLM_ENDPOINTS, budget=LLM_BUDGET_S, structured=STRUCTURED_OUTPUT):
+        self.endpoints = [Endpoint(url) for url in endpoints]
+        self.budget = budget
+        self.structured = structured
+        self.warming = False  # set by warm_up(); keeps slots warm from then on
+        self.supervisor = None  # LlamaSupervisor running the local server, if we launched it
+        self.first = None  # (ttft, latency) of the first request
+        self.steady = collections.deque(maxlen=1000)
+        self._lock = threading.Lock()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(self.endpoints),
+                              pool_maxsize=POOL_SIZE, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def healthy(self):
+        """True if at least one endpoint answers /health"""
+        self.refresh(force=True)
+        return any(e.healthy for e in self.endpoints)
+
+    def wait_healthy(self, timeout):
+        """Poll /health until an endpoint answers or `timeout` seconds pass"""
+        deadline = time.time() + timeout
+        while not self.healthy():
+            if time.time() >= deadline:
+                return False
+            time.sleep(PROBE_TIMEOUT)
+        return True
+
+    def refresh(self, force=False):
+        """Re-probe endpoints whose state is older than HEALTH_INTERVAL"""
+        now = time.time()
+        for endpoint in self.endpoints:
+            if force or now - endpoint.last_check >= HEALTH_INTERVAL:
+                self._probe(endpoint)
+
+    def pick(self, exclude=()):
+        """Least-loaded healthy endpoint not in `exclude`, or None"""
+        self.refresh()
+        with self._lock:
+            candidates = [e for e in self.endpoints if e.healthy and e not in exclude]
+            if not candidates:
+                return None
+            return min(candidates, key=lambda e: e.load)
+
+    def stream(self, prompt, budget=None):
+        """Streaming completion that fails over between endpoints"""
+        return FailoverStream(self, prompt, self.budget if budget is None else budget)
+
+    def complete(self, prompt, budget=None):
+        """Blocking completion; returns (text, latency) or (None, 0) on failure"""
+        stream = self.stream(prompt, budget)
+        try:
+            for _ in stream:
+                pass
+        except requests.exceptions.RequestException as e:
+            print(f"❌ LLM server error: {e}")
+            return None, 0
+        return stream.text.strip(), stream.latency
+
+    def warm_up(self, endpoints=None):
+        """Prefill PROMPT_PREFIX into every idle slot; returns (slots warmed, seconds)"""
+        self.warming = True
+        start = time.time()
+        jobs = []
+        for endpoint in endpoints or self.endpoints:
+            self._probe(endpoint, rewarm=False)
+            if endpoint.healthy:
+                jobs += [(endpoint, slot) for slot in range(endpoint.n_slots)
+                         if slot not in endpoint.pinned]
+
+        # Slots prefill in parallel under --cont-batching
+        threads = [threading.Thread(target=self._warm_slot, args=job) for job in jobs]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        warmed = sum(1 for endpoint, slot in jobs if slot in endpoint.warm)
+        return warmed, time.time() - start
+
+    def latency_summary(self):
+        """First-request vs steady-state latency, as printable lines"""
+        lines = []
+        if self.first is not None:
+            ttft, latency = self.first
+            lines.append(f"First request: TTFT {ttft or 0:.2f}s | total {latency:.2f}s")
+        if self.steady:
+            ttfts = [t or 0 for t, _ in self.steady]
+            latencies = [l for _, l in self.steady]
+            lines.append(f"Steady state (n={len(self.steady)}): "
+                         f"median TTFT {statistics.median(ttfts):.2f}s | "
+                         f"median total {statistics.median(latencies):.2f}s")
+        return lines
+
+    def _warm_slot(self, endpoint, slot):
+        payload = dict(completion_payload(PROMPT_PREFIX, structured=False),
+                       n_predict=0, id_slot=slot)
+        try:
+            response = self.session.post(f"{endpoint.base_url}/completion", json=payload,
+                                         timeout=(CONNECT_TIMEOUT, WARM_TIMEOUT))
+            response.raise_for_status()
+            timings = response.json().get("timings") or {}
+        except (requests.exceptions.RequestException, ValueError):
+            return
+
+        with self._lock:
+            endpoint.warm.add(slot)
+            if "prompt_n" in timings:
+                endpoint.prefix_tokens = timings["prompt_n"] + timings.get("cache_n", 0)
+
+    def _rewarm(self, endpoint):
+        threading.Thread(target=self.warm_up, args=([endpoint],), daemon=True).start()
+
+    def _record(self, endpoint, slot, attempt, stream):
+        """Track slot prefix state and latency once a request completes"""
+        # A few tokens of slack: the tokenizer may merge across the prefix boundary
+        cache_n = attempt.timings.get("cache_n")
+        cold = (cache_n is not None and endpoint.prefix_tokens is not None
+                and cache_n + 4 < endpoint.prefix_tokens)
+        with self._lock:
+            if slot is not None:
+                endpoint.warm.add(slot)  # the prefix is cached again after this request
+            if cold:
+                endpoint.evictions += 1
+            if self.first is None:
+                self.first = (stream.ttft, stream.latency)
+                stream.first_request = True
+            else:
+                self.steady.append((stream.ttft, stream.latency))
+        stream.cold = cold
+
+        # One evicted slot usually means others went too (restart, foreign prompts)
+        if cold and self.warming:
+            with self._lock:
+                endpoint.warm = {s for s in endpoint.warm if s in endpoint.pinned or s == slot}
+            self._rewarm(endpoint)
+
+    def _probe(self, endpoint, rewarm=True):
+        healthy, n_slots, busy, busy_ids = False, endpoint.n_slots, 0, set()
+        try:
+            response = self.session.get(f"{endpoint.base_url}/health", timeout=PROBE_TIMEOUT)
+            healthy = response.status_code == 200
+            if healthy:
+                # /slots is optional (llama-server --no-slots); keep the last count
+                response = self.session.get(f"{endpoint.base_url}/slots", timeout=PROBE_TIMEOUT)
+                if response.status_code == 200:
+                    slots = response.json()
+                    n_slots = len(slots) or 1
+                    busy_ids = {s.get("id", i) for i, s in enumerate(slots)
+                                if s.get("is_processing", s.get("state", 0) != 0)}
+                    busy = len(busy_ids)
+        except (requests.exceptions.RequestException, ValueError):
+            healthy = False
+
+        with self._lock:
+            # A server that came back (or changed its slots) starts with a cold cache
+            restarted = healthy and (not endpoint.healthy or n_slots != endpoint.n_slots)
+            if not healthy or restarted:
+                endpoint.warm.clear()
+            endpoint.healthy = healthy
+            endpoint.n_slots = n_slots
+            endpoint.busy_slots = busy
+            endpoint.busy_ids = busy_ids
+            endpoint.last_check = time.time()
+
+        if restarted and rewarm and self.warming:
+            self._rewarm(endpoint)
+
+    def _acquire(self, endpoint):
+        """Reserve a slot on the endpoint, preferring an idle warm one"""
+        with self._lock:
+            endpoint.in_flight += 1
+            idle = [s for s in range(endpoint.n_slots)
+                    if s not in endpoint.pinned and s not in endpoint.busy_ids]
+            warm = [s for s in idle if s in endpoint.warm]
+            slot = (warm or idle or [None])[0]
+            if slot is not None:
+                endpoint.pinned.add(slot)
+            return slot
+
+    def _release(self, endpoint, slot, failed=False):
+        with self._lock:
+            endpoint.in_flight -= 1
+            endpoint.pinned.discard(slot)
+            if failed:
+                endpoint.healthy = False
+                endpoint.warm.clear()
+                endpoint.last_check = time.time()
+
+class FailoverStream:
+    """Token stream that survives an endpoint dying mid-generation
+
+    When an attempt fails after some tokens, the next endpoint continues
+    from the text generated so far instead of starting over. Each attempt
+    gives up after STALL_TIMEOUT without data, and the whole request after
+    its latency budget: a timer cancels the attempt in progress when the
+    budget runs out, however steadily tokens are still arriving.
+    """
+
+    def __init__(self, client, prompt, budget):
+        self.client = client
+        self.prompt = prompt
+        self.budget = budget
+        self.endpoint = None
+        self.failovers = 0
+        self.text = ""
+        self.ttft = None
+        self.latency = 0.0
+        self.n_tokens = 0
+        self.tokens_per_s = 0.0
+        self.timings = {}
+        self.first_request = False
+        self.cold = False
+        self.cancelled = False
+        self.expired = False
+        self._attempt = None
+
+    def cancel(self):
+        """Abort generation from any thread; the iterator raises StreamCancelled"""
+        self.cancelled = True
+        attempt = self._attempt
+        if attempt is not None:
+            attempt.cancel()
+
+    def _expire(self, attempt):
+        self.expired = True
+        attempt.cancel()
+
+    def _exhausted(self):
+        return BudgetExhausted(f"LLM latency budget of {self.budget:.1f}s exhausted")
+
+    def __iter__(self):
+        start = time.time()
+        deadline = start + self.budget
+        tried = []
+
+        while True:
+            if self.cancelled:
+                raise StreamCancelled()
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise self._exhausted()
+
+            endpoint = self.client.pick(exclude=tried)
+            if endpoint is None:
+                raise requests.exceptions.ConnectionError("No healthy llama-server endpoint")
+            tried.append(endpoint)
+
+            slot = self.client._acquire(endpoint)
+            # The grammar only matches a response from its start, so a
+            # continuation falls back to the stop sequences
+            payload = completion_payload(self.prompt + self.text,
+                                         structured=self.client.structured and not self.text)
+            payload["n_predict"] = MAX_TOKENS - self.n_tokens
+            if slot is not None:
+                payload["id_slot"] = slot
+            attempt = LLMStream(f"{endpoint.base_url}/completion", payload,
+                                timeout=(CONNECT_TIMEOUT, min(STALL_TIMEOUT, remaining)),
+                                session=self.client.session)
+            self._attempt = attempt
+            if self.cancelled:
+                attempt.cancel()
+            timer = threading.Timer(remaining, self._expire, args=(attempt,))
+            timer.daemon = True
+            timer.start()
+
+            failed = False
+            try:
+                for piece in attempt:
+                    if time.time() >= deadline:
+                        attempt.cancel()
+                        raise self._exhausted()
+                    if self.ttft is None:
+                        self.ttft = time.time() - start
+                    self.text += piece
+                    self.n_tokens += 1
+                    yield piece
+            except StreamCancelled:
+                if self.expired and not self.cancelled:
+                    raise self._exhausted() from None
+                raise
+            except BudgetExhausted:
+                raise
+            except requests.exceptions.RequestException as e:
+                failed = True
+                self.failovers += 1
+                print(f"\n⚠ LLM endpoint {endpoint.base_url} failed ({type(e).__name__}), failing over")
+                continue
+            finally:
+                timer.cancel()
+                self.client._release(endpoint, slot, failed)
+
+            self.endpoint = endpoint
+            self.timings = attempt.timings
+            self.tokens_per_s = attempt.tokens_per_s
+            break
+
+        self.latency = time.time() - start
+        self.client._record(endpoint, attempt.slot if attempt.slot is not None else slot,
+                            attempt, self)
@@ -0,0 +1,269 @@
+"""
+MedEvac-Gemma long-form transcription
+Transcribe hour-long radio-net recordings in bounded memory
+
+The WAV is read a block at a time (resampled block-wise with overlapping
+margins when it is not 16 kHz) and cut into the same strided chunks the
+transformers pipeline uses. Each chunk goes through the CTC model on its
+own; the frames that only cover a neighbouring chunk's stride are dropped
+and the rest are concatenated, exactly as the pipeline merges them. At no
+point is more than a chunk plus a read block of audio held, so peak memory
+does not depend on the length of the recording.
+
+The CTC output is split into segments at long runs of blanks (pauses
+between transmissions) and each segment is written to JSONL, with its
+start and end time, as soon as it is complete. With `vad`, chunks without
+speech are not run through the model at all.
+
+Usage:
+  python -m medevac.longform MODEL_PATH radio_net.wav --out radio_net.jsonl [--no-vad]
+"""
+
+import argparse
+import json
+import math
+import time
+
+import numpy as np
+
+from medevac.asr import (clean_transcription, ctc_logits, decode_ids, load_asr, resample,
+                         to_mono)
+from medevac.config import (CHUNK_LENGTH_S, LEXICON_CORRECTION, SAMPLE_RATE, STRIDE_LENGTH_S,
+                            VAD)
+from medevac.lexicon import correct_transcript
+from medevac.metrics import peak_rss_mb
+from medevac.trace import tracer
+from medevac.vad import has_speech
+
+# =========================
+# CONFIGURATION
+# =========================
+READ_BLOCK_S = 10.0  # Audio read from the file at a time
+RESAMPLE_MARGIN_S = 0.25  # Neighbouring audio resampled with each block, then cut off
+SEGMENT_GAP_S = 1.0  # A pause this long ends a segment
+SEGMENT_MAX_S = 30.0  # Longer segments end at the next blank frame
+
+# =========================
+# STREAMING AUDIO
+# =========================
+
+def read_blocks(path, sample_rate=SAMPLE_RATE, block_s=READ_BLOCK_S):
+    """Mono float32 blocks of a WAV at `sample_rate`, read from disk as needed"""
+    import soundfile as sf
+
+    with sf.SoundFile(path) as f:
+        sr = f.samplerate
+        # Keep block edges on whole output samples so resampled blocks line up exactly
+        unit = sr // math.gcd(sr, sample_rate)
+        block = max(1, round(block_s * sr / unit)) * unit
+        margin = 0 if sr == sample_rate else max(1, round(RESAMPLE_MARGIN_S * sr / unit)) * unit
+        ratio = sample_rate / sr
+
+        pending = np.zeros(0, dtype=np.float32)  # input samples from pending_start on
+        pending_start = 0
+        pos = 0  # first input sample whose output has not been yielded
+        eof = False
+        while True:
+            while not eof and pending_start + len(pending) < pos + block + margin:
+                data = f.read(block, dtype="float32")
+                if len(data) == 0:
+                    eof = True
+                else:
+                    pending = np.concatenate([pending, to_mono(data)])
+            end = pending_start + len(pending)
+            if pos >= end:
+                return
+
+            stop = min(pos + block, end)
+            if margin:
+                # The margins absorb the FFT resampler's edge effects
+                first = max(pending_start, pos - margin)
+                window = pending[first - pending_start:min(stop + margin, end) - pending_start]
+                out = resample(window, sr, sample_rate)
+                yield out[round((pos - first) * ratio):round((stop - first) * ratio)]
+            else:
+                yield pending[pos - pending_start:stop - pending_start]
+            pos = stop
+
+            drop = max(0, pos - margin - pending_start)
+            pending = pending[drop:]
+            pending_start += drop
+
+def strided_chunks(blocks, chunk, stride):
+    """(start, samples, left, right) for each chunk, as the pipeline's chunk_iter cuts them
+
+    `left`/`right` are the samples at each edge that are context only.
+    """
+    step = chunk - 2 * stride
+    blocks = iter(blocks)
+    buffer = np.zeros(0, dtype=np.float32)
+    buffer_start = 0
+    start = 0
+    eof = False
+    while True:
+        # One sample past the chunk tells us whether this is the last one
+        while not eof and buffer_start + len(buffer) <= start + chunk:
+            block = next(blocks, None)
+            if block is None:
+                eof = True
+            else:
+                buffer = np.concatenate([buffer, block])
+        samples = buffer[start - buffer_start:start + chunk - buffer_start]
+        is_last = start + chunk >= buffer_start + len(buffer)
+        left = 0 if start == 0 else stride
+        right = 0 if is_last else stride
+        if len(samples) > left:
+            yield start, samples, left, right
+        if is_last:
+            return
+        start += step
+        buffer = buffer[start - buffer_start:]
+        buffer_start = start
+
+# =========================
+# SEGMENTS
+# =========================
+
+class Segmenter:
+    """Split a stream of CTC frames into segments at long blank runs"""
+
+    def __init__(self, blank, gap_frames, max_frames):
+        self.blank = blank
+        self.gap_frames = gap_frames
+        self.max_frames = max_frames
+        self._ids = []
+        self._times = []
+        self._blanks = 0
+
+    def feed(self, ids, times):
+        """Add frames (ids and their start times); yields finished (ids, times)"""
+        for token, t in zip(ids.tolist(), times.tolist()):
+            if token == self.blank:
+                if not self._ids:
+                    continue  # nothing started yet
+                self._blanks += 1
+            else:
+                self._blanks = 0
+            self._ids.append(token)
+            self._times.append(t)
+            # flush() drops the trailing blanks, this one included
+            if self._blanks and (self._blanks >= self.gap_frames
+                                 or len(self._ids) > self.max_frames):
+                yield self.flush()
+
+    def flush(self):
+        """The segment in progress, without its trailing blanks"""
+        keep = len(self._ids) - self._blanks
+        segment = (self._ids[:keep], self._times[:keep])
+        self._ids, self._times, self._blanks = [], [], 0
+        return segment
+
+# =========================
+# TRANSCRIPTION
+# =========================
+
+class LongformTranscriber:
+    """Transcribe a recording chunk by chunk, yielding timestamped segments
+
+    After (or during) iteration, `audio_s`, `wall_s`, `skipped_s` and
+    `chunks` describe the run so far.
+    """
+
+    def __init__(self, asr, vad=VAD, lexicon=LEXICON_CORRECTION,
+                 chunk_length_s=CHUNK_LENGTH_S, stride_length_s=STRIDE_LENGTH_S):
+        self.asr = asr
+        self.vad = vad
+        self.lexicon = lexicon
+        # Chunk edges on whole logit frames, as the pipeline aligns them
+        self.align_to = getattr(asr, "align_to", None) or asr._align_to
+        self.chunk = int(round(chunk_length_s * SAMPLE_RATE / self.align_to) * self.align_to)
+        self.stride = int(round(stride_length_s * SAMPLE_RATE / self.align_to) * self.align_to)
+        self.audio_s = 0.0
+        self.wall_s = 0.0
+        self.skipped_s = 0.0
+        self.chunks = 0
+
+    def segments(self, path):
+        """{"start", "end", "text"} per segment, in order, as each one completes"""
+        blank = self.asr.tokenizer.pad_token_id
+        frame_s = self.align_to / SAMPLE_RATE
+        segmenter = Segmenter(blank, int(round(SEGMENT_GAP_S / frame_s)),
+                              int(round(SEGMENT_MAX_S / frame_s)))
+        t0 = time.perf_counter()
+
+        for start, samples, left, right in strided_chunks(read_blocks(path), self.chunk,
+                                                          self.stride):
+            ids, times = self._chunk_frames(start, samples, left, right, blank)
+            self.audio_s = (start + len(samples) - right) / SAMPLE_RATE
+            self.wall_s = time.perf_counter() - t0
+            for segment in segmenter.feed(ids, times):
+                yield self._segment(*segment, frame_s)
+        segment = segmenter.flush()
+        if segment[0]:
+            yield self._segment(*segment, frame_s)
+        self.wall_s = time.perf_counter() - t0
+
+    def _chunk_frames(self, start, samples, left, right, blank):
+        """Greedy ids and start times of the frames this chunk owns"""
+        self.chunks += 1
+        total = int(round(len(samples) / self.align_to))
+        first = int(round(left / len(samples) * total))
+        last = total - int(round(right / len(samples) * total))
+        seconds_per_frame = len(samples) / max(total, 1) / SAMPLE_RATE
+        times = start / SAMPLE_RATE + np.arange(first, last) * seconds_per_frame
+
+        if self.vad and not has_speech(samples, left, len(samples) - right):
+            self.skipped_s += (len(samples) - left - right) / SAMPLE_RATE
+            return np.full(len(times), blank), times
+        with tracer.span("asr.chunk", start=start / SAMPLE_RATE):
+            logits = ctc_logits(self.asr, samples)
+        ids = logits[first:last].argmax(axis=-1)
+        return ids, times[:len(ids)]
+
+    def _segment(self, ids, times, frame_s):
+        text = clean_transcription(decode_ids(self.asr, ids))
+        if self.lexicon:
+            text = correct_transcript(text)
+        return {"start": round(times[0], 2), "end": round(times[-1] + frame_s, 2), "text": text}
+
+    def throughput(self):
+        """Audio seconds transcribed per wall-clock second"""
+        return self.audio_s / self.wall_s if self.wall_s else 0.0
+
+# =========================
+# MAIN
+# =========================
+
+def timestamp(seconds):
+    hours, rest = divmod(seconds, 3600)
+    return f"{int(hours):02d}:{int(rest // 60):02d}:{rest % 60:04.1f}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Bounded-memory transcription of long recordings")
+    parser.add_argument("model_path")
+    parser.add_argument("wav")
+    parser.add_argument("--out", help="JSONL of segments (default: WAV name with .jsonl)")
+    parser.add_argument("--no-vad", action="store_true", help="run every chunk through the model")
+    parser.add_argument("--quiet", action="store_true", help="do not print segments")
+    args = parser.parse_args()
+
+    out_path = args.out or args.wav.rsplit(".", 1)[0] + ".jsonl"
+    asr = load_asr(args.model_path)
+    transcriber = LongformTranscriber(asr, vad=VAD and not args.no_vad)
+
+    n = 0
+    with open(out_path, "w", buffering=1) as out:
+        for segment in transcriber.segments(args.wav):
+            out.write(json.dumps(segment) + "\n")
+            n += 1
+            if not args.quiet:
+                print(f"[{timestamp(segment['start'])} → {timestamp(segment['end'])}] "
+                      f"{segment['text']}")
+
+    print(f"\n✓ {n} segments → {out_path}")
+    print(f"  {transcriber.audio_s:.0f}s of audio in {transcriber.wall_s:.1f}s "
+          f"({transcriber.throughput():.1f} audio s/s, {transcriber.chunks} chunks, "
+          f"{transcriber.skipped_s:.0f}s skipped as silence) | peak RSS {peak_rss_mb():.0f} MB")
+
+if __name__ == "__main__":
+    main()
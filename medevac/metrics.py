@@ -0,0 +1,105 @@
+"""
+MedEvac-Gemma evaluation metrics
+Scoring for the full_eval.csv columns
+
+WER is computed on the raw strings (no case or punctuation folding), which
+reproduces the wer_* columns of the shipped full_eval.csv exactly, and the
+failures / failure_severity columns match it too. The TCCC score is a new
+rubric: the fraction of a 14-term MARCH list mentioned in the response.
+The notebook that produced the shipped tccc_score_* (and so
+effectiveness_*) values used a term list that is not in the repo, and
+most of its cells differ from this one, so compare those two columns only
+between runs of this module. A missing critical term is a failure worth
+0.5 severity; effectiveness is score per second of latency.
+"""
+
+import re
+import sys
+
+import numpy as np
+
+# =========================
+# CONFIGURATION
+# =========================
+TCCC_TERMS = (
+    "hemorrhage", "tourniquet", "airway", "breathing", "circulation", "shock",
+    "hypothermia", "pulse", "pain", "fluid", "monitor", "reassess", "evacuat", "vital",
+)
+CRITICAL_TERMS = ("breathing", "tourniquet", "hemorrhage")
+FAILURE_WEIGHT = 0.5
+
+# =========================
+# ASR
+# =========================
+
+def wer(reference, hypothesis):
+    """Word error rate: word-level edit distance over reference length"""
+    ref = reference.split()
+    hyp = hypothesis.split()
+    row = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        diag, row[0] = row[0], i
+        for j, hyp_word in enumerate(hyp, 1):
+            diag, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, diag + (ref_word != hyp_word))
+    return row[-1] / max(len(ref), 1)
+
+# =========================
+# LLM
+# =========================
+
+def _mentions(text, term):
+    return re.search(rf"\b{term}", text.lower()) is not None
+
+def tccc_score(response):
+    """Fraction of TCCC_TERMS the response mentions"""
+    return sum(_mentions(response, t) for t in TCCC_TERMS) / len(TCCC_TERMS)
+
+def failures(response):
+    """Critical TCCC terms the response leaves out"""
+    return [f"missing:{t}" for t in CRITICAL_TERMS if not _mentions(response, t)]
+
+def score_response(response, latency):
+    """tccc_score / effectiveness / failures / failure_severity for one response"""
+    score = tccc_score(response)
+    missing = failures(response)
+    return {
+        "tccc_score": score,
+        "effectiveness": score / latency if latency else 0.0,
+        "failures": str(missing),
+        "failure_severity": FAILURE_WEIGHT * len(missing),
+    }
+
+# =========================
+# LATENCY
+# =========================
+
+def percentiles(values, qs=(50, 95, 99)):
+    """{"p50": ..., "p95": ..., "p99": ...} of a list of seconds"""
+    if not values:
+        return {f"p{q}": None for q in qs}
+    return {f"p{q}": float(np.percentile(values, q)) for q in qs}
+
+# =========================
+# MEMORY
+# =========================
+
+def peak_rss_mb():
+    """Peak resident set size of this process"""
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)  # bytes on macOS, KiB on Linux
+
+def process_rss_mb(pid):
+    """(current, peak) resident set size of another process; peak is None off Linux"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return int(fields["VmRSS"].split()[0]) / 1024, int(fields["VmHWM"].split()[0]) / 1024
+    except (OSError, KeyError, ValueError):
+        pass
+    import subprocess
+
+    out = subprocess.run(["ps", "-o", "rss=", "-p", str(pid)], capture_output=True, text=True)
+    rss = out.stdout.strip()
+    return (int(rss) / 1024 if rss.isdigit() else None), None
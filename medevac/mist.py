@@ -0,0 +1,368 @@
+"""
+MedEvac-Gemma MIST extraction
+Rule-based MIST record and triage category from a cleaned transcript
+
+Reports follow a fixed pattern (callsign, location, mechanism, injuries,
+SpO₂, respirations, HR, BP, request), so most of what the LLM is asked to
+read can be pulled out with a handful of compiled patterns. The
+transcript is first normalized like the response-cache key (spoken
+numbers to digits, "heart rate" → hr, "120 over 80" → 120/80). One pass
+of each pattern then fills a MISTRecord:
+Mechanism, Injuries, Signs (vitals with units, mental status, bleeding)
+and Treatments already given. A mention right after "no", "not" or
+"without" (or followed by "not applied" and the like) is skipped, so
+"no tourniquet applied" lists no tourniquet. Extraction takes well under
+a millisecond.
+
+The triage category (URGENT / PRIORITY / ROUTINE) comes from the vitals
+and signs alone. It is a preliminary call to show and speak while
+MedGemma is still generating, not a replacement for its assessment.
+"""
+
+import re
+
+from medevac.cache import canonical_transcript
+from medevac.config import MIST_PROMPT
+
+# =========================
+# PATTERNS
+# =========================
+# All patterns run on canonical_transcript() output: lowercase, digits, no punctuation
+def alternation(table):
+    """One pattern for a [(regex, name)] table; a match's lastgroup is g<index>.
+    Earlier entries win where they overlap (longer phrases go first)."""
+    return re.compile(r"\b(?:" + "|".join(f"(?P<g{i}>{p})" for i, (p, _) in enumerate(table))
+                      + r")\b"), [name for _, name in table]
+
+# A mention is negated by one of these just before it, with at most some
+# filler words between ("no tourniquet", "without a chest seal", "not conscious")
+NEGATION = re.compile(r"\b(?:no|not|without|denies|negative for|never)"
+                      r"(?: (?:a|an|the|any|yet|been|obvious|signs? of|evidence of|applied|"
+                      r"given|placed|used))* $")
+# ...or by one of these right after it ("tourniquet not applied")
+NEGATED_AFTER = re.compile(r" (?:was |is |has |have )?(?:not|never) (?:been )?"
+                           r"(?:applied|given|placed|used|done|started|found|present)\b")
+NEGATION_WINDOW = 48  # Characters looked back for a negation
+
+CALLSIGN = re.compile(r"\bthis is ([A-Za-z]+)[ -]?(\d{1,3})?\b", re.I)
+REQUEST = re.compile(r"(?:^|[.!?]\s*)((?:confirm|request(?:ing)?|advise|need)\b[^.!?]*)", re.I)
+
+LOCATIONS = {"tfc": "TFC", "tactical field care": "TFC", "ccp": "CCP",
+             "casualty collection point": "CCP", "care under fire": "CUF", "cuf": "CUF",
+             "hlz": "HLZ", "poi": "POI", "point of injury": "POI"}
+LOCATION = re.compile(r"\b(" + "|".join(sorted(LOCATIONS, key=len, reverse=True)) + r")\b")
+
+MECHANISMS = [
+    (r"gsw|gunshot|bullet|small arms", "GSW"),
+    (r"ied|blast|explosion|explosive|detonation|mortar|grenade|rpg", "blast"),
+    (r"shrapnel|fragment\w*", "fragmentation"),
+    (r"rollover|vehicle (?:accident|crash|collision)|mva", "vehicle rollover"),
+    (r"fell|fallen|fall from|fall of", "fall"),
+    (r"burns?|burned|flames?", "burns"),
+    (r"collapse|crush\w*|pinned", "crush"),
+    (r"stabbed|stabbing|stab wound|knife|lacerations?", "penetrating/laceration"),
+]
+MECHANISM = alternation(MECHANISMS)
+
+PARTS = ("ankle|knee|thigh|femur|tibia|calf|shin|foot|toes?|hand|wrist|forearm|elbow|arm|"
+         "biceps?|shoulder|clavicle|neck|face|jaw|scalp|head|spine|back|flank|groin|hip|"
+         "chest|lung|ribs?|sternum|abdomen|abdominal|pelvis|pelvic|buttock|leg|eye|ear")
+# An injury needs an injury word: "GSW to the left thigh", "bilateral leg fractures";
+# a side and part alone ("tourniquet applied to left arm") is where treatment went
+INJURY = re.compile(
+    r"\b(?P<kind>gsw|gunshot wound|amputation|fracture|lacerations?|burns?|wound|"
+    r"fragment\w*|shrapnel)\s+(?:(?:to|of|in|on|at)\s+(?:the\s+)?)?"
+    r"(?:(?P<side>left|right|bilateral)\s+)?(?P<region>upper\s+|lower\s+)?"
+    r"(?P<part>" + PARTS + r")\b"
+    r"|\b(?:(?P<side2>left|right|bilateral)\s+)?(?P<region2>upper\s+|lower\s+)?"
+    r"(?P<part2>" + PARTS + r")\s+(?P<kind3>gsw|gunshot wounds?|amputations?|fractures?|"
+    r"lacerations?|burns?|wounds?|injur(?:y|ies))\b"
+    r"|\b(?P<kind2>amputation|fracture|tension pneumothorax|pneumothorax|hemothorax|"
+    r"evisceration|tbi|head injury|concussion)\b")
+
+FINDINGS = [
+    (r"partial exit wound", "partial exit wound"),
+    (r"no exit wound", "no exit wound"),
+    (r"exit wound", "exit wound"),
+    (r"delayed capillary refill", "delayed capillary refill"),
+    (r"(?:absent|no) (?:distal |radial |pedal )?pulses?", "absent distal pulse"),
+    (r"weak (?:distal |radial )?pulses?", "weak pulse"),
+    (r"(?:diminished|absent|decreased) breath sounds", "diminished breath sounds"),
+    (r"unequal (?:chest )?rise", "unequal chest rise"),
+    (r"tracheal deviation", "tracheal deviation"),
+    (r"cyanosis|cyanotic", "cyanosis"),
+    (r"pale|pallor", "pale"),
+    (r"diaphoretic|sweating", "diaphoretic"),
+    (r"hypothermi\w+|shivering", "hypothermia"),
+    (r"airway (?:compromised|obstructed|blocked)", "airway compromised"),
+    (r"airway (?:intact|patent|clear)", "airway intact"),
+]
+FINDING = alternation(FINDINGS)
+
+TREATMENTS = [
+    (r"junctional tourniquets?", "junctional tourniquet"),
+    (r"tourniquets?", "tourniquet"),
+    (r"packed|packing|hemostatic|gauze|combat gauze", "wound packing"),
+    (r"pressure dressing|bandage|israeli", "pressure dressing"),
+    (r"chest seal|occlusive dressing|vented seal", "chest seal"),
+    (r"needle decompression|needle d|ncd", "needle decompression"),
+    (r"npa|nasopharyngeal", "NPA"),
+    (r"cric|cricothyrotomy|surgical airway", "cricothyrotomy"),
+    (r"txa|tranexamic", "TXA"),
+    (r"iv|io|saline|fluids|plasma|whole blood|transfusion", "IV/IO fluids"),
+    (r"splint\w*", "splint"),
+    (r"pelvic binder|binder", "pelvic binder"),
+    (r"ketamine|fentanyl|morphine|analgesi\w+", "analgesia"),
+    (r"antibiotics?|moxifloxacin|ertapenem", "antibiotics"),
+    (r"hypothermia (?:prevention|wrap|kit)|hpmk|blanket", "hypothermia prevention"),
+]
+TREATMENT = alternation(TREATMENTS)
+
+SPO2 = re.compile(r"\bspo2? (?:unk )?(?:of |is |at )?(\d{2,3})\b")
+HR = re.compile(r"\b(?:hr|pulse) (?:of |is |at )?(\d{2,3})\b")
+RR = re.compile(r"\brr (?:of |is |at )?(\d{1,2})\b")
+BP = re.compile(r"\bbp (?:of |is |at )?(?:(\d{2,3})/(\d{2,3})|(stable|unstable|low|dropping|"
+                r"falling|normal|palpable|not palpable))\b")
+GCS = re.compile(r"\bgcs (?:of |is )?(\d{1,2})\b")
+AVPU = [
+    (re.compile(r"\b(?:unresponsive|unconscious|not responding|no response|not conscious|"
+                r"not awake)\b"), "U"),
+    (re.compile(r"\bresponds? (?:only )?to pain|responsive to pain|painful stimuli\b"), "P"),
+    (re.compile(r"\bresponds? to (?:voice|verbal)|responsive to (?:voice|verbal)|"
+                r"\bnot (?:alert|oriented)\b"), "V"),
+    (re.compile(r"\b(?:alert|oriented|conscious|a ?o ?x ?\d)\b"), "A"),
+]
+BLEEDING = [
+    (re.compile(r"\b(?:uncontrolled|massive|ongoing|continuous|active) (?:bleeding|hemorrhage)\b"
+                r"|\bbleeding (?:uncontrolled|not controlled|continues|ongoing)\b"), "uncontrolled"),
+    (re.compile(r"\b(?:bleeding|hemorrhage) (?:is )?(?:controlled|stopped)\b"
+                r"|\bcontrolled (?:bleeding|hemorrhage)\b"), "controlled"),
+]
+
+# =========================
+# TRIAGE
+# =========================
+# (test, reason) per category; the first category with any reason wins
+URGENT = [
+    (lambda r: r.spo2 is not None and r.spo2 < 90, "SpO₂ below 90%"),
+    (lambda r: r.rr is not None and r.rr > 29, "respirations above 29"),
+    (lambda r: r.rr is not None and r.rr < 10, "respirations below 10"),
+    (lambda r: r.hr is not None and r.hr > 120, "heart rate above 120"),
+    (lambda r: r.hr is not None and r.hr < 50, "heart rate below 50"),
+    (lambda r: r.systolic is not None and r.systolic < 90, "systolic below 90"),
+    (lambda r: r.bp in ("unstable", "low", "dropping", "falling", "not palpable"), "blood pressure falling"),
+    (lambda r: r.avpu in ("P", "U"), "responds to pain only or unresponsive"),
+    (lambda r: r.gcs is not None and r.gcs <= 12, "GCS 12 or below"),
+    (lambda r: r.bleeding == "uncontrolled", "uncontrolled bleeding"),
+    (lambda r: "airway compromised" in r.findings, "airway compromised"),
+    (lambda r: any("pneumothorax" in i or "amputation" in i for i in r.injuries),
+     "amputation or pneumothorax"),
+]
+PRIORITY = [
+    (lambda r: r.spo2 is not None and r.spo2 < 94, "SpO₂ below 94%"),
+    (lambda r: r.rr is not None and r.rr > 20, "respirations above 20"),
+    (lambda r: r.hr is not None and r.hr > 100, "heart rate above 100"),
+    (lambda r: r.systolic is not None and r.systolic < 100, "systolic below 100"),
+    (lambda r: r.avpu == "V", "responds to voice only"),
+    (lambda r: r.gcs is not None and r.gcs < 15, "GCS below 15"),
+    (lambda r: "absent distal pulse" in r.findings or "delayed capillary refill" in r.findings,
+     "poor distal perfusion"),
+]
+
+# =========================
+# RECORD
+# =========================
+
+class MISTRecord:
+    """Mechanism, Injuries, Signs and Treatments of one report, plus triage"""
+
+    def __init__(self):
+        self.callsign = None
+        self.location = None
+        self.mechanism = []
+        self.injuries = []
+        self.findings = []
+        self.treatments = []
+        self.spo2 = None  # %
+        self.hr = None  # beats/min
+        self.rr = None  # breaths/min
+        self.systolic = None  # mmHg
+        self.diastolic = None
+        self.bp = None  # "120/80" or a word ("stable")
+        self.gcs = None
+        self.avpu = None
+        self.bleeding = None  # "controlled" / "uncontrolled"
+        self.request = None
+        self.triage = None  # URGENT / PRIORITY / ROUTINE, or None without vitals or signs
+        self.reasons = []
+
+    def __repr__(self):
+        return f"MISTRecord({self.as_dict()!r})"
+
+    @property
+    def empty(self):
+        """True if nothing beyond the callsign was recognized"""
+        return not (self.mechanism or self.injuries or self.treatments or self.vitals())
+
+    def vitals(self):
+        """[(name, value with unit)] of the vitals that were reported"""
+        vitals = []
+        if self.spo2 is not None:
+            vitals.append(("SpO₂", f"{self.spo2}%"))
+        if self.rr is not None:
+            vitals.append(("RR", f"{self.rr}/min"))
+        if self.hr is not None:
+            vitals.append(("HR", f"{self.hr} bpm"))
+        if self.bp is not None:
+            vitals.append(("BP", f"{self.bp} mmHg" if self.systolic is not None else self.bp))
+        if self.gcs is not None:
+            vitals.append(("GCS", str(self.gcs)))
+        return vitals
+
+    def as_dict(self):
+        return {"callsign": self.callsign, "location": self.location,
+                "mechanism": list(self.mechanism), "injuries": list(self.injuries),
+                "signs": {"spo2": self.spo2, "hr": self.hr, "rr": self.rr, "bp": self.bp,
+                          "systolic": self.systolic, "diastolic": self.diastolic,
+                          "gcs": self.gcs, "avpu": self.avpu, "bleeding": self.bleeding,
+                          "findings": list(self.findings)},
+                "treatments": list(self.treatments), "request": self.request,
+                "triage": self.triage, "reasons": list(self.reasons)}
+
+    def signs(self):
+        """Vitals and signs as short display strings"""
+        signs = [f"{name} {value}" for name, value in self.vitals()]
+        if self.avpu is not None:
+            signs.append({"A": "alert", "V": "responds to voice", "P": "responds to pain",
+                          "U": "unresponsive"}[self.avpu])
+        if self.bleeding is not None:
+            signs.append(f"bleeding {self.bleeding}")
+        return signs + self.findings
+
+    def card(self):
+        """Multi-line preliminary card for the console"""
+        triage = self.triage or "UNDETERMINED"
+        reasons = f" ({'; '.join(self.reasons)})" if self.reasons else ""
+        lines = [f"TRIAGE: {triage}{reasons}"]
+        if self.callsign or self.location:
+            lines.append(" ".join(filter(None, [self.callsign, self.location and
+                                                f"in {self.location}"])))
+        lines.append(f"M: {', '.join(self.mechanism) or '-'}")
+        lines.append(f"I: {', '.join(self.injuries) or '-'}")
+        lines.append(f"S: {', '.join(self.signs()) or '-'}")
+        lines.append(f"T: {', '.join(self.treatments) or '-'}")
+        return "\n".join(lines)
+
+    def spoken(self):
+        """One or two sentences to speak before the LLM's answer"""
+        parts = [f"Preliminary triage {(self.triage or 'undetermined').lower()}."]
+        injuries = ", ".join(self.injuries or self.mechanism)
+        if injuries:
+            parts.append(f"{injuries}.")
+        if self.reasons:
+            parts.append(f"{', '.join(self.reasons)}.")
+        return " ".join(parts)
+
+    def compact(self):
+        """The record as one short line for the LLM prompt"""
+        fields = [("M", self.mechanism), ("I", self.injuries), ("S", self.signs()),
+                  ("T", self.treatments)]
+        text = "; ".join(f"{key}: {', '.join(values)}" for key, values in fields if values)
+        if self.location:
+            text = f"{self.location}; {text}"
+        if self.request:
+            text += f"; request: {self.request}"
+        return text
+
+# =========================
+# EXTRACTION
+# =========================
+
+def extract_mist(transcript):
+    """MISTRecord for a cleaned (and lexicon-corrected) transcript"""
+    record = MISTRecord()
+    match = CALLSIGN.search(transcript)
+    if match is not None:
+        record.callsign = "-".join(filter(None, match.groups()))
+    match = REQUEST.search(transcript)
+    if match is not None:
+        record.request = " ".join(match.group(1).split())
+
+    text = canonical_transcript(transcript)
+    match = LOCATION.search(text)
+    if match is not None:
+        record.location = LOCATIONS[match.group(1)]
+    record.mechanism = matches(MECHANISM, text)
+    record.findings = matches(FINDING, text)
+    record.treatments = matches(TREATMENT, text)
+
+    for match in INJURY.finditer(text):
+        if negated(text, match):
+            continue
+        if match.group("part"):
+            injury = " ".join(filter(None, [match.group("kind"), match.group("side"),
+                                            (match.group("region") or "").strip(),
+                                            match.group("part")]))
+        elif match.group("part2"):
+            # In the order spoken: "bilateral leg fractures"
+            injury = " ".join(filter(None, [match.group("side2"),
+                                            (match.group("region2") or "").strip(),
+                                            match.group("part2"), match.group("kind3")]))
+        else:
+            injury = match.group("kind2")
+        injury = injury.replace("gsw", "GSW").replace("tbi", "TBI")
+        if injury not in record.injuries:
+            record.injuries.append(injury)
+
+    if (match := first(SPO2, text)) is not None:
+        record.spo2 = int(match.group(1))
+    if (match := first(HR, text)) is not None:
+        record.hr = int(match.group(1))
+    if (match := first(RR, text)) is not None:
+        record.rr = int(match.group(1))
+    if (match := first(BP, text)) is not None:
+        if match.group(1):
+            record.systolic, record.diastolic = int(match.group(1)), int(match.group(2))
+            record.bp = f"{record.systolic}/{record.diastolic}"
+        else:
+            record.bp = match.group(3)
+    if (match := first(GCS, text)) is not None:
+        record.gcs = int(match.group(1))
+    record.avpu = next((level for pattern, level in AVPU if first(pattern, text)), None)
+    record.bleeding = next((state for pattern, state in BLEEDING if first(pattern, text)), None)
+
+    record.triage, record.reasons = triage(record)
+    return record
+
+def matches(table, text):
+    """Names from an alternation() table found in text, in order of first mention"""
+    pattern, names = table
+    found = dict.fromkeys(names[int(m.lastgroup[1:])] for m in pattern.finditer(text)
+                          if not negated(text, m))
+    return list(found)
+
+def first(pattern, text):
+    """First match of `pattern` in text that is not negated, or None"""
+    return next((m for m in pattern.finditer(text) if not negated(text, m)), None)
+
+def negated(text, match):
+    """True if a mention is negated ("no tourniquet", "tourniquet not applied")"""
+    before = text[max(0, match.start() - NEGATION_WINDOW):match.start()]
+    return NEGATION.search(before) is not None or \
+        NEGATED_AFTER.match(text, match.end()) is not None
+
+def triage(record):
+    """(category, reasons) from a record's vitals and signs"""
+    for category, rules in (("URGENT", URGENT), ("PRIORITY", PRIORITY)):
+        reasons = [reason for test, reason in rules if test(record)]
+        if reasons:
+            return category, reasons
+    if record.vitals() or record.avpu is not None:
+        return "ROUTINE", []
+    return None, []
+
+def llm_input(transcript, record, compact=MIST_PROMPT):
+    """What follows INPUT: in the prompt: the compact record, or the transcript"""
+    if compact and record is not None and not record.empty:
+        return record.compact()
+    return transcript
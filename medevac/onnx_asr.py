@@ -0,0 +1,381 @@
+"""
+MedEvac-Gemma ONNX Runtime ASR backend
+Export the CTC model to int8 ONNX and transcribe with it on CPU
+
+`export` traces the transformers model once into ONNX (dynamic batch and
+time axes) and quantizes its weights to int8 with ONNX Runtime's dynamic
+quantization. Next to the model it writes everything needed to run
+without torch or transformers: the feature extractor's parameters (and
+its mel filterbank), the tokenizer files and the pipeline's chunk
+alignment.
+
+OnnxASR is a drop-in for the transformers pipeline that load_asr returns:
+it computes the same features in NumPy, chunks long audio the way the
+pipeline does, and greedily decodes the CTC output with the same
+tokenizer rules. Select it with ASR_BACKEND = "onnx" and point the model
+path at the export directory.
+
+Usage:
+  python -m medevac.onnx_asr export MODEL_PATH --out medasr-mil-onnx
+  python -m medevac.onnx_asr verify MODEL_PATH medasr-mil-onnx [--eval full_eval.csv] [--limit N]
+"""
+
+import argparse
+import itertools
+import json
+import os
+import statistics
+import time
+
+import numpy as np
+
+from medevac.config import CHUNK_LENGTH_S, ONNX_THREADS, SAMPLE_RATE, STRIDE_LENGTH_S
+from medevac.trace import tracer
+
+# =========================
+# CONFIGURATION
+# =========================
+MODEL_FILE = "model.onnx"
+INT8_FILE = "model.int8.onnx"
+META_FILE = "onnx_asr.json"
+MEL_FILE = "mel_filters.npy"
+OPSET = 17
+QUANTIZE_OPS = ["MatMul", "Gemm"]  # ONNX Runtime's int8 ConvInteger is slower than fp32 Conv on CPU
+MASK_DTYPES = {"tensor(bool)": np.bool_, "tensor(int32)": np.int32, "tensor(int64)": np.int64}
+
+# =========================
+# EXPORT
+# =========================
+
+def frontend_meta(feature_extractor):
+    """Parameters of the feature extractor, for the NumPy port below"""
+    fe = feature_extractor
+    kind = type(fe).__name__
+    if kind == "LasrFeatureExtractor":
+        return {"type": "mel", "hop_length": fe.hop_length, "win_length": fe.win_length,
+                "n_fft": fe.n_fft, "padding_value": fe.padding_value}
+    if kind == "Wav2Vec2FeatureExtractor":
+        return {"type": "waveform", "do_normalize": fe.do_normalize,
+                "padding_value": fe.padding_value}
+    raise ValueError(f"No NumPy port of {kind}; export supports LASR and Wav2Vec2 CTC models")
+
+def export(model_path, out_dir, opset=OPSET):
+    """Write fp32 and int8 ONNX models plus frontend/tokenizer files to out_dir"""
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    from medevac.asr import load_asr
+    from medevac.batching import lengths_fn
+
+    asr = load_asr(model_path, backend="torch")
+    model = asr.model.float().cpu().eval()
+    frontend = frontend_meta(asr.feature_extractor)
+    frames = lengths_fn(model)
+
+    class CTCGraph(torch.nn.Module):
+        """Logits plus the number of frames that belong to each row"""
+        def __init__(self):
+            super().__init__()
+            self.model = model
+
+        def forward(self, features, attention_mask):
+            logits = self.model(**{model.main_input_name: features,
+                                   "attention_mask": attention_mask}).logits
+            valid = attention_mask.long().sum(-1)
+            if frames is not None:
+                lengths = frames(valid)
+            else:
+                lengths = valid * logits.shape[1] // attention_mask.shape[1]
+            return logits, lengths.long()
+
+    os.makedirs(out_dir, exist_ok=True)
+    example = np.zeros(SAMPLE_RATE, dtype=np.float32)
+    inputs = asr.feature_extractor(example, sampling_rate=SAMPLE_RATE,
+                                   return_attention_mask=True, return_tensors="pt")
+    features = inputs[model.main_input_name]
+    fp32_path = os.path.join(out_dir, MODEL_FILE)
+    int8_path = os.path.join(out_dir, INT8_FILE)
+
+    t0 = time.time()
+    time_axis = {0: "batch", 1: "time"}
+    with torch.no_grad():
+        torch.onnx.export(
+            CTCGraph(), (features, inputs["attention_mask"]), fp32_path,
+            input_names=["features", "attention_mask"],
+            output_names=["logits", "lengths"],
+            dynamic_axes={"features": time_axis, "attention_mask": time_axis,
+                          "logits": time_axis, "lengths": {0: "batch"}},
+            opset_version=opset, dynamo=False)
+    print(f"✓ Exported {fp32_path} in {time.time() - t0:.1f}s")
+
+    t0 = time.time()
+    quantize_dynamic(fp32_path, int8_path, op_types_to_quantize=QUANTIZE_OPS,
+                     weight_type=QuantType.QInt8)
+    print(f"✓ Quantized {int8_path} in {time.time() - t0:.1f}s "
+          f"({os.path.getsize(fp32_path) / 1e6:.1f} MB → {os.path.getsize(int8_path) / 1e6:.1f} MB)")
+
+    if frontend["type"] == "mel":
+        np.save(os.path.join(out_dir, MEL_FILE), asr.feature_extractor.mel_filters.numpy())
+    asr.tokenizer.save_pretrained(out_dir)
+    meta = {
+        "source": model_path,
+        "sampling_rate": asr.feature_extractor.sampling_rate,
+        "align_to": asr._align_to,
+        "frontend": frontend,
+        "pad_token_id": asr.tokenizer.pad_token_id,
+        "word_delimiter": getattr(asr.tokenizer, "word_delimiter_token", None),
+        "replace_word_delimiter": getattr(asr.tokenizer, "replace_word_delimiter_char", " "),
+    }
+    with open(os.path.join(out_dir, META_FILE), "w") as f:
+        json.dump(meta, f, indent=2)
+    print(f"✓ Wrote {out_dir}/")
+    return out_dir
+
+# =========================
+# FEATURES (NumPy)
+# =========================
+
+class FeatureExtractor:
+    """NumPy port of the exported model's transformers feature extractor
+
+    Called like the transformers one; always returns NumPy arrays.
+    """
+
+    def __init__(self, model_dir, meta):
+        self.sampling_rate = meta["sampling_rate"]
+        self.frontend = meta["frontend"]
+        self.mel_filters = None
+        if self.frontend["type"] == "mel":
+            self.mel_filters = np.load(os.path.join(model_dir, MEL_FILE))
+
+    def __call__(self, clips, sampling_rate=SAMPLE_RATE, **kwargs):
+        if isinstance(clips, np.ndarray) and clips.ndim == 1:
+            clips = [clips]
+        clips = [np.asarray(c, dtype=np.float32) for c in clips]
+        longest = max(len(c) for c in clips)
+        padded = np.full((len(clips), longest), self.frontend["padding_value"], dtype=np.float32)
+        mask = np.zeros((len(clips), longest), dtype=np.int64)
+        for i, clip in enumerate(clips):
+            padded[i, :len(clip)] = clip
+            mask[i, :len(clip)] = 1
+
+        if self.frontend["type"] == "mel":
+            return self._mel(padded, mask)
+        if self.frontend["do_normalize"]:
+            for i, clip in enumerate(clips):
+                n = len(clip)
+                padded[i] = (padded[i] - clip.mean()) / np.sqrt(clip.var() + 1e-7)
+                padded[i, n:] = self.frontend["padding_value"]
+        return {"features": padded, "attention_mask": mask}
+
+    def _mel(self, padded, mask):
+        """Log-mel frames, as LasrFeatureExtractor computes them with torch"""
+        hop, win = self.frontend["hop_length"], self.frontend["win_length"]
+        window = np.hanning(win)  # symmetric, like torch.hann_window(periodic=False)
+        frames = np.lib.stride_tricks.sliding_window_view(padded.astype(np.float64), win, axis=-1)
+        frames = frames[:, ::hop]
+        power = np.abs(np.fft.rfft(window * frames, n=self.frontend["n_fft"])) ** 2
+        mel = np.log(np.maximum(power @ self.mel_filters, 1e-5))
+        return {"features": mel.astype(np.float32),
+                "attention_mask": mask[:, win - 1::hop].astype(bool)}
+
+# =========================
+# CTC DECODING
+# =========================
+
+class CTCDecoder:
+    """Collapse and detokenize CTC ids like the model's transformers tokenizer"""
+
+    def __init__(self, model_dir, meta):
+        self.pad_token_id = meta["pad_token_id"]
+        self.word_delimiter = meta["word_delimiter"]
+        self.replace_word_delimiter = meta["replace_word_delimiter"]
+        self._tokenizer = None
+        self._vocab = None
+        tokenizer_json = os.path.join(model_dir, "tokenizer.json")
+        if os.path.exists(tokenizer_json):
+            from tokenizers import Tokenizer
+            self._tokenizer = Tokenizer.from_file(tokenizer_json)
+        else:
+            # Character vocabulary (Wav2Vec2CTCTokenizer)
+            with open(os.path.join(model_dir, "vocab.json")) as f:
+                vocab = json.load(f)
+            self._vocab = {i: token for token, i in vocab.items()}
+
+    def __len__(self):
+        if self._tokenizer is not None:
+            return self._tokenizer.get_vocab_size()
+        return len(self._vocab)
+
+    def convert_ids_to_tokens(self, ids):
+        if self._tokenizer is not None:
+            return [self._tokenizer.id_to_token(i) for i in ids]
+        return [self._vocab.get(i) for i in ids]
+
+    def decode(self, ids, skip_special_tokens=False):
+        ids = [int(group[0]) for group in itertools.groupby(np.asarray(ids).tolist())]
+        ids = [i for i in ids if i != self.pad_token_id]
+        if self._tokenizer is not None:
+            return self._tokenizer.decode(ids, skip_special_tokens=skip_special_tokens)
+        tokens = [self._vocab[i] for i in ids]
+        tokens = [self.replace_word_delimiter if t == self.word_delimiter else t for t in tokens]
+        return "".join(tokens).strip()
+
+# =========================
+# BACKEND
+# =========================
+
+class Logits:
+    """What the pipeline's model returns, as far as our callers look"""
+
+    def __init__(self, logits):
+        self.logits = logits
+
+class OnnxASR:
+    """ONNX Runtime stand-in for the transformers ASR pipeline
+
+    Exposes what the rest of the package uses: __call__ for whole clips,
+    feature_extractor, model, tokenizer, and ctc_batch() for padded
+    batches (logits plus each row's frame count).
+    """
+
+    device = "cpu"
+
+    def __init__(self, model_dir, quantized=True, threads=ONNX_THREADS):
+        import onnxruntime as ort
+
+        with open(os.path.join(model_dir, META_FILE)) as f:
+            meta = json.load(f)
+        self.model_dir = model_dir
+        self.align_to = meta["align_to"]
+        self.feature_extractor = FeatureExtractor(model_dir, meta)
+        self.tokenizer = CTCDecoder(model_dir, meta)
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        path = os.path.join(model_dir, INT8_FILE if quantized else MODEL_FILE)
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        # The mask keeps the dtype the feature extractor gave it at export (int32, bool, ...)
+        mask_type = {i.name: i.type for i in self.session.get_inputs()}["attention_mask"]
+        self.mask_dtype = MASK_DTYPES[mask_type]
+
+    def model(self, features, attention_mask):
+        return Logits(self._run(features, attention_mask)[0])
+
+    def _run(self, features, attention_mask):
+        return self.session.run(None, {"features": features,
+                                       "attention_mask": attention_mask.astype(self.mask_dtype)})
+
+    def ctc_batch(self, clips, sample_rate=SAMPLE_RATE):
+        """(logits [batch, frames, vocab], frames belonging to each clip)"""
+        with tracer.span("asr.features", batch=len(clips)):
+            inputs = self.feature_extractor(clips, sampling_rate=sample_rate)
+        with tracer.span("asr.forward", batch=len(clips)):
+            logits, lengths = self._run(inputs["features"], inputs["attention_mask"])
+        return logits, [int(n) for n in lengths]
+
+    def __call__(self, audio, chunk_length_s=CHUNK_LENGTH_S, stride_length_s=STRIDE_LENGTH_S):
+        """{"text": transcript} for a pipeline input, chunked like the pipeline"""
+        if isinstance(audio, str):
+            from medevac.asr import load_audio
+            audio = load_audio(audio)
+        elif isinstance(audio, dict):
+            from medevac.asr import resample
+            audio = resample(np.asarray(audio["array"], dtype=np.float32), audio["sampling_rate"],
+                             self.feature_extractor.sampling_rate)
+
+        sr = self.feature_extractor.sampling_rate
+        chunk = int(round(chunk_length_s * sr / self.align_to) * self.align_to)
+        stride = int(round(stride_length_s * sr / self.align_to) * self.align_to)
+        if chunk < 2 * stride:
+            raise ValueError("Chunk length must be superior to stride length")
+
+        ids = []
+        for start in range(0, len(audio), chunk - 2 * stride):
+            piece = audio[start:start + chunk]
+            left = 0 if start == 0 else stride
+            is_last = start + chunk >= len(audio)
+            right = 0 if is_last else stride
+            if len(piece) > left:
+                logits, _ = self.ctc_batch([piece], sr)
+                # Drop the frames that only overlap a neighbouring chunk's stride
+                total = int(round(len(piece) / self.align_to))
+                first = int(round(left / len(piece) * total))
+                last = total - int(round(right / len(piece) * total))
+                ids.append(logits[0, first:last].argmax(axis=-1))
+            if is_last:
+                break
+
+        with tracer.span("asr.decode"):
+            ids = np.concatenate(ids) if ids else np.zeros(0, dtype=np.int64)
+            return {"text": self.tokenizer.decode(ids, skip_special_tokens=False)}
+
+# =========================
+# PARITY CHECK
+# =========================
+
+def verify(model_path, onnx_dir, eval_csv, limit=None, quantized=True):
+    """Compare torch and ONNX transcripts (and their WER) on full_eval.csv audio"""
+    from medevac.asr import clean_transcription, load_asr, load_audio, transcribe
+    from medevac.eval_runner import read_manifest
+    from medevac.metrics import wer
+
+    rows = read_manifest(eval_csv)[:limit]
+    present = [r for r in rows if os.path.exists(r["path"])]
+    if len(present) < len(rows):
+        print(f"⚠ {len(rows) - len(present)} of {len(rows)} recordings not found next to {eval_csv}")
+    if not present:
+        print("❌ No audio to compare")
+        return False
+
+    torch_asr = load_asr(model_path, backend="torch")
+    onnx_asr = OnnxASR(onnx_dir, quantized=quantized)
+    same, wers, times = 0, {"torch": [], "onnx": []}, {"torch": [], "onnx": []}
+    for row in present:
+        audio = load_audio(row["path"])
+        texts = {}
+        for name, asr in (("torch", torch_asr), ("onnx", onnx_asr)):
+            t0 = time.perf_counter()
+            # A fresh dict each time: the transformers pipeline pops "array" from it
+            texts[name] = clean_transcription(
+                transcribe(asr, {"array": audio, "sampling_rate": SAMPLE_RATE}))
+            times[name].append(time.perf_counter() - t0)
+            wers[name].append(wer(row["gt"], texts[name]))
+        if texts["torch"] == texts["onnx"]:
+            same += 1
+        else:
+            print(f"\n{row['audio']}")
+            print(f"  torch: {texts['torch']}")
+            print(f"  onnx : {texts['onnx']}")
+
+    print(f"\n{len(present)} recordings, {'int8' if quantized else 'fp32'} ONNX vs torch")
+    print(f"  identical transcripts: {same}/{len(present)}")
+    for name in ("torch", "onnx"):
+        print(f"  {name:<6} WER {statistics.mean(wers[name]):.3f} | "
+              f"p50 {statistics.median(times[name]) * 1000:.0f} ms")
+    return same == len(present)
+
+def main():
+    parser = argparse.ArgumentParser(description="ONNX Runtime int8 ASR backend")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("export", help="export and quantize a transformers CTC model")
+    p.add_argument("model_path")
+    p.add_argument("--out", required=True, help="directory for the ONNX model and its files")
+    p.add_argument("--opset", type=int, default=OPSET)
+    p = sub.add_parser("verify", help="torch vs ONNX transcripts on full_eval.csv audio")
+    p.add_argument("model_path")
+    p.add_argument("onnx_dir")
+    p.add_argument("--eval", default="medevac-gemma_notebooks/full_eval.csv")
+    p.add_argument("--limit", type=int)
+    p.add_argument("--fp32", action="store_true", help="check the unquantized export instead")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export(args.model_path, args.out, args.opset)
+    elif args.command == "verify":
+        ok = verify(args.model_path, args.onnx_dir, args.eval, args.limit, not args.fp32)
+        raise SystemExit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,753 @@
+"""
+MedEvac-Gemma staged pipeline
+Source → ASR → LLM → TTS stages on worker threads joined by bounded queues
+
+Each stage works on the next report as soon as it hands the current one on,
+and the LLM stage streams sentences into the TTS queue while it generates.
+A file source starts transcribing while the casualty audio is still playing.
+Live push-to-talk segments reach the pipeline through a SegmentWorker, so
+the next report can be recorded while the last one is being answered.
+
+cancel() drops every report in flight (barge-in): the llama-server request
+is aborted, which frees its slot, speech stops, and each stage skips a
+cancelled report instead of working on it.
+"""
+
+import itertools
+import os
+import queue
+import subprocess
+import threading
+import time
+
+import requests
+
+from medevac.asr import clean_transcription, load_asr, load_audio, transcribe, warm_asr
+from medevac.cache import ResponseCache
+from medevac.config import (CHECK_INTERNET, LEXICON_CORRECTION, LLAMA_LOAD_TIMEOUT_S, LLAMA_LOG,
+                            LLM_STARTUP_WAIT_S, LLM_SUPERVISE, MIST_CARD, PROFILE_STAGES,
+                            QUEUE_SIZE, RESPONSE_CACHE, SAMPLE_RATE, TRACE_DIR, VAD, WARM_SLOTS)
+from medevac.lexicon import correct_transcript
+from medevac.llm import LLMClient, StreamCancelled, build_prompt
+from medevac.mist import extract_mist, llm_input
+from medevac.response import parse_response
+from medevac.startup import Startup
+from medevac.trace import tracer
+from medevac.tts import SentenceChunker, make_speaker
+from medevac.vad import trim_silence
+
+# =========================
+# REPORTS
+# =========================
+
+class Report:
+    """One casualty report moving through the pipeline
+
+    Give it either `audio` (a pipeline input) or a `transcriber` that has
+    been fed while recording. The report is `released` once the source has
+    finished (key released, playback ended); speech waits for that.
+    `started` is when capture began, if known; `cancelled` when it was
+    superseded.
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, audio=None, transcriber=None):
+        self.id = next(Report._ids)
+        self.audio = audio
+        self.transcriber = transcriber
+        self.transcript = None
+        self.mist = None  # MISTRecord, extracted ahead of the LLM
+        self.response = None
+        self.parsed = None  # TCCCResponse, when the response is in the TCCC format
+        self.error = None
+        self.timings = {}
+        self.created = time.time()
+        self.started = None
+        self.queued = None  # when the report entered its current stage's queue
+        self.released = None
+        self.cancelled = None
+        self._released = threading.Event()
+        self._done = threading.Event()
+
+    def release(self, at=None):
+        """Mark the end of the source audio (now, or at an earlier time)"""
+        self.released = at or time.time()
+        tracer.record("capture", self.started, self.released, trace=self.id)
+        self._released.set()
+
+    def cancel(self):
+        """Mark the report superseded; stages drop it instead of finishing it"""
+        if self.cancelled is None:
+            self.cancelled = time.time()
+            if self.transcriber is not None:
+                self.transcriber.cancel()
+        self._released.set()  # nothing is spoken for it, so don't wait for the source
+
+    def wait(self, timeout=None):
+        """Block until the response has been spoken (or the report failed)"""
+        return self._done.wait(timeout)
+
+    @property
+    def processing_time(self):
+        """ASR + LLM seconds, as printed by the original scripts"""
+        return self.timings.get("asr", 0) + self.timings.get("llm", 0)
+
+def mic_report(audio=None, transcriber=None, started=None):
+    """Report for a push-to-talk recording that has just ended"""
+    report = Report(audio=audio, transcriber=transcriber)
+    report.started = started
+    report.release()
+    return report
+
+def file_report(path, play=True):
+    """Report for a WAV file; transcription starts while it is still playing"""
+    report = Report(audio={"array": load_audio(path), "sampling_rate": SAMPLE_RATE})
+    if not play:
+        report.release()
+        return report
+
+    print("\n▶ Playing casualty audio...")
+    report.started = time.time()
+    player = subprocess.Popen(["afplay", path])
+
+    def wait_for_playback():
+        player.wait()
+        report.release()
+
+    threading.Thread(target=wait_for_playback, daemon=True).start()
+    return report
+
+# =========================
+# PIPELINE
+# =========================
+
+class Pipeline:
+    """ASR, LLM and TTS workers connected by bounded queues"""
+
+    def __init__(self, asr, llm=None, speak_fn=None, stream=True,
+                 queue_size=QUEUE_SIZE, cache=None, vad=VAD, lexicon=LEXICON_CORRECTION,
+                 mist=MIST_CARD):
+        self.asr = asr
+        self.vad = vad
+        self.lexicon = lexicon
+        self.mist = mist  # "speak", "print" or None
+        self.llm = llm or LLMClient()
+        self.cache = cache or (ResponseCache() if RESPONSE_CACHE else None)
+        # Our own speaker is closed with the pipeline; a speak_fn passed in is the caller's
+        self._own_speaker = speak_fn is None
+        self.speak = speak_fn or make_speaker()
+        self.stream = stream
+        self._active = set()  # submitted, not yet finished
+        self._llm_stream = None  # generation in progress, for cancel()
+        self._lock = threading.Lock()
+
+        self.asr_queue = queue.Queue(maxsize=queue_size)
+        self.llm_queue = queue.Queue(maxsize=queue_size)
+        self.tts_queue = queue.Queue()  # (report, sentence) items, one report at a time
+
+        self._threads = [
+            threading.Thread(target=self._asr_worker, name="asr", daemon=True),
+            threading.Thread(target=self._llm_worker, name="llm", daemon=True),
+            threading.Thread(target=self._tts_worker, name="tts", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, report):
+        """Queue a report for processing (blocks while the ASR queue is full)"""
+        report.queued = time.time()
+        with self._lock:
+            self._active.add(report)
+        self.asr_queue.put(report)
+        return report
+
+    @property
+    def busy(self):
+        """True while any submitted report is unfinished"""
+        return bool(self._active)
+
+    def cancel(self):
+        """Drop every report in flight: stop generation and speech; returns how many"""
+        with self._lock:
+            reports = list(self._active)
+            for report in reports:
+                report.cancel()
+            stream = self._llm_stream
+        if stream is not None:
+            stream.cancel()
+        if reports:
+            self._cancel_speech()
+        return len(reports)
+
+    def _cancel_speech(self):
+        cancel = getattr(self.speak, "cancel", None)
+        if cancel is not None:
+            cancel()
+
+    def close(self):
+        """Finish queued reports and stop the workers"""
+        self.asr_queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        if self._own_speaker:
+            self.speak.close()
+
+    # ASR stage
+    def _asr_worker(self):
+        while True:
+            report = self.asr_queue.get()
+            if report is None:
+                self.llm_queue.put(None)
+                return
+            try:
+                self._asr_stage(report)
+            except Exception as e:
+                # Never lose the worker: later reports still need it
+                self._finish(report, f"ASR stage error: {e}")
+
+    def _asr_stage(self, report):
+        if report.cancelled is not None:
+            self._finish(report)
+            return
+
+        print("🎧 Transcribing...")
+        t0 = time.time()
+        tracer.record("asr.queue", report.queued, t0, trace=report.id)
+        try:
+            with tracer.span("asr", trace=report.id):
+                if report.transcriber is not None:
+                    raw_text = report.transcriber.finish()
+                    report.timings["vad_removed"] = \
+                        report.transcriber.skipped / report.transcriber.sample_rate
+                else:
+                    raw_text = transcribe(self.asr, self._trim(report))
+                with tracer.span("asr.clean"):
+                    report.transcript = prepare_transcript(raw_text, self.lexicon)
+        except Exception as e:
+            self._finish(report, f"ASR error: {e}")
+            return
+        t1 = time.time()
+        report.timings["asr"] = t1 - t0
+        # What the speaker waits for after letting go of SPACE / the clip ending
+        if report.released is not None and report.released < t1:
+            tracer.record("asr.after_release", report.released, t1, trace=report.id)
+
+        if report.cancelled is not None or not report.transcript:
+            self._finish(report, "No speech recognized")
+            return
+        with tracer.span("mist", trace=report.id):
+            report.mist = extract_mist(report.transcript)
+        report.timings["mist"] = time.time() - t1
+        if self.mist and not report.mist.empty:
+            print(f"🩺 Preliminary MIST\n{report.mist.card()}")
+        report.queued = time.time()
+        self.llm_queue.put(report)
+
+    def _trim(self, report):
+        """ASR input with dead air removed, when VAD is on"""
+        audio = report.audio
+        if not self.vad or not isinstance(audio, dict):
+            return audio
+        with tracer.span("asr.vad") as span:
+            trimmed, removed = trim_silence(audio["array"], audio["sampling_rate"])
+            span.set(removed_s=removed)
+        report.timings["vad_removed"] = removed
+        return dict(audio, array=trimmed)
+
+    # LLM stage
+    def _llm_worker(self):
+        while True:
+            report = self.llm_queue.get()
+            if report is None:
+                self.tts_queue.put(None)
+                return
+            try:
+                self._llm_stage(report)
+            except Exception as e:
+                print(f"\n❌ LLM stage error: {e}")
+                report.error = f"LLM stage error: {e}"
+                self.tts_queue.put((report, None))  # finished, in order, by the TTS worker
+
+    def _llm_stage(self, report):
+        tracer.record("llm.queue", report.queued, time.time(), trace=report.id)
+        if report.cancelled is not None:
+            self._finish(report)
+            return
+        if self.cache is not None:
+            with tracer.span("llm.cache", trace=report.id) as span:
+                cached = cached_response(self.cache, report.transcript)
+                span.set(hit=cached is not None)
+            if cached is not None:
+                self._cached_llm(report, cached)
+                self.tts_queue.put((report, None))
+                return
+
+        # Spoken from this worker so it stays ahead of the answer and behind the last one
+        if self.mist == "speak" and not report.mist.empty:
+            self.tts_queue.put((report, report.mist.spoken()))
+        prompt = report_prompt(report.transcript, report.mist)
+        print("🤖 Analyzing with MedGemma-4B-TCCC...")
+        with tracer.span("llm", trace=report.id, stream=self.stream):
+            if self.stream:
+                self._stream_llm(report, prompt)
+            else:
+                self._blocking_llm(report, prompt)
+        if report.cancelled is not None:
+            self._finish(report)
+            return
+        if report.response and not report.error:
+            report.parsed = store_response(self.cache, report.transcript, report.response)
+        self.tts_queue.put((report, None))
+
+    def _cached_llm(self, report, response):
+        print("🤖 Repeat report, answering from response cache")
+        print_header()
+        print(response)
+        print("=" * 60)
+        report.response = response
+        report.parsed = parse_or_none(response)
+        report.timings.update(llm=0.0, cached=True)
+        for chunk in sentences(response) if self.stream else [response]:
+            self.tts_queue.put((report, chunk))
+
+    def _start_llm(self, report, prompt):
+        """LLM stream for a report, registered so cancel() can abort it"""
+        stream = self.llm.stream(prompt)
+        with self._lock:
+            self._llm_stream = stream
+            if report.cancelled is not None:
+                stream.cancel()
+        return stream
+
+    def _end_llm(self, report, stream):
+        """Unregister the stream; a cancelled one records how long it took to stop"""
+        with self._lock:
+            self._llm_stream = None
+        if stream.cancelled and report.cancelled is not None:
+            now = time.time()
+            report.timings["cancel_llm"] = now - report.cancelled
+            tracer.record("cancel.llm", report.cancelled, now, trace=report.id)
+
+    def _llm_failed(self):
+        """Error for a failed request, with the supervised server's state when it is down"""
+        supervisor = self.llm.supervisor
+        if supervisor is not None and supervisor.state != "ready":
+            return f"LLM failed to respond (llama-server {supervisor.state})"
+        return "LLM failed to respond"
+
+    def _stream_llm(self, report, prompt):
+        stream = self._start_llm(report, prompt)
+        print_header()
+        t0 = time.time()
+        try:
+            report.response = stream_sentences(
+                stream, lambda chunk: self.tts_queue.put((report, chunk)),
+                on_piece=lambda piece: print(piece, end="", flush=True))
+        except StreamCancelled:
+            print("\n" + "=" * 60)
+            return
+        except requests.exceptions.RequestException as e:
+            print(f"\n❌ LLM server error: {e}")
+            report.error = self._llm_failed()
+            return
+        finally:
+            self._end_llm(report, stream)
+        print("\n" + "=" * 60)
+
+        report.timings.update(llm=stream.latency, ttft=stream.ttft,
+                              tokens_per_s=stream.tokens_per_s, n_tokens=stream.n_tokens,
+                              first_request=stream.first_request, cold_prefix=stream.cold)
+        trace_stream(stream, t0)
+        if not report.response:
+            report.error = "LLM failed to respond"
+
+    def _blocking_llm(self, report, prompt):
+        # Same as LLMClient.complete(), on a stream cancel() can reach
+        stream = self._start_llm(report, prompt)
+        try:
+            for _ in stream:
+                pass
+        except StreamCancelled:
+            return
+        except requests.exceptions.RequestException as e:
+            print(f"❌ LLM server error: {e}")
+            report.error = self._llm_failed()
+            return
+        finally:
+            self._end_llm(report, stream)
+        llm_out, llm_time = stream.text.strip(), stream.latency
+        print_header()
+        print(llm_out)
+        print("=" * 60)
+        report.response = llm_out
+        report.timings["llm"] = llm_time
+        self.tts_queue.put((report, llm_out))
+
+    # TTS stage
+    def _tts_worker(self):
+        while True:
+            item = self.tts_queue.get()
+            if item is None:
+                return
+            report, chunk = item
+            try:
+                self._tts_item(report, chunk)
+            except Exception as e:
+                print(f"❌ TTS error: {e}")
+                report.error = report.error or f"TTS error: {e}"
+                if chunk is None:
+                    self._finish(report, report.error)
+
+    def _tts_item(self, report, chunk):
+        if chunk is None:
+            # A report is done once its last chunk has been heard
+            wait = getattr(self.speak, "wait", None)
+            if wait is not None and report.cancelled is None:
+                with tracer.span("tts.drain", trace=report.id):
+                    wait()
+            self._finish(report, report.error)
+            return
+        if "first_audio" not in report.timings:
+            t0 = time.time()
+            report._released.wait()
+            tracer.record("tts.wait_release", t0, time.time(), trace=report.id)
+            report.timings["first_audio"] = time.time() - report.released
+        if report.cancelled is not None:
+            return
+        with tracer.span("tts.speak", trace=report.id, chars=len(chunk)):
+            self.speak(chunk)
+        if report.cancelled is not None:
+            # Cancelled while the chunk was being queued; cancel() may have missed it
+            self._cancel_speech()
+
+    def _finish(self, report, error=None):
+        if report.cancelled is not None:
+            error = "Cancelled"
+            print(f"⏹ Report {report.id} cancelled")
+        elif error:
+            print(f"❌ {error}")
+        report.error = error
+        with self._lock:
+            self._active.discard(report)
+        tracer.record("report", report.started or report.created, time.time(),
+                      trace=report.id, error=error)
+        report._done.set()
+
+# =========================
+# LIVE CAPTURE
+# =========================
+FEED_INTERVAL = 0.05  # Seconds between ring reads while a live segment records
+
+class SegmentWorker:
+    """Drain a SegmentRecorder's job queue into the pipeline on its own thread
+
+    Each segment is copied out of the ring and submitted as a report. With
+    `make_transcriber`, a segment is fed to an incremental transcriber
+    while it is still recording (use a live recorder). Finished reports go
+    to `on_done` in order, from a second thread, so nothing upstream ever
+    waits for an answer. cancel() also drops segments recorded before it.
+    """
+
+    def __init__(self, pipeline, recorder, make_transcriber=None, on_done=None):
+        self.pipeline = pipeline
+        self.recorder = recorder
+        self.ring = recorder.ring
+        self.make_transcriber = make_transcriber
+        self.on_done = on_done
+        self._cutoff = 0.0  # segments started before this were superseded
+        self._submitted = queue.Queue()
+        self._threads = [threading.Thread(target=self._run, name="segments", daemon=True),
+                         threading.Thread(target=self._report_done, name="reports", daemon=True)]
+        for thread in self._threads:
+            thread.start()
+
+    def cancel(self):
+        """Drop earlier segments and everything in the pipeline (call before recorder.begin())"""
+        self._cutoff = time.time()
+        return self.pipeline.cancel()
+
+    def join(self):
+        """Wait until every queued segment has been answered (after recorder.stop())"""
+        for thread in self._threads:
+            thread.join()
+
+    def _run(self):
+        while True:
+            segment = self.recorder.jobs.get()
+            if segment is None:
+                self._submitted.put(None)
+                return
+            if segment.started < self._cutoff:
+                continue
+            try:
+                report = self._report(segment)
+            except Exception as e:
+                print(f"❌ Capture failed: {e}")
+                continue
+            if report is not None and segment.started < self._cutoff:
+                report.cancel()  # superseded while it was being read out
+                continue
+            if report is not None:
+                self.pipeline.submit(report)
+                self._submitted.put(report)
+
+    def _report(self, segment):
+        """Report for a segment, or None if it has no usable audio"""
+        if self.make_transcriber is not None:
+            transcriber = self.make_transcriber()
+            fed = segment.start
+            while True:
+                closed = segment.wait(FEED_INTERVAL)
+                audio = self.ring.read(fed, segment.end if closed else self.ring.written)
+                if audio is None:
+                    break
+                transcriber.feed(audio)
+                fed += len(audio)
+                if closed:
+                    break
+            if audio is None or fed == segment.start:
+                transcriber.finish()
+                return self._skip(audio)
+            report = Report(transcriber=transcriber)
+        else:
+            segment.wait()
+            audio = self.ring.read(segment.start, segment.end)
+            if audio is None or len(audio) == 0:
+                return self._skip(audio)
+            report = Report(audio={"array": audio, "sampling_rate": self.ring.sample_rate})
+        report.started = segment.started
+        report.release(segment.released)
+        return report
+
+    def _skip(self, audio):
+        if audio is None:
+            print("❌ Recording was overwritten before it could be processed")
+        else:
+            print("❌ No audio recorded")
+        return None
+
+    def _report_done(self):
+        while True:
+            report = self._submitted.get()
+            if report is None:
+                return
+            report.wait()
+            if self.on_done is not None:
+                try:
+                    self.on_done(report)
+                except Exception as e:
+                    print(f"❌ Report callback failed: {e}")
+
+# =========================
+# STAGES
+# =========================
+# Shared by the Pipeline and the gateway, so a report gets the same
+# transcript, prompt, cache key and parse whichever way it came in
+
+def prepare_transcript(raw_text, lexicon=LEXICON_CORRECTION):
+    """Cleaned ASR output, with near-miss TCCC terms corrected when `lexicon` is on"""
+    transcript = clean_transcription(raw_text)
+    return correct_transcript(transcript) if lexicon else transcript
+
+def report_prompt(transcript, mist):
+    """LLM prompt for a transcript and its preliminary MIST record"""
+    return build_prompt(llm_input(transcript, mist))
+
+def cached_response(cache, transcript):
+    """Earlier response to the same report, or None (no cache or a miss)"""
+    return cache.get(transcript) if cache is not None else None
+
+def stream_sentences(stream, on_sentence, on_piece=None):
+    """Drain an LLM stream, handing on each sentence as it completes; returns the text"""
+    chunker = SentenceChunker()
+    for piece in stream:
+        if on_piece is not None:
+            on_piece(piece)
+        for chunk in chunker.feed(piece):
+            on_sentence(chunk)
+    for chunk in chunker.flush():
+        on_sentence(chunk)
+    return stream.text.strip()
+
+def sentences(text):
+    """A finished response split the way a stream of it would be"""
+    chunker = SentenceChunker()
+    return chunker.feed(text) + chunker.flush()
+
+def store_response(cache, transcript, response):
+    """Parse a newly generated response and cache it; returns its TCCCResponse or None"""
+    parsed = parse_or_none(response)
+    if cache is not None:
+        cache.put(transcript, response)
+    return parsed
+
+def parse_or_none(response):
+    """TCCCResponse for a response, or None if it is not in the TCCC format"""
+    try:
+        return parse_response(response)
+    except ValueError:
+        return None
+
+def trace_stream(stream, start):
+    """Split a finished LLM stream into TTFT / server prefill / decode spans"""
+    if stream.ttft is not None:
+        tracer.record("llm.ttft", start, start + stream.ttft,
+                      first_request=stream.first_request, cold_prefix=stream.cold)
+        tracer.record("llm.decode", start + stream.ttft, start + stream.latency,
+                      n_tokens=stream.n_tokens, tokens_per_s=stream.tokens_per_s)
+    # Server-side prompt processing, when llama-server reports it
+    if "prompt_ms" in stream.timings:
+        tracer.record("llm.prefill", start, start + stream.timings["prompt_ms"] / 1000,
+                      prompt_n=stream.timings.get("prompt_n"),
+                      cache_n=stream.timings.get("cache_n"))
+
+# =========================
+# OUTPUT
+# =========================
+
+def print_header():
+    """Banner printed above the model output"""
+    print("\n" + "=" * 60)
+    print("TCCC ASSESSMENT")
+    print("=" * 60)
+
+def print_timings(report):
+    """Streaming latency details for a finished report"""
+    if report.timings.get("vad_removed"):
+        print(f"VAD: {report.timings['vad_removed']:.1f}s of silence skipped before ASR")
+    if report.timings.get("cached"):
+        print("LLM: answered from response cache")
+    if report.timings.get("ttft") is not None:
+        notes = []
+        if report.timings.get("first_request"):
+            notes.append("first request")
+        if report.timings.get("cold_prefix"):
+            notes.append("prefix cache miss")
+        note = f" [{', '.join(notes)}]" if notes else ""
+        print(f"LLM TTFT: {report.timings['ttft']:.2f}s | "
+              f"{report.timings['tokens_per_s']:.1f} tok/s ({report.timings['n_tokens']} tokens){note}")
+    if "first_audio" in report.timings:
+        print(f"Time to first audio: {report.timings['first_audio']:.2f}s")
+
+# =========================
+# STARTUP
+# =========================
+
+def check_internet():
+    """Check if internet is available (we DON'T need it!)"""
+    try:
+        requests.get("https://www.google.com", timeout=2)
+        return True
+    except requests.exceptions.RequestException:
+        return False
+
+def initialize_system(asr_model_path, llm, startup=None, check_net=CHECK_INTERNET):
+    """Check systems, load and warm the ASR model; returns the ASR pipeline or None
+
+    The LLM health check and slot warm-up and the ASR load and warm-up run
+    side by side (see medevac.startup); pass Startup(parallel=False) to
+    run them one after another instead.
+    """
+    if TRACE_DIR:
+        tracer.start(TRACE_DIR, profile=PROFILE_STAGES)
+        print(f"✓ Tracing stages to {TRACE_DIR}/" + (" (profiling on)" if PROFILE_STAGES else ""))
+
+    if LLM_SUPERVISE and llm.supervisor is None:
+        from medevac.supervisor import LlamaSupervisor
+        llm.supervisor = LlamaSupervisor()
+    # A server we launch ourselves gets the whole model load time
+    wait = LLAMA_LOAD_TIMEOUT_S if llm.supervisor is not None else LLM_STARTUP_WAIT_S
+
+    def llm_health():
+        # After a power cycle llama-server may still be loading its model
+        if not llm.wait_healthy(wait):
+            raise RuntimeError(f"no /health answer in {wait}s")
+
+    startup = startup or Startup()
+    if check_net:
+        # We don't need it; the probe only shows we're offline-capable
+        startup.add("internet", check_internet)
+    if llm.supervisor is not None:
+        startup.add("llm.server", llm.supervisor.start, required=True)
+    startup.add("llm.health", llm_health, after=["llm.server"] if llm.supervisor else [],
+                required=True)
+    if WARM_SLOTS:
+        # Prefill the system prompt into every slot so the first report is warm too
+        startup.add("llm.warm", llm.warm_up, after=["llm.health"])
+    startup.add("asr.load", lambda: load_asr(asr_model_path), required=True)
+    startup.add("asr.warm", lambda: warm_asr(startup.result("asr.load")), after=["asr.load"])
+
+    print("\n📡 Loading MedASR-mil locally and checking the LLM server...")
+    startup.run()
+    failed = startup.failed()
+
+    if startup.ok("internet"):
+        if startup.result("internet"):
+            print("⚠ Internet detected (not required for operation)")
+        else:
+            print("✓ Running offline (no internet connection)")
+
+    # Only the step that failed is reported; the others may not have finished
+    if failed is not None and failed.name == "asr.load":
+        print(f"❌ ASR model failed to load: {failed.error}")
+        return None
+    if failed is not None and llm.supervisor is not None:
+        supervisor = llm.supervisor
+        reason = startup.steps["llm.server"].error or supervisor.reason or supervisor.state
+        print(f"❌ llama-server did not start: {reason} (log: {LLAMA_LOG})")
+        return None
+    if failed is not None:
+        print("❌ LLM server not running!")
+        print("\nStart server in another terminal:")
+        print("  ./start_llm_server.sh")
+        return None
+    print("✓ LLM server online")
+    if startup.ok("llm.warm"):
+        warmed, warm_time = startup.result("llm.warm")
+        print(f"  🔥 KV cache warmed: {warmed} slot(s) in {warm_time:.2f}s")
+
+    if not startup.ok("asr.warm"):
+        print(f"⚠ ASR warm-up failed: {startup.steps['asr.warm'].error}")
+    print("✓ ASR ready")
+
+    for line in startup.timeline():
+        print(line)
+    return startup.result("asr.load")
+
+def run_demo(audio_file, asr_model_path):
+    """Play a recorded casualty report and answer it out loud"""
+    print("=" * 60)
+    print("MEDEVAC-GEMMA SYSTEM")
+    print("=" * 60)
+
+    # Pre-flight checks
+    if not os.path.exists(audio_file):
+        print(f"❌ Audio file not found: {audio_file}")
+        return
+
+    llm = LLMClient()
+    asr = initialize_system(asr_model_path, llm)
+    if asr is None:
+        return
+
+    print("\n" + "=" * 60)
+    print("SYSTEM READY - STANDBY FOR CASUALTY REPORT")
+    print("=" * 60)
+
+    pipeline = Pipeline(asr, llm)
+    report = pipeline.submit(file_report(audio_file))
+    report.wait()
+    pipeline.close()
+
+    if report.error:
+        return
+
+    # Summary
+    print("\n" + "=" * 60)
+    print("ASSESSMENT COMPLETE")
+    print("=" * 60)
+    print(f"Total Response Time: {report.processing_time:.2f}s")
+    print_timings(report)
+    print("=" * 60)
+    print("\nSystem ready for next casualty report...\n")
@@ -0,0 +1,67 @@
+"""
+MedEvac-Gemma response format
+GBNF grammar for the ASSESSMENT / ACTION / WARNING format and a parser
+into a typed response
+
+With the grammar, llama-server can only produce the format the system
+prompt asks for: one assessment line, three or four numbered actions and a
+single warning sentence. Generation ends as soon as that sentence does,
+instead of running on to MAX_TOKENS. The output is still plain text, so it
+streams into TTS unchanged.
+"""
+
+import re
+
+# =========================
+# GRAMMAR
+# =========================
+TCCC_GRAMMAR = r'''
+root     ::= "ASSESSMENT:\n" line "\n\nACTION:\n1. " line "\n2. " line "\n3. " line ("\n4. " line)? "\n\nWARNING:\n" sentence
+line     ::= [^\n]+
+sentence ::= [^\n.!?]+ [.!?]
+'''
+
+# =========================
+# PARSER
+# =========================
+SECTIONS = re.compile(r"ASSESSMENT:\s*(.*?)\s*ACTION:\s*(.*?)\s*WARNING:\s*(.*)", re.S)
+ACTION_ITEM = re.compile(r"^\s*\d+[.)]\s*(.+?)\s*$", re.M)
+
+class TCCCResponse:
+    """Assessment sentence, numbered actions and warning of one response"""
+
+    def __init__(self, assessment, actions, warning):
+        self.assessment = assessment
+        self.actions = actions
+        self.warning = warning
+
+    def __repr__(self):
+        return (f"TCCCResponse(assessment={self.assessment!r}, actions={self.actions!r}, "
+                f"warning={self.warning!r})")
+
+    def __eq__(self, other):
+        return isinstance(other, TCCCResponse) and vars(self) == vars(other)
+
+    def as_dict(self):
+        return {"assessment": self.assessment, "actions": list(self.actions),
+                "warning": self.warning}
+
+    def text(self):
+        """Render back in the format the grammar produces"""
+        actions = "\n".join(f"{i}. {a}" for i, a in enumerate(self.actions, 1))
+        return f"ASSESSMENT:\n{self.assessment}\n\nACTION:\n{actions}\n\nWARNING:\n{self.warning}"
+
+def parse_response(text):
+    """Parse model output into a TCCCResponse; raises ValueError if a section is missing"""
+    # Chat transcripts echo the format in the prompt; the answer is the last one
+    match = SECTIONS.search(text, max(text.rfind("ASSESSMENT:"), 0))
+    if match is None:
+        raise ValueError("Response is missing ASSESSMENT, ACTION or WARNING")
+    assessment, action_text, warning = match.groups()
+    assessment = " ".join(assessment.split())
+    actions = ACTION_ITEM.findall(action_text)
+    # Free-form output may run on after the warning; keep its first paragraph
+    warning = " ".join(warning.strip().split("\n\n")[0].lstrip("-• ").split())
+    if not assessment or not actions or not warning:
+        raise ValueError("Response has an empty ASSESSMENT, ACTION or WARNING")
+    return TCCCResponse(assessment, actions, warning)
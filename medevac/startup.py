@@ -0,0 +1,147 @@
+"""
+MedEvac-Gemma startup orchestration
+Run independent startup steps side by side and report when each finished
+
+Most of startup is waiting: on the torch/transformers import and model
+load, on llama-server's health check and on the slot prefill. None of
+these depend on each other, so each step runs on its own thread as soon as
+the steps it needs are done. The timeline printed afterwards shows what
+the critical path was; every step is also traced (startup.<step>) so
+time-to-ready is tracked next to the per-report stage timings.
+"""
+
+import threading
+import time
+
+from medevac.trace import tracer
+
+# =========================
+# CONFIGURATION
+# =========================
+BAR_WIDTH = 40  # Characters for the whole startup in the timeline
+
+# =========================
+# STEPS
+# =========================
+
+class Step:
+    """One startup step: its function, the steps it waits for, and its outcome"""
+
+    def __init__(self, name, fn, after, required):
+        self.name = name
+        self.fn = fn
+        self.after = after
+        self.required = required
+        self.result = None
+        self.error = None
+        self.start = None
+        self.end = None
+        self.done = threading.Event()
+
+    @property
+    def ok(self):
+        return self.done.is_set() and self.error is None
+
+# =========================
+# ORCHESTRATOR
+# =========================
+
+class Startup:
+    """Run named steps on threads, each once the steps it depends on succeed
+
+    With `parallel=False` the steps run one after another in the order they
+    were added, which is how startup used to work (for comparison).
+    A failed `required` step ends run() early; steps depending on a failed
+    step are skipped.
+    """
+
+    def __init__(self, parallel=True):
+        self.parallel = parallel
+        self.steps = {}
+        self.started = None
+        self.ready = None
+        self._changed = threading.Condition()  # notified whenever a step finishes
+
+    def add(self, name, fn, after=(), required=False):
+        """Register fn() as step `name`, run after the steps named in `after`"""
+        self.steps[name] = Step(name, fn, tuple(after), required)
+
+    def result(self, name):
+        """Return value of a finished step"""
+        return self.steps[name].result
+
+    def ok(self, name):
+        return name in self.steps and self.steps[name].ok
+
+    def failed(self):
+        """The required step that failed first, or None
+
+        Steps still running when run() returned are unchecked, not failed;
+        steps skipped because a dependency failed finish after it, so the
+        earliest failure is the cause to report.
+        """
+        failed = [s for s in self.steps.values()
+                  if s.required and s.done.is_set() and s.error is not None]
+        return min(failed, key=lambda s: s.end, default=None)
+
+    def run(self):
+        """Run every step; returns True unless a required step failed"""
+        self.started = time.time()
+        if self.parallel:
+            for step in self.steps.values():
+                threading.Thread(target=self._run_step, args=(step,), name=f"startup-{step.name}",
+                                 daemon=True).start()
+        else:
+            for step in self.steps.values():
+                self._run_step(step)
+                if step.required and step.error is not None:
+                    break
+
+        # Wake on every finished step, so a required failure ends the wait at once
+        with self._changed:
+            self._changed.wait_for(self._settled)
+        self.ready = time.time()
+        tracer.record("startup", self.started, self.ready, parallel=self.parallel)
+        return all(s.ok for s in self.steps.values() if s.required)
+
+    def _run_step(self, step):
+        for name in step.after:
+            self.steps[name].done.wait()
+        failed = [name for name in step.after if self.steps[name].error is not None]
+        step.start = time.time()
+        try:
+            if failed:
+                raise RuntimeError(f"skipped ({', '.join(failed)} failed)")
+            step.result = step.fn()
+        except Exception as e:
+            step.error = e
+        step.end = time.time()
+        tracer.record(f"startup.{step.name}", step.start, step.end, ok=step.error is None)
+        with self._changed:
+            step.done.set()
+            self._changed.notify_all()
+
+    def _settled(self):
+        """True once every step is done or a required one has failed"""
+        steps = self.steps.values()
+        return all(s.done.is_set() for s in steps) or \
+            any(s.required and s.error is not None for s in steps)
+
+    def timeline(self):
+        """Printable lines: each step's start/end offsets and a bar on a shared scale"""
+        total = max((self.ready or time.time()) - self.started, 1e-6)
+        width = max(len(name) for name in self.steps)
+        lines = [f"⏱ Startup timeline ({'parallel' if self.parallel else 'sequential'}): "
+                 f"ready in {total:.2f}s"]
+        for step in self.steps.values():
+            if step.start is None:
+                lines.append(f"  {step.name:<{width}}  (not run)")
+                continue
+            end = step.end if step.end is not None else self.ready
+            first = min(int(round((step.start - self.started) / total * BAR_WIDTH)), BAR_WIDTH - 1)
+            last = max(first + 1, min(int(round((end - self.started) / total * BAR_WIDTH)), BAR_WIDTH))
+            bar = " " * first + "█" * (last - first)
+            status = "" if step.end is None or step.error is None else f"  ❌ {step.error}"
+            lines.append(f"  {step.name:<{width}} {step.start - self.started:6.2f} → "
+                         f"{end - self.started:6.2f}s |{bar:<{BAR_WIDTH}}|{status}")
+        return lines
@@ -0,0 +1,288 @@
+"""
+MedEvac-Gemma stub llama-server
+Stand-in for llama-server's HTTP API (/health, /slots, /completion) that
+answers with a canned TCCC response, for exercising the client and
+pipeline without a model
+
+It also takes llama-server's own flags (-m, -c, -b, -ub, -t, -tb,
+--no-mmap, ...), so it can stand in for the binary under
+medevac.supervisor. Threads and batch sizes then set its token and
+prefill delays from a rough CPU cost model, and --load-delay and
+--exit-after emulate model loading and crashes.
+
+Usage:
+  python -m medevac.stub_server --port 8081 [--slots 2] [--token-delay 0.02]
+                                [--stall-after N] [--die-after N]
+                                [--load-delay S] [--exit-after N]
+  python -m medevac.stub_server -m MODEL -c 1024 -b 512 -ub 256 -t 6 -tb 6 --port 8081
+"""
+
+import argparse
+import json
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# =========================
+# CONFIGURATION
+# =========================
+RESPONSE = """ASSESSMENT:
+Casualty with GSW to left ankle, tourniquet applied, tachycardic at HR 122.
+
+ACTION:
+1. Reassess tourniquet and mark time of application.
+2. Check distal perfusion and capillary refill.
+3. Administer analgesia per TCCC guidelines.
+4. Prepare for urgent evacuation.
+
+WARNING:
+Rising heart rate may indicate developing hemorrhagic shock."""
+DECODE_CORE_S = 0.02  # Seconds per token on one core (llama-server flags only)
+PREFILL_CORE_S = 0.002  # Seconds per prompt token on one core at ubatch 512
+
+# =========================
+# STUB SERVER
+# =========================
+
+def tokenize(text):
+    """Whitespace-attached word pieces standing in for model tokens"""
+    return re.findall(r"\s*\S+|\s+", text)
+
+class StubServer:
+    """llama-server look-alike running on a background thread
+
+    `stall_after` stops sending (without closing) after that many tokens
+    and `die_after` drops the connection, to exercise failover.
+    `exit_after` ends the whole process after that many completions.
+    """
+
+    def __init__(self, port=0, slots=1, token_delay=0.01, prefill_per_token=0.0,
+                 stall_after=None, die_after=None, response=RESPONSE, exit_after=None):
+        self.n_slots = slots
+        self.token_delay = token_delay
+        self.prefill_per_token = prefill_per_token
+        self.stall_after = stall_after
+        self.die_after = die_after
+        self.exit_after = exit_after
+        self.tokens = tokenize(response)
+        self.healthy = True
+        self.requests = []
+
+        self._busy = [False] * slots
+        self._cache = [[] for _ in range(slots)]  # prompt tokens held per slot
+        self._slot_free = threading.Condition()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        self.url = f"http://127.0.0.1:{self.port}"
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def acquire_slot(self, wanted=None):
+        """Block until a slot is free; returns its id"""
+        with self._slot_free:
+            while True:
+                free = [i for i, busy in enumerate(self._busy) if not busy]
+                if wanted is not None and wanted in free:
+                    free = [wanted]
+                if free:
+                    self._busy[free[0]] = True
+                    return free[0]
+                self._slot_free.wait()
+
+    def release_slot(self, slot):
+        with self._slot_free:
+            self._busy[slot] = False
+            self._slot_free.notify_all()
+
+    def slots(self):
+        return [{"id": i, "is_processing": busy} for i, busy in enumerate(self._busy)]
+
+    def evict(self, slot=None):
+        """Drop the cached prompt of one slot (or all of them)"""
+        for i in range(self.n_slots) if slot is None else [slot]:
+            self._cache[i] = []
+
+    def prefill(self, slot, prompt):
+        """Emulate prompt processing with cache reuse; returns (prompt_n, cache_n)"""
+        tokens = tokenize(prompt)
+        cached = self._cache[slot]
+        cache_n = 0
+        while cache_n < min(len(tokens), len(cached)) and tokens[cache_n] == cached[cache_n]:
+            cache_n += 1
+        prompt_n = len(tokens) - cache_n
+        time.sleep(self.prefill_per_token * prompt_n)
+        self._cache[slot] = tokens
+        return prompt_n, cache_n
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _json(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path == "/health":
+                    if stub.healthy:
+                        self._json(200, {"status": "ok"})
+                    else:
+                        self._json(503, {"error": {"message": "Loading model"}})
+                elif self.path == "/slots":
+                    self._json(200, stub.slots())
+                else:
+                    self._json(404, {"error": {"message": "File Not Found"}})
+
+            def do_POST(self):
+                if self.path != "/completion":
+                    self._json(404, {"error": {"message": "File Not Found"}})
+                    return
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                stub.requests.append(body)
+
+                slot = stub.acquire_slot(body.get("id_slot"))
+                try:
+                    self._complete(body, slot)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # client went away (cancelled); stop generating like llama-server
+                finally:
+                    stub.release_slot(slot)
+                if stub.exit_after is not None and len(stub.requests) >= stub.exit_after:
+                    os._exit(1)  # crash like a llama-server abort, mid-connection
+
+            def _complete(self, body, slot):
+                # A prompt that already ends with part of the response is a
+                # failover continuation; carry on from there like the model would
+                prompt = body.get("prompt", "")
+                start = max((k for k in range(len(stub.tokens) + 1)
+                             if prompt.endswith("".join(stub.tokens[:k]))), default=0)
+                tokens = stub.tokens[start:]
+                n_predict = body.get("n_predict", -1)
+                if n_predict >= 0:
+                    tokens = tokens[:n_predict]
+
+                t0 = time.perf_counter()
+                if not body.get("cache_prompt", True):
+                    stub.evict(slot)
+                prompt_n, cache_n = stub.prefill(slot, prompt)
+                t1 = time.perf_counter()
+                timings = {"prompt_n": prompt_n, "cache_n": cache_n, "predicted_n": len(tokens),
+                           "prompt_ms": (t1 - t0) * 1000}
+
+                if not body.get("stream"):
+                    time.sleep(stub.token_delay * len(tokens))
+                    timings["predicted_ms"] = (time.perf_counter() - t1) * 1000
+                    self._json(200, {"content": "".join(tokens), "id_slot": slot,
+                                     "tokens_predicted": len(tokens), "stop": True,
+                                     "timings": per_second(timings)})
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+
+                for i, token in enumerate(tokens):
+                    if stub.die_after is not None and i >= stub.die_after:
+                        return
+                    if stub.stall_after is not None and i >= stub.stall_after:
+                        time.sleep(3600)
+                    time.sleep(stub.token_delay)
+                    self._event({"content": token, "stop": False, "id_slot": slot})
+
+                timings["predicted_ms"] = (time.perf_counter() - t1) * 1000
+                self._event({"content": "", "stop": True, "id_slot": slot,
+                             "timings": per_second(timings)})
+
+            def _event(self, event):
+                self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+                self.wfile.flush()
+
+        return Handler
+
+def per_second(timings):
+    """Add llama-server's throughput fields to a timings dict"""
+    timings["prompt_per_second"] = timings["prompt_n"] / max(timings["prompt_ms"] / 1000, 1e-6)
+    timings["predicted_per_second"] = (timings["predicted_n"]
+                                       / max(timings["predicted_ms"] / 1000, 1e-6))
+    return timings
+
+def llama_delays(threads, threads_batch, ubatch, cpus=None):
+    """(token_delay, prefill_per_token) for llama-server thread and batch settings
+
+    A toy model: decode and prefill scale with threads up to the core
+    count and slow down past it; bigger micro-batches prefill faster.
+    """
+    cpus = cpus or os.cpu_count() or 1
+
+    def speedup(n):
+        return min(n, cpus) / (1 + 0.5 * max(n - cpus, 0))
+
+    token_delay = DECODE_CORE_S / speedup(threads)
+    prefill = PREFILL_CORE_S / speedup(threads_batch) * (512 / max(min(ubatch, 512), 32)) ** 0.5
+    return token_delay, prefill
+
+# =========================
+# MAIN
+# =========================
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub llama-server")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--slots", "-np", "--parallel", type=int, default=1)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    parser.add_argument("--prefill-per-token", type=float, default=0.002)
+    parser.add_argument("--stall-after", type=int)
+    parser.add_argument("--die-after", type=int)
+    parser.add_argument("--load-delay", type=float, default=0.0,
+                        help="seconds /health answers 503 (model loading)")
+    parser.add_argument("--exit-after", type=int, help="exit after N completions (crash)")
+    # llama-server's flags; the thread and batch sizes drive the delays
+    parser.add_argument("-m", "--model")
+    parser.add_argument("-c", "--ctx-size", type=int)
+    parser.add_argument("-b", "--batch-size", type=int, default=2048)
+    parser.add_argument("-ub", "--ubatch-size", type=int, default=512)
+    parser.add_argument("-t", "--threads", type=int)
+    parser.add_argument("-tb", "--threads-batch", type=int)
+    parser.add_argument("--no-mmap", action="store_true")
+    args, _ = parser.parse_known_args()  # -ngl, -fa, --cont-batching, ...
+
+    token_delay, prefill = args.token_delay, args.prefill_per_token
+    if args.threads is not None:
+        token_delay, prefill = llama_delays(args.threads, args.threads_batch or args.threads,
+                                            min(args.ubatch_size, args.batch_size))
+    stub = StubServer(args.port, args.slots, token_delay, prefill, args.stall_after,
+                      args.die_after, exit_after=args.exit_after)
+    if args.load_delay > 0:
+        stub.healthy = False
+        threading.Timer(args.load_delay, lambda: setattr(stub, "healthy", True)).start()
+    stub.start()
+    print(f"✓ Stub llama-server on {stub.url} ({args.slots} slots)", flush=True)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        stub.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,418 @@
+"""
+MedEvac-Gemma llama-server supervisor
+Launch, health-check and restart llama-server, and autotune its settings
+
+LlamaSupervisor starts llama-server as a child process with LLAMA_PARAMS
+(or the settings --autotune found for this host), waits for /health and
+then watches it from a background thread. If the process exits, takes
+longer than LLAMA_LOAD_TIMEOUT_S to load, or stops answering /health, it
+is restarted after a short backoff; after LLAMA_RESTARTS crashes within
+LLAMA_RESTART_WINDOW_S it gives up. Its `state` (starting, ready,
+restarting, failed, stopped) is what the pipeline reports when an LLM
+request fails. Output goes to LLAMA_LOG.
+
+--autotune replaces the hand search behind start_llm_server.sh. From the
+current settings it sweeps one parameter at a time (threads, batch
+threads, batch, micro-batch, context, mmap) and keeps each change that
+makes a report faster. Every configuration is launched fresh and measured
+on a fixed prompt set from full_eval.csv: load time, prefill and decode
+throughput (llama-server's own timings) and the server's peak RSS. A
+configuration scores the time of an average report, its prompt
+prefilled cold plus MAX_TOKENS decoded. The best is written to
+LLAMA_TUNED with the host name, and only that host picks it up.
+
+Anything that takes llama-server's flags can stand in for the binary,
+such as the stub server.
+
+Usage:
+  python -m medevac.supervisor [--binary llama-server] [--model GGUF] [--port 8080]
+  python -m medevac.supervisor --autotune [--eval full_eval.csv] [--prompts 8]
+                               [--max-rss-mb N] [--passes 1]
+  python -m medevac.supervisor --binary "python3 -m medevac.stub_server" --autotune
+"""
+
+import argparse
+import atexit
+import csv
+import json
+import os
+import shlex
+import socket
+import statistics
+import subprocess
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+from medevac.config import (LLAMA_FLAGS, LLAMA_LOAD_TIMEOUT_S, LLAMA_LOG, LLAMA_PARAMS,
+                            LLAMA_RESTART_WINDOW_S, LLAMA_RESTARTS, LLAMA_SERVER, LLAMA_TUNED,
+                            LLM_MODEL, LLM_TIMEOUT, MAX_TOKENS, PROBE_TIMEOUT, SERVER_URL)
+from medevac.metrics import process_rss_mb
+from medevac.trace import tracer
+
+# =========================
+# CONFIGURATION
+# =========================
+POLL_S = 0.5  # Seconds between process and /health checks
+LOAD_POLL_S = 0.1  # Same, while the model is loading
+HEALTH_FAILS = 3  # Failed /health probes in a row before a loaded server is restarted
+BACKOFF_S = (1.0, 2.0, 5.0, 10.0)  # Wait before the 1st, 2nd, ... restart in the window
+STOP_TIMEOUT_S = 5.0  # SIGTERM grace before SIGKILL
+AUTOTUNE_PORT = 8099  # Leaves a server on SERVER_URL running while tuning
+MIN_GAIN = 0.03  # A change is kept only if it beats the best report time by this much (noise)
+
+# llama-server flag for each tuned parameter (mmap is --no-mmap when off)
+PARAM_FLAGS = {"ctx": "-c", "batch": "-b", "ubatch": "-ub", "threads": "-t",
+               "threads_batch": "-tb"}
+SWEEP = {"batch": [256, 512, 1024, 2048], "ubatch": [128, 256, 512],
+         "ctx": [1024, 2048, 4096], "mmap": [False, True]}
+
+# =========================
+# SETTINGS
+# =========================
+
+def server_command(params, binary=LLAMA_SERVER, model=LLM_MODEL, port=8080, flags=LLAMA_FLAGS):
+    """llama-server argv for a parameter dict"""
+    command = shlex.split(binary) + ["-m", model, "--host", "127.0.0.1", "--port", str(port)]
+    for name, flag in PARAM_FLAGS.items():
+        command += [flag, str(params[name])]
+    if not params["mmap"]:
+        command.append("--no-mmap")
+    return command + list(flags)
+
+def load_tuned(path=LLAMA_TUNED):
+    """Parameters --autotune wrote for this host, or None"""
+    try:
+        with open(path) as f:
+            tuned = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if tuned.get("host") != socket.gethostname():
+        return None
+    return tuned.get("params")
+
+def tuned_params(path=LLAMA_TUNED):
+    """LLAMA_PARAMS with this host's tuned settings applied"""
+    return {**LLAMA_PARAMS, **(load_tuned(path) or {})}
+
+def thread_counts(cpus=None):
+    """Thread counts worth trying on this machine"""
+    cpus = cpus or os.cpu_count() or 1
+    return sorted({n for n in (1, 2, 4, 6, 8, 12, 16, 24, 32) if n <= cpus} | {cpus})
+
+def default_port():
+    return urlsplit(SERVER_URL).port or 8080
+
+# =========================
+# SUPERVISOR
+# =========================
+
+class LlamaSupervisor:
+    """Run llama-server as a child process and keep it running
+
+    start() launches it and returns at once; wait_ready() blocks until
+    /health answers. `on_state(state, reason)` is called from the monitor
+    thread on every change.
+    """
+
+    def __init__(self, params=None, binary=LLAMA_SERVER, model=LLM_MODEL, port=None,
+                 flags=LLAMA_FLAGS, restarts=LLAMA_RESTARTS, log=LLAMA_LOG, on_state=None):
+        self.params = params or tuned_params()
+        self.port = port or default_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.command = server_command(self.params, binary, model, self.port, flags)
+        self.max_restarts = restarts
+        self.log = log
+        self.on_state = on_state or print_state
+        self.state = "stopped"
+        self.reason = None
+        self.process = None
+        self.launched = None
+        self.load_s = None  # launch to first /health 200, for the latest launch
+        self.crashes = []  # times of crashes within LLAMA_RESTART_WINDOW_S
+        self.restarts = 0
+        self._down_since = None
+        self._stopping = threading.Event()
+        self._session = requests.Session()
+        self._thread = None
+
+    def start(self):
+        """Launch llama-server and the monitor thread"""
+        self._stopping.clear()
+        self._launch()
+        self._thread = threading.Thread(target=self._run, name="llama-supervisor", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+        return self
+
+    def wait_ready(self, timeout=LLAMA_LOAD_TIMEOUT_S):
+        """Block until the server is ready; False if it failed or `timeout` passed"""
+        deadline = time.time() + timeout
+        while self.state != "ready":
+            if self.state in ("failed", "stopped") or time.time() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def stop(self):
+        """Stop monitoring and terminate the server"""
+        self._stopping.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._kill()
+        atexit.unregister(self.stop)
+        if self.state != "stopped":
+            self._set("stopped")
+
+    def rss_mb(self):
+        """(current, peak) resident memory of the server process, MB"""
+        if self.process is None or self.process.poll() is not None:
+            return None, None
+        return process_rss_mb(self.process.pid)
+
+    def status(self):
+        """State for /v1/stats and logs"""
+        return {"state": self.state, "reason": self.reason, "url": self.url,
+                "pid": self.process.pid if self.process is not None else None,
+                "restarts": self.restarts, "load_s": self.load_s, "params": self.params}
+
+    def _launch(self):
+        with open(self.log, "ab") as log:
+            log.write(f"\n# {time.strftime('%Y-%m-%d %H:%M:%S')} "
+                      f"{shlex.join(self.command)}\n".encode())
+            log.flush()
+            # The child keeps its own copy of the log descriptor
+            self.process = subprocess.Popen(self.command, stdout=log, stderr=subprocess.STDOUT,
+                                            stdin=subprocess.DEVNULL)
+        self.launched = time.time()
+        self.load_s = None
+        self._set("starting")
+
+    def _kill(self):
+        process = self.process
+        if process is None or process.poll() is not None:
+            return
+        process.terminate()
+        try:
+            process.wait(STOP_TIMEOUT_S)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+    def _set(self, state, reason=None):
+        self.state = state
+        self.reason = reason
+        self.on_state(state, reason)
+
+    def _healthy(self):
+        try:
+            response = self._session.get(f"{self.url}/health", timeout=PROBE_TIMEOUT)
+            return response.status_code == 200
+        except requests.exceptions.RequestException:
+            return False
+
+    def _run(self):
+        fails = 0
+        while not self._stopping.wait(POLL_S if self.state == "ready" else LOAD_POLL_S):
+            code = self.process.poll()
+            if code is not None:
+                if not self._restart(f"exited with code {code}"):
+                    return
+                fails = 0
+            elif self._healthy():
+                fails = 0
+                if self.state != "ready":
+                    now = time.time()
+                    self.load_s = now - self.launched
+                    tracer.record("llm.server.load", self.launched, now, pid=self.process.pid)
+                    if self._down_since is not None:
+                        tracer.record("llm.server.restart", self._down_since, now)
+                        self._down_since = None
+                    self._set("ready")
+            elif self.state == "ready":
+                fails += 1
+                if fails >= HEALTH_FAILS and not self._restart("stopped answering /health"):
+                    return
+            elif time.time() - self.launched > LLAMA_LOAD_TIMEOUT_S:
+                # Still loading (503) or not listening yet, for too long
+                if not self._restart(f"not ready after {LLAMA_LOAD_TIMEOUT_S:.0f}s"):
+                    return
+
+    def _restart(self, reason):
+        """Kill and relaunch after a backoff; False once the restart budget is spent"""
+        now = time.time()
+        self._kill()
+        if self._down_since is None:
+            self._down_since = now
+        self.crashes = [t for t in self.crashes if now - t < LLAMA_RESTART_WINDOW_S] + [now]
+        if len(self.crashes) > self.max_restarts:
+            self._set("failed", f"{reason}; {len(self.crashes)} crashes in "
+                                f"{LLAMA_RESTART_WINDOW_S:.0f}s, see {self.log}")
+            return False
+        self._set("restarting", reason)
+        if self._stopping.wait(BACKOFF_S[min(len(self.crashes), len(BACKOFF_S)) - 1]):
+            return False
+        self.restarts += 1
+        self._launch()
+        return True
+
+def print_state(state, reason=None):
+    icon = {"ready": "✓", "starting": "⏳", "restarting": "⚠", "failed": "❌"}.get(state, "•")
+    print(f"{icon} llama-server {state}" + (f": {reason}" if reason else ""))
+
+# =========================
+# AUTOTUNE
+# =========================
+
+def prompt_set(eval_path, n):
+    """The first n ground-truth transcripts of full_eval.csv as LLM prompts"""
+    from medevac.asr import clean_transcription
+    from medevac.llm import build_prompt
+
+    with open(eval_path, newline="") as f:
+        rows = list(csv.DictReader(f))[:n]
+    return [build_prompt(clean_transcription(r["gt"])) for r in rows]
+
+def measure(params, prompts, timeout=LLAMA_LOAD_TIMEOUT_S, **server):
+    """Launch a fresh server with `params` and time the prompt set on it"""
+    result = {"params": dict(params)}
+    supervisor = LlamaSupervisor(params, restarts=0, on_state=lambda *_: None, **server)
+    supervisor.start()
+    try:
+        if not supervisor.wait_ready(timeout):
+            result["error"] = supervisor.reason or "not ready"
+            return result
+        result["load_s"] = supervisor.load_s
+        session = requests.Session()
+        timings = []
+        # The first prompt again up front, so one-off warm-up is not measured
+        for i, prompt in enumerate(prompts[:1] + prompts):
+            response = session.post(f"{supervisor.url}/completion", timeout=LLM_TIMEOUT, json={
+                "prompt": prompt, "n_predict": MAX_TOKENS, "temperature": 0.0,
+                "cache_prompt": False})
+            response.raise_for_status()
+            if i:
+                timings.append(response.json()["timings"])
+        current, peak = supervisor.rss_mb()
+    except (requests.exceptions.RequestException, KeyError, ValueError) as e:
+        result["error"] = str(e)
+        return result
+    finally:
+        supervisor.stop()
+
+    try:
+        prefill = (sum(t["prompt_n"] for t in timings)
+                   / max(sum(t["prompt_ms"] for t in timings) / 1000, 1e-6))
+        decode = (sum(t["predicted_n"] for t in timings)
+                  / max(sum(t["predicted_ms"] for t in timings) / 1000, 1e-6))
+        prompt_tokens = statistics.mean(t["prompt_n"] for t in timings)
+        report_s = (prompt_tokens / prefill if prefill else 0.0) + MAX_TOKENS / decode
+    except (statistics.StatisticsError, ZeroDivisionError):
+        # No prompts, or a server that generated nothing: a failed configuration, not a crash
+        result["error"] = "no prompts timed" if not timings else "no tokens generated"
+        return result
+    result.update(prefill_tps=prefill, decode_tps=decode, prompt_tokens=prompt_tokens,
+                  report_s=report_s, rss_mb=peak if peak is not None else current)
+    return result
+
+def acceptable(result, max_rss_mb=None):
+    if "error" in result:
+        return False
+    return max_rss_mb is None or result["rss_mb"] is None or result["rss_mb"] <= max_rss_mb
+
+def autotune(prompts, base=None, sweep=None, max_rss_mb=None, passes=1, report=None, **server):
+    """Sweep one parameter at a time from `base`; returns (best params, its result, all results)"""
+    best = dict(base or tuned_params())
+    if sweep is None:
+        sweep = {"threads": thread_counts(), "threads_batch": thread_counts(), **SWEEP}
+    results = {}
+
+    def run(params):
+        key = json.dumps(params, sort_keys=True)
+        if key not in results:
+            results[key] = measure(params, prompts, **server)
+            if report is not None:
+                report(results[key])
+        return results[key]
+
+    best_result = run(best)
+    for _ in range(passes):
+        changed = False
+        for name, values in sweep.items():
+            for value in values:
+                params = dict(best, **{name: value})
+                if params["ubatch"] > params["batch"] or params == best:
+                    continue
+                result = run(params)
+                if not acceptable(result, max_rss_mb):
+                    continue
+                if (not acceptable(best_result, max_rss_mb)
+                        or result["report_s"] < best_result["report_s"] * (1 - MIN_GAIN)):
+                    best, best_result, changed = params, result, True
+        if not changed:
+            break
+    return best, best_result, list(results.values())
+
+def write_tuned(path, best, result, results, binary, model):
+    """Save the winning parameters (and every measurement) for this host"""
+    with open(path, "w") as f:
+        json.dump({"host": socket.gethostname(), "cpus": os.cpu_count(), "binary": binary,
+                   "model": model, "tuned": time.strftime("%Y-%m-%d %H:%M:%S"),
+                   "params": best, "result": result, "results": results}, f, indent=2)
+
+def format_result(result):
+    params = " ".join(f"{k}={v}" for k, v in result["params"].items())
+    if "error" in result:
+        return f"  {params:<64} ❌ {result['error']}"
+    rss = f"{result['rss_mb']:.0f} MB" if result["rss_mb"] is not None else "-"
+    return (f"  {params:<64} load {result['load_s']:5.1f}s  prefill {result['prefill_tps']:7.1f} "
+            f"tok/s  decode {result['decode_tps']:6.1f} tok/s  report {result['report_s']:5.2f}s  "
+            f"RSS {rss}")
+
+# =========================
+# MAIN
+# =========================
+
+def main():
+    parser = argparse.ArgumentParser(description="Run or autotune llama-server")
+    parser.add_argument("--binary", default=LLAMA_SERVER, help="llama-server (or stand-in) command")
+    parser.add_argument("--model", default=LLM_MODEL)
+    parser.add_argument("--port", type=int)
+    parser.add_argument("--autotune", action="store_true", help="sweep settings, write the best")
+    parser.add_argument("--eval", default="medevac-gemma_notebooks/full_eval.csv")
+    parser.add_argument("--prompts", type=int, default=8, help="eval transcripts to time")
+    parser.add_argument("--max-rss-mb", type=float, help="reject configurations above this")
+    parser.add_argument("--passes", type=int, default=1, help="sweeps over all parameters")
+    parser.add_argument("--out", default=LLAMA_TUNED)
+    args = parser.parse_args()
+
+    if args.autotune:
+        prompts = prompt_set(args.eval, args.prompts)
+        print(f"⚙ Autotuning {args.binary} on {len(prompts)} prompts "
+              f"({os.cpu_count()} CPUs, {socket.gethostname()})")
+        best, result, results = autotune(prompts, max_rss_mb=args.max_rss_mb, passes=args.passes,
+                                         report=lambda r: print(format_result(r), flush=True),
+                                         binary=args.binary, model=args.model,
+                                         port=args.port or AUTOTUNE_PORT)
+        if not acceptable(result, args.max_rss_mb):
+            print("❌ No configuration worked; nothing written")
+            return
+        write_tuned(args.out, best, result, results, args.binary, args.model)
+        print(f"\n✓ {len(results)} configurations; best written to {args.out}")
+        print(format_result(result))
+        return
+
+    supervisor = LlamaSupervisor(binary=args.binary, model=args.model, port=args.port).start()
+    print(f"🚀 {shlex.join(supervisor.command)}  (log: {supervisor.log})")
+    try:
+        while supervisor.state != "failed":
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        supervisor.stop()
+
+if __name__ == "__main__":
+    main()
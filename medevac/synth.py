@@ -0,0 +1,193 @@
+"""
+MedEvac-Gemma dataset synthesis
+Render ASR training prompts to WAV with a pool of long-lived TTS workers
+
+Each worker process loads the voice once and is then fed prompts as it
+frees up, so synthesis scales with core count instead of paying a model
+load per row. WAVs are written atomically and named by prompt index, which
+makes a run resumable (existing files are skipped) and its output
+layout deterministic. Piper's ONNX voices sample noise internally; pass
+--noise-scale 0 --noise-w 0 for bit-identical audio across runs.
+
+Usage:
+  python -m medevac.synth medasr_prompts.csv --out medasr_dataset
+      [--backend piper --voice en_US-ryan-high.onnx] [--workers N]
+  python -m medevac.synth medasr_prompts.csv --out /tmp/ds --backend stub
+"""
+
+import argparse
+import csv
+import hashlib
+import multiprocessing
+import os
+import time
+import wave
+
+import numpy as np
+
+# =========================
+# CONFIGURATION
+# =========================
+VOICE = "en_US-ryan-high.onnx"
+STUB_SAMPLE_RATE = 22050
+
+# =========================
+# BACKENDS
+# =========================
+
+class PiperBackend:
+    """Piper ONNX voice loaded once per worker"""
+
+    def __init__(self, voice=VOICE, length_scale=None, noise_scale=None, noise_w=None):
+        from piper import PiperVoice
+
+        self.voice = PiperVoice.load(voice)
+        self.sample_rate = self.voice.config.sample_rate
+        self.options = {"length_scale": length_scale, "noise_scale": noise_scale,
+                        "noise_w": noise_w}
+
+    def synthesize(self, text):
+        """Int16 samples for one prompt"""
+        options = {k: v for k, v in self.options.items() if v is not None}
+        if hasattr(self.voice, "synthesize_wav"):
+            # piper-tts >= 1.3
+            from piper import SynthesisConfig
+
+            if "noise_w" in options:
+                options["noise_w_scale"] = options.pop("noise_w")
+            chunks = self.voice.synthesize(text, syn_config=SynthesisConfig(**options))
+            return np.concatenate([c.audio_int16_array for c in chunks])
+        return np.frombuffer(b"".join(self.voice.synthesize_stream_raw(text, **options)),
+                             dtype=np.int16)
+
+class StubBackend:
+    """Deterministic tone per word, for testing the tool without a voice"""
+
+    def __init__(self, sample_rate=STUB_SAMPLE_RATE):
+        self.sample_rate = sample_rate
+
+    def synthesize(self, text):
+        t = np.arange(int(0.12 * self.sample_rate)) / self.sample_rate
+        words = []
+        for word in text.split():
+            freq = 200 + int(hashlib.md5(word.encode()).hexdigest()[:4], 16) % 600
+            words.append(np.sin(2 * np.pi * freq * t))
+            words.append(np.zeros(int(0.04 * self.sample_rate)))
+        audio = np.concatenate(words) if words else np.zeros(1)
+        return (audio * 0.3 * 32767).astype(np.int16)
+
+BACKENDS = {"piper": PiperBackend, "stub": StubBackend}
+
+# =========================
+# PROMPTS / OUTPUT
+# =========================
+
+def read_prompts(path):
+    """Prompt texts from a CSV, cleaned the way the dataset notebook does
+
+    medasr_prompts.csv has a broken one-cell "Id, text" header and smart
+    quotes around each prompt. A proper `text` column is used if present.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    if not rows:
+        return []
+    header = [h.strip().lower() for h in rows[0]]
+    column = header.index("text") if "text" in header else 0
+    texts = [row[column].strip().strip('"“”').strip() for row in rows[1:] if row]
+    return [t for t in texts if t]
+
+def write_wav(path, samples, sample_rate):
+    """Write int16 mono WAV via a temp file so a crash never leaves a partial one"""
+    tmp = f"{path}.tmp"
+    with wave.open(tmp, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(samples.astype(np.int16).tobytes())
+    os.replace(tmp, path)
+
+def write_metadata(out_dir, texts):
+    """metadata.csv (audio, text) for every prompt whose WAV exists, in prompt order"""
+    path = os.path.join(out_dir, "metadata.csv")
+    with open(f"{path}.tmp", "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["audio", "text"])
+        for index, text in enumerate(texts):
+            wav = audio_path(out_dir, index)
+            if os.path.exists(wav):
+                writer.writerow([wav, text])
+    os.replace(f"{path}.tmp", path)
+    return path
+
+def audio_path(out_dir, index):
+    return os.path.join(out_dir, "audio", f"{index:05d}.wav")
+
+# =========================
+# WORKERS
+# =========================
+
+_backend = None
+
+def _init_worker(name, options):
+    global _backend
+    _backend = BACKENDS[name](**options)
+
+def _synthesize(job):
+    index, text, path = job
+    t0 = time.time()
+    samples = _backend.synthesize(text)
+    write_wav(path, samples, _backend.sample_rate)
+    return index, len(samples) / _backend.sample_rate, time.time() - t0
+
+def synthesize_dataset(prompts_csv, out_dir, backend="piper", options=None, workers=None):
+    """Render every prompt not yet on disk; returns the metadata.csv path"""
+    texts = read_prompts(prompts_csv)
+    os.makedirs(os.path.join(out_dir, "audio"), exist_ok=True)
+    jobs = [(i, text, audio_path(out_dir, i)) for i, text in enumerate(texts)
+            if not os.path.exists(audio_path(out_dir, i))]
+    workers = max(1, min(workers or os.cpu_count() or 1, len(jobs) or 1))
+    print(f"✓ {len(texts)} prompts, {len(texts) - len(jobs)} already synthesized, "
+          f"{len(jobs)} to go on {workers} {backend} worker(s)")
+
+    start = time.time()
+    audio_s = 0.0
+    if jobs:
+        with multiprocessing.Pool(workers, initializer=_init_worker,
+                                  initargs=(backend, options or {})) as pool:
+            for n, (index, seconds, _) in enumerate(
+                    pool.imap_unordered(_synthesize, jobs, chunksize=1), 1):
+                audio_s += seconds
+                if n % 50 == 0 or n == len(jobs):
+                    elapsed = time.time() - start
+                    print(f"  {n}/{len(jobs)} | {n / elapsed:.1f} prompts/s | "
+                          f"{audio_s / elapsed:.1f}x realtime")
+
+    path = write_metadata(out_dir, texts)
+    print(f"✓ Wrote {path} in {time.time() - start:.1f}s")
+    return path
+
+# =========================
+# MAIN
+# =========================
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthesize an ASR dataset from prompts")
+    parser.add_argument("prompts", help="CSV of prompt texts (e.g. medasr_prompts.csv)")
+    parser.add_argument("--out", default="medasr_dataset")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="piper")
+    parser.add_argument("--voice", default=VOICE, help="Piper .onnx voice")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per core)")
+    parser.add_argument("--length-scale", type=float)
+    parser.add_argument("--noise-scale", type=float)
+    parser.add_argument("--noise-w", type=float)
+    args = parser.parse_args()
+
+    options = {}
+    if args.backend == "piper":
+        options = {"voice": args.voice, "length_scale": args.length_scale,
+                   "noise_scale": args.noise_scale, "noise_w": args.noise_w}
+    synthesize_dataset(args.prompts, args.out, args.backend, options, args.workers)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Cache keys: spoken numbers, vitals and callsigns fold to one canonical transcript"""
+
+import pytest
+
+from medevac.cache import ResponseCache, canonical_transcript, spoken_number
+
+@pytest.mark.parametrize("words, digits", [
+    ("twenty", "20"),
+    ("twenty two", "22"),
+    ("ninety eight", "98"),
+    ("one twenty two", "122"),
+    ("one hundred", "100"),
+    ("one hundred five", "105"),
+    ("one hundred twenty two", "122"),
+    ("one oh five", "105"),
+    ("one two three", "123"),
+])
+def test_spoken_number(words, digits):
+    assert spoken_number(words.split()) == digits
+
+@pytest.mark.parametrize("a, b", [
+    ("HR 122", "heart rate one twenty two"),
+    ("HR 105", "pulse rate one oh five"),
+    ("BP 120/80", "blood pressure 120 over 80"),
+    ("BP 120/80", "blood pressure one twenty over eighty"),
+    ("SpO₂ 95%", "sats ninety five percent"),
+    ("RR 22", "respiratory rate twenty two"),
+    ("GSW LEFT THIGH.", "gsw, left  thigh"),
+])
+def test_spoken_and_written_vitals_match(a, b):
+    assert canonical_transcript(a) == canonical_transcript(b)
+
+@pytest.mark.parametrize("text", [
+    "Dustoff-2, this is Helix-3. GSW left thigh, HR 122.",
+    "dustoff 2 this is helix 3 GSW left thigh HR 122",
+    "This is Helix-3, GSW left thigh, heart rate one twenty two.",
+    "Helix-3: GSW left thigh, HR 122.",
+    "GSW left thigh, HR 122.",
+])
+def test_callsign_variants_share_a_key(text):
+    assert canonical_transcript(text) == "gsw left thigh hr 122"
+
+@pytest.mark.parametrize("a, b", [
+    ("HR 122", "HR 112"),
+    ("BP 120/80", "BP 120/70"),
+    ("GSW left thigh", "GSW right thigh"),
+    ("no tourniquet", "tourniquet"),
+])
+def test_different_reports_do_not_collide(a, b):
+    assert canonical_transcript(a) != canonical_transcript(b)
+
+def test_oh_outside_a_number_is_a_word():
+    assert canonical_transcript("oh two casualties") == "oh 2 casualties"
+
+def test_a_repeat_is_a_hit():
+    cache = ResponseCache()
+    cache.put("Dustoff-2, this is Helix-3. HR 122", "URGENT")
+    assert cache.get("heart rate one twenty two") == "URGENT"
@@ -0,0 +1,35 @@
+"""RingBuffer: reads across the wrap, lapped ranges and writes in progress"""
+
+import numpy as np
+
+from medevac.capture import RingBuffer
+
+def ring(seconds=1.0):
+    return RingBuffer(sample_rate=10, seconds=seconds)  # 10 samples
+
+def test_reads_across_the_wrap():
+    buffer = ring()
+    buffer.write(np.arange(8, dtype=np.float32))
+    buffer.write(np.arange(8, 14, dtype=np.float32))
+    assert buffer.read(6, 14).tolist() == list(range(6, 14))
+
+def test_lapped_range_is_rejected():
+    buffer = ring()
+    buffer.write(np.arange(25, dtype=np.float32))
+    assert buffer.read(10, 20) is None
+    assert buffer.read(15, 25).tolist() == list(range(15, 25))
+
+def test_range_being_overwritten_is_rejected():
+    buffer = ring()
+    buffer.write(np.arange(10, dtype=np.float32))
+    # The callback has announced a 3-sample write but not published it yet:
+    # samples 0-2 may already be torn
+    buffer.writing = buffer.written + 3
+    assert buffer.read(0, 5) is None
+    assert buffer.read(3, 10).tolist() == list(range(3, 10))
+
+def test_read_is_clipped_to_what_was_published():
+    buffer = ring()
+    buffer.write(np.ones(4, dtype=np.float32))
+    assert len(buffer.read(0, 100)) == 4
+    assert len(buffer.read(6, 8)) == 0
@@ -0,0 +1,118 @@
+"""Gateway admission (429/503), upload size / duration / rate checks, cache hits"""
+
+import io
+import json
+import threading
+
+import numpy as np
+import pytest
+import requests
+import soundfile as sf
+
+from medevac.cache import ResponseCache
+from medevac.config import GATEWAY_MAX_AUDIO_S, GATEWAY_MAX_BODY_BYTES, SAMPLE_RATE
+from medevac.gateway import AudioTooLong, Gateway, GatewayServer, Overloaded, decode_audio
+from medevac.llm import LLMClient
+from medevac.stub_server import RESPONSE, StubServer
+
+TRANSCRIPT = "Casualty GSW left thigh HR 122"
+
+def fake_asr(audio, **kwargs):
+    return {"text": TRANSCRIPT}
+
+def pcm(seconds, rate=SAMPLE_RATE):
+    return np.zeros(int(seconds * rate), dtype="<i2").tobytes()
+
+def wav(seconds, rate=SAMPLE_RATE):
+    buffer = io.BytesIO()
+    sf.write(buffer, np.zeros(int(seconds * rate), dtype=np.float32), rate, format="WAV")
+    return buffer.getvalue()
+
+@pytest.fixture
+def gateway():
+    started = []
+
+    def start(token_delay=0.001, **kwargs):
+        stub = StubServer(slots=1, token_delay=token_delay).start()
+        llm = LLMClient([stub.url])
+        llm.healthy()
+        gw = Gateway(fake_asr, llm, vad=False, batch=1, **kwargs)
+        started.append((stub, gw))
+        return gw
+
+    yield start
+    for stub, gw in started:
+        gw.close()
+        stub.stop()
+
+@pytest.fixture
+def server(gateway):
+    gw = gateway()
+    srv = GatewayServer(gw, port=0)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+def post(srv, body, rate=None, content_type="application/octet-stream"):
+    url = f"{srv.url}/v1/report" + (f"?rate={rate}" if rate is not None else "")
+    return requests.post(url, data=body, headers={"Content-Type": content_type}, timeout=30)
+
+def events(response):
+    return [json.loads(line) for line in response.iter_lines() if line]
+
+def test_report_streams_a_result(server):
+    response = post(server, pcm(1))
+    assert response.status_code == 200
+    result = events(response)[-1]
+    assert result["event"] == "result"
+    assert result["transcript"] == TRANSCRIPT
+    assert result["response"] == RESPONSE.strip()
+
+def test_per_client_limit_is_429_and_capacity_503(gateway):
+    gw = gateway(token_delay=0.05, llm_workers=1, max_queued=1, per_client=1)
+    audio = np.zeros(SAMPLE_RATE, dtype=np.float32)
+    first = gw.submit("a", audio)
+    with pytest.raises(Overloaded) as e:
+        gw.submit("a", audio)
+    assert e.value.status == 429
+    second = gw.submit("b", audio)
+    with pytest.raises(Overloaded) as e:
+        gw.submit("c", audio)
+    assert e.value.status == 503 and e.value.retry_after > 0
+    assert [list(job)[-1]["event"] for job in (first, second)] == ["result", "result"]
+    assert gw.stats()["in_system"] == 0
+
+@pytest.mark.parametrize("rate", ["0", "-8000", "fast", "16k"])
+def test_bad_rate_is_400(server, rate):
+    response = post(server, pcm(1), rate=rate)
+    assert response.status_code == 400
+    assert "rate" in response.json()["error"]
+
+def test_duration_is_checked_after_decoding(server):
+    # A 48 kHz WAV well within the limit is larger than 16 kHz PCM of the same length
+    assert post(server, wav(GATEWAY_MAX_AUDIO_S - 1, rate=48000), content_type="audio/wav") \
+        .status_code == 200
+    response = post(server, pcm(GATEWAY_MAX_AUDIO_S + 1))
+    assert response.status_code == 413
+    assert f"{GATEWAY_MAX_AUDIO_S}s" in response.json()["error"]
+
+def test_low_rate_cannot_expand_a_small_body():
+    with pytest.raises(AudioTooLong):
+        decode_audio(pcm(1), "audio/pcm", rate=1, max_s=GATEWAY_MAX_AUDIO_S)
+
+def test_body_over_the_byte_cap_is_413(server):
+    response = requests.post(f"{server.url}/v1/report", data=b"",
+                             headers={"Content-Length": str(GATEWAY_MAX_BODY_BYTES + 1),
+                                      "Content-Type": "application/octet-stream"}, timeout=30)
+    assert response.status_code == 413
+    assert "bytes" in response.json()["error"]
+
+def test_cache_hits_do_not_move_the_service_estimate(gateway):
+    gw = gateway(cache=ResponseCache())
+    audio = np.zeros(SAMPLE_RATE, dtype=np.float32)
+    list(gw.submit("a", audio))
+    service = gw.stats()["service_s"]
+    result = list(gw.submit("a", audio))[-1]
+    assert result["timings"]["cached"] is True
+    assert gw.stats()["service_s"] == service
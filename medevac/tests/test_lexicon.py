@@ -0,0 +1,51 @@
+"""Lexicon correction: near misses fixed, meaning never flipped, callsigns anywhere"""
+
+import pytest
+
+from medevac.lexicon import TERMS, Lexicon, changes_meaning, correct_transcript
+
+@pytest.mark.parametrize("heard, fixed", [
+    ("Turniqu applied", "Tourniquet applied"),
+    ("tournique", "tourniquet"),
+    ("casuality", "casualty"),
+    ("hypertensiv", "hypertensive"),
+    ("hyperventelating", "hyperventilating"),
+    ("consious", "conscious"),
+    ("SpO<unk> 92", "SpO₂ 92"),
+])
+def test_fixes_near_misses(heard, fixed):
+    assert correct_transcript(heard) == fixed
+
+@pytest.mark.parametrize("word", [
+    "hypertensive", "hypotensive", "hypertension", "hypotension", "hypoventilating",
+    "hyperventilating", "hyperthermic", "hyperthermia", "bradycardic", "bradycardia",
+    "tachycardic", "hypothermic", "unconscious",
+])
+def test_keeps_valid_opposite_forms(word):
+    assert correct_transcript(f"patient {word}") == f"patient {word}"
+
+@pytest.mark.parametrize("word, other", [
+    ("hypertensive", "hypotensive"),
+    ("hypertension", "hypotension"),
+    ("hypoventilating", "hyperventilating"),
+    ("hyperthermic", "hyperthermia"),
+    ("bradycardic", "bradycardia"),
+    ("bradycardic", "tachycardic"),
+    ("unconscious", "conscious"),
+])
+def test_never_corrects_across_prefixes_or_forms(word, other):
+    assert changes_meaning(word, other) and changes_meaning(other, word)
+    # Even with only one of the pair in the vocabulary the other is left alone
+    lexicon = Lexicon(terms=[t for t in TERMS if t != word])
+    assert lexicon.correct(word) == word
+
+@pytest.mark.parametrize("heard, fixed", [
+    ("Helix3 requesting urgent", "Helix-3 requesting urgent"),
+    ("Dustoff 2 inbound", "Dustoff-2 inbound"),
+    ("copy helix 3", "copy Helix-3"),
+    ("this is Sentinelguard6 over", "this is Sentinelguard-6 over"),
+    ("this is Foxtrot 9", "this is Foxtrot-9"),
+    ("Foxtrot 9 inbound", "Foxtrot 9 inbound"),
+])
+def test_callsigns(heard, fixed):
+    assert correct_transcript(heard) == fixed
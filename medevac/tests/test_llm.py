@@ -0,0 +1,126 @@
+"""LLMClient against stub llama-servers: failover, stalls, cancel, budget, warm slots"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from medevac.config import STALL_TIMEOUT
+from medevac.llm import BudgetExhausted, LLMClient, StreamCancelled, build_prompt
+from medevac.stub_server import RESPONSE, StubServer
+
+PROMPT = build_prompt("casualty with GSW to left ankle, HR 122")
+
+@pytest.fixture
+def stubs():
+    started = []
+
+    def start(**kwargs):
+        stub = StubServer(token_delay=kwargs.pop("token_delay", 0.001), **kwargs).start()
+        started.append(stub)
+        return stub
+
+    yield start
+    for stub in started:
+        stub.stop()
+
+def run(stream):
+    return "".join(stream)
+
+def test_streams_the_whole_response(stubs):
+    stub = stubs()
+    stream = LLMClient([stub.url]).stream(PROMPT)
+    assert run(stream) == RESPONSE
+    assert stream.failovers == 0
+    assert stream.ttft is not None
+
+def test_fails_over_and_continues_after_an_endpoint_dies(stubs):
+    dying, healthy = stubs(die_after=3), stubs()
+    stream = LLMClient([dying.url, healthy.url]).stream(PROMPT)
+    assert run(stream) == RESPONSE
+    assert stream.failovers == 1
+    # The second endpoint continued from the three tokens already generated
+    assert healthy.requests[-1]["prompt"].startswith(PROMPT)
+    assert len(healthy.requests[-1]["prompt"]) > len(PROMPT)
+
+def test_fails_over_after_a_stall(stubs):
+    stalled, healthy = stubs(stall_after=2), stubs()
+    t0 = time.time()
+    stream = LLMClient([stalled.url, healthy.url], budget=STALL_TIMEOUT + 5).stream(PROMPT)
+    assert run(stream) == RESPONSE
+    assert stream.failovers == 1
+    assert time.time() - t0 < STALL_TIMEOUT + 2
+
+def test_fails_over_on_a_malformed_event_stream(stubs):
+    class Garbage(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"{}" if self.path == "/health" else b"[]")
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            self.wfile.write(b'data: {"content": "ASSESS\n\n')
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Garbage)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        healthy = stubs()
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        stream = LLMClient([url, healthy.url]).stream(PROMPT)
+        assert run(stream) == RESPONSE
+        assert stream.failovers == 1
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def test_budget_is_enforced_while_tokens_keep_arriving(stubs):
+    slow = stubs(token_delay=0.5)
+    stream = LLMClient([slow.url], budget=2.0).stream(PROMPT)
+    t0 = time.time()
+    with pytest.raises(BudgetExhausted):
+        run(stream)
+    assert time.time() - t0 < 2.5
+
+def test_cancel_stops_generation_and_frees_the_slot(stubs):
+    stub = stubs(token_delay=0.05)
+    stream = LLMClient([stub.url]).stream(PROMPT)
+    pieces = iter(stream)
+    next(pieces)
+    t0 = time.time()
+    threading.Timer(0.05, stream.cancel).start()
+    with pytest.raises(StreamCancelled):
+        for _ in pieces:
+            pass
+    assert time.time() - t0 < 0.5
+    deadline = time.time() + 1.0
+    while stub.slots()[0]["is_processing"] and time.time() < deadline:
+        time.sleep(0.01)
+    assert not stub.slots()[0]["is_processing"]
+
+def test_no_healthy_endpoint_is_a_request_error(stubs):
+    stub = stubs()
+    stub.healthy = False
+    with pytest.raises(requests.exceptions.RequestException):
+        run(LLMClient([stub.url]).stream(PROMPT))
+
+def test_warm_up_prefills_every_slot_and_requests_use_them(stubs):
+    stub = stubs(slots=2)
+    client = LLMClient([stub.url])
+    warmed, _ = client.warm_up()
+    assert warmed == 2
+    stream = client.stream(PROMPT)
+    run(stream)
+    # Only the transcript part of the prompt was prefilled
+    assert stub.requests[-1]["id_slot"] in (0, 1)
+    assert stream.timings["cache_n"] > 0
+    assert not stream.cold
@@ -0,0 +1,32 @@
+"""Long-form segmentation: segment boundaries at pauses and at the length limit"""
+
+import numpy as np
+
+from medevac.longform import Segmenter
+
+BLANK = 0
+
+def segments(ids, gap_frames=3, max_frames=100):
+    segmenter = Segmenter(BLANK, gap_frames, max_frames)
+    ids = np.array(ids)
+    out = list(segmenter.feed(ids, np.arange(len(ids)) * 0.1))
+    last = segmenter.flush()
+    if last[0]:
+        out.append(last)
+    return [ids for ids, _ in out]
+
+def test_a_pause_ends_the_segment_and_keeps_its_last_token():
+    assert segments([5, 0, 6, 7, 0, 0, 0, 0, 8, 9]) == [[5, 0, 6, 7], [8, 9]]
+
+def test_the_length_limit_ends_the_segment_at_the_next_blank():
+    assert segments([5, 6, 7, 0, 8], max_frames=3) == [[5, 6, 7], [8]]
+
+def test_times_follow_the_kept_frames():
+    segmenter = Segmenter(BLANK, 2, 100)
+    ids = np.array([0, 4, 0, 0, 5])
+    (_, times), = segmenter.feed(ids, np.arange(len(ids)) * 0.5)
+    assert times == [0.5]
+    assert segmenter.flush() == ([5], [2.0])
+
+def test_short_pauses_stay_inside_a_segment():
+    assert segments([5, 0, 0, 6, 0, 7], gap_frames=3) == [[5, 0, 0, 6, 0, 7]]
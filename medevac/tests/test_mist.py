@@ -0,0 +1,68 @@
+"""MIST extraction: fields, negated mentions, AVPU and triage"""
+
+import pytest
+
+from medevac.mist import extract_mist
+
+REPORT = ("Dustoff-2, this is Helix-3. Casualty with GSW to the left thigh, no exit wound. "
+          "Tourniquet applied. SpO2 95, RR 22, HR 122, BP 110 over 70. Alert and oriented. "
+          "Requesting urgent evac.")
+
+def test_extracts_a_full_report():
+    record = extract_mist(REPORT)
+    assert record.callsign == "Helix-3"
+    assert record.mechanism == ["GSW"]
+    assert record.injuries == ["GSW left thigh"]
+    assert record.findings == ["no exit wound"]
+    assert record.treatments == ["tourniquet"]
+    assert (record.spo2, record.rr, record.hr, record.bp) == (95, 22, 122, "110/70")
+    assert record.avpu == "A"
+    assert record.triage == "URGENT" and record.reasons == ["heart rate above 120"]
+    assert record.request.startswith("Requesting urgent evac")
+
+@pytest.mark.parametrize("text", [
+    "No tourniquet applied.",
+    "Tourniquet not applied yet.",
+    "Bleeding from the thigh without a tourniquet.",
+    "Never applied a tourniquet.",
+])
+def test_negated_treatments_are_not_listed(text):
+    assert extract_mist(text).treatments == []
+
+def test_negation_only_reaches_the_next_mention():
+    record = extract_mist("No exit wound, tourniquet applied, no chest seal, no fracture.")
+    assert record.treatments == ["tourniquet"]
+    assert record.findings == ["no exit wound"]
+    assert record.injuries == []
+
+@pytest.mark.parametrize("text, avpu", [
+    ("Casualty not conscious.", "U"),
+    ("Patient is not alert, responds to voice.", "V"),
+    ("Not alert.", "V"),
+    ("Casualty is conscious and talking.", "A"),
+    ("Unresponsive, no response to pain.", "U"),
+])
+def test_avpu(text, avpu):
+    assert extract_mist(text).avpu == avpu
+
+@pytest.mark.parametrize("text", ["pulse 130", "Pulse of 130", "heart rate one thirty", "HR 130"])
+def test_pulse_is_heart_rate(text):
+    record = extract_mist(text)
+    assert record.hr == 130
+    assert "heart rate above 120" in record.reasons
+
+def test_no_vitals_or_signs_leaves_triage_undetermined():
+    record = extract_mist("Casualty with a GSW to the right arm, no tourniquet.")
+    assert record.triage is None
+    assert record.treatments == []
+    assert not record.empty
+
+@pytest.mark.parametrize("text, injuries", [
+    ("Casualty with bilateral leg fractures.", ["bilateral leg fractures"]),
+    ("Suspected pelvic fracture after a fall.", ["pelvic fracture"]),
+    ("Gunshot wound left thigh.", ["gunshot wound left thigh"]),
+    ("Tourniquet applied to left arm.", []),
+    ("GSW to the right thigh, tourniquet applied to left arm.", ["GSW right thigh"]),
+])
+def test_injury_needs_an_injury_word(text, injuries):
+    assert extract_mist(text).injuries == injuries
@@ -0,0 +1,59 @@
+"""Startup: parallel steps, dependencies, and early exit on a required failure"""
+
+import threading
+import time
+
+from medevac.startup import Startup
+
+def fail():
+    raise RuntimeError("no model")
+
+def test_runs_steps_side_by_side_after_their_dependencies():
+    startup = Startup()
+    startup.add("a", lambda: time.sleep(0.2) or 1)
+    startup.add("b", lambda: time.sleep(0.2) or 2)
+    startup.add("c", lambda: startup.result("a") + startup.result("b"), after=["a", "b"])
+    t0 = time.time()
+    assert startup.run()
+    assert time.time() - t0 < 0.35
+    assert startup.result("c") == 3
+
+def test_required_failure_ends_run_without_waiting_for_earlier_steps():
+    release = threading.Event()
+    startup = Startup()
+    startup.add("slow", lambda: release.wait(5))  # added first, still running
+    startup.add("asr.load", fail, required=True)
+    startup.add("asr.warm", lambda: None, after=["asr.load"])
+    t0 = time.time()
+    assert not startup.run()
+    assert time.time() - t0 < 1
+    assert not startup.ok("asr.load") and not startup.ok("slow")
+    release.set()
+    startup.steps["asr.warm"].done.wait(1)
+    assert "skipped" in str(startup.steps["asr.warm"].error)
+
+def test_sequential_stops_at_a_required_failure():
+    ran = []
+    startup = Startup(parallel=False)
+    startup.add("first", fail, required=True)
+    startup.add("second", lambda: ran.append(1))
+    assert not startup.run()
+    assert ran == []
+
+def test_failed_names_the_cause_not_a_step_still_running():
+    release = threading.Event()
+    startup = Startup()
+    startup.add("llm.health", lambda: release.wait(5), required=True)
+    startup.add("asr.load", fail, required=True)
+    startup.add("asr.check", lambda: None, after=["asr.load"], required=True)
+    assert not startup.run()
+    startup.steps["asr.check"].done.wait(1)
+    assert startup.failed().name == "asr.load"
+    assert not startup.steps["llm.health"].done.is_set()
+    release.set()
+
+def test_failed_is_none_after_a_clean_run():
+    startup = Startup()
+    startup.add("a", lambda: None, required=True)
+    assert startup.run()
+    assert startup.failed() is None
@@ -0,0 +1,82 @@
+"""LlamaSupervisor against the stub server: ready, restart, failed, autotune"""
+
+import os
+import socket
+import sys
+import time
+
+import pytest
+
+from medevac.config import LLAMA_PARAMS
+from medevac.supervisor import LlamaSupervisor, autotune, measure
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+BINARY = f"{sys.executable} -m medevac.stub_server"
+PROMPTS = ["Casualty GSW left thigh HR 122", "Casualty blast injury right leg"]
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def wait_for(condition, timeout=15):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() >= deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    # The child runs `-m medevac.stub_server`, so it needs this checkout on its path
+    monkeypatch.setenv("PYTHONPATH",
+                       os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+    monkeypatch.chdir(tmp_path)
+    kwargs = {"binary": BINARY, "log": str(tmp_path / "llama.log")}
+    started = []
+
+    def start(**extra):
+        supervisor = LlamaSupervisor(dict(LLAMA_PARAMS), port=free_port(),
+                                     on_state=lambda *_: None, **kwargs, **extra)
+        started.append(supervisor.start())
+        return supervisor
+
+    start.kwargs = kwargs
+    yield start
+    for supervisor in started:
+        supervisor.stop()
+
+def test_reaches_ready(server):
+    supervisor = server()
+    assert supervisor.wait_ready(15)
+    assert supervisor.load_s is not None and supervisor.restarts == 0
+
+def test_restarts_after_a_kill(server):
+    supervisor = server()
+    assert supervisor.wait_ready(15)
+    pid = supervisor.process.pid
+    supervisor.process.kill()
+    assert wait_for(lambda: supervisor.restarts == 1 and supervisor.state == "ready")
+    assert supervisor.process.pid != pid
+
+def test_fails_once_the_restart_budget_is_spent(server):
+    supervisor = server(restarts=1)
+    assert supervisor.wait_ready(15)
+    supervisor.process.kill()
+    assert wait_for(lambda: supervisor.restarts == 1 and supervisor.state == "ready")
+    supervisor.process.kill()
+    assert wait_for(lambda: supervisor.state == "failed")
+    assert "2 crashes" in supervisor.reason
+    assert not supervisor.wait_ready(1)
+
+def test_measure_without_prompts_is_an_error(server):
+    result = measure(LLAMA_PARAMS, [], port=free_port(), **server.kwargs)
+    assert "error" in result and "report_s" not in result
+
+def test_autotune_small_sweep(server):
+    best, best_result, results = autotune(PROMPTS, base=LLAMA_PARAMS, sweep={"batch": [256, 1024]},
+                                          port=free_port(), **server.kwargs)
+    assert {r["params"]["batch"] for r in results} == {256, 512, 1024}
+    assert all("error" not in r and r["report_s"] > 0 for r in results)
+    assert best_result in results and best_result["params"] == best
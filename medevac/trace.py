@@ -0,0 +1,215 @@
+"""
+MedEvac-Gemma tracing
+Nested timing spans for every pipeline stage
+
+Spans are appended to TRACE_DIR/spans.jsonl as they close and aggregated
+into Prometheus histograms in TRACE_DIR/metrics.prom. Spans opened on the
+same thread nest automatically; `trace` ties the spans of one report
+together across the ASR, LLM and TTS threads.
+
+With profiling on, each top-level stage span also writes a cProfile dump
+and a tracemalloc allocation diff to TRACE_DIR/profiles/. tracemalloc is
+process-wide, so the diff includes allocations made by other stages
+running at the same time.
+
+Usage:
+  from medevac.trace import tracer
+  tracer.start("traces")
+  with tracer.span("asr", trace=report.id):
+      with tracer.span("asr.forward"):
+          ...
+"""
+
+import atexit
+import collections
+import contextlib
+import cProfile
+import itertools
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+# =========================
+# CONFIGURATION
+# =========================
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+TRACEMALLOC_TOP = 25
+
+# =========================
+# SPANS
+# =========================
+
+class Span:
+    """One timed region; `attrs` are written with it"""
+
+    def __init__(self, name, trace, parent, attrs):
+        self.name = name
+        self.trace = trace
+        self.parent = parent
+        self.attrs = attrs
+        self.id = None
+        self.start = None
+        self.duration = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+class Tracer:
+    """Span recorder writing JSONL and Prometheus text files
+
+    Until `start()` is called every span is a no-op.
+    """
+
+    def __init__(self):
+        self.directory = None
+        self.profile = False
+        self._ids = itertools.count(1)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._file = None
+        self._hist = collections.defaultdict(lambda: [0] * (len(BUCKETS) + 2))  # buckets, count, sum
+        self._profiling = threading.Lock()  # one cProfile at a time (3.12+ allows no more)
+
+    @property
+    def enabled(self):
+        return self.directory is not None
+
+    def start(self, directory, profile=False):
+        """Begin writing spans under `directory`"""
+        os.makedirs(directory, exist_ok=True)
+        if profile:
+            os.makedirs(os.path.join(directory, "profiles"), exist_ok=True)
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+        self.directory = directory
+        self.profile = profile
+        self._file = open(os.path.join(directory, "spans.jsonl"), "a", buffering=1)
+        atexit.register(self.close)
+
+    def close(self):
+        """Write the final metrics and stop tracing"""
+        if not self.enabled:
+            return
+        self.write_metrics()
+        with self._lock:
+            self._file.close()
+            self.directory = None
+
+    @contextlib.contextmanager
+    def span(self, name, trace=None, **attrs):
+        """Time the enclosed block as a child of this thread's current span"""
+        if not self.enabled:
+            yield Span(name, trace, None, attrs)
+            return
+
+        stack = self._stack()
+        parent = stack[-1] if stack else None
+        span = Span(name, trace if trace is not None or parent is None else parent.trace,
+                    parent.id if parent else None, attrs)
+        span.id = next(self._ids)
+        stack.append(span)
+
+        profiler = self._begin_profile() if parent is None and self.profile else None
+        span.start = time.time()
+        t0 = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.attrs["error"] = type(e).__name__
+            raise
+        finally:
+            span.duration = time.perf_counter() - t0
+            stack.pop()
+            if profiler is not None:
+                self._end_profile(span, *profiler)
+            self._emit(span)
+
+    def record(self, name, start, end, trace=None, **attrs):
+        """Add a span measured elsewhere (epoch seconds), e.g. a queue wait"""
+        if not self.enabled or start is None or end is None:
+            return
+        stack = self._stack()
+        parent = stack[-1] if stack else None
+        span = Span(name, trace if trace is not None or parent is None else parent.trace,
+                    parent.id if parent else None, attrs)
+        span.id = next(self._ids)
+        span.start = start
+        span.duration = max(0.0, end - start)
+        self._emit(span)
+
+    def write_metrics(self):
+        """Rewrite metrics.prom from the span histograms"""
+        directory = self.directory
+        if directory is None:
+            return
+        with self._lock:
+            hist = {name: list(values) for name, values in self._hist.items()}
+
+        lines = ["# HELP medevac_span_seconds Duration of MedEvac-Gemma pipeline spans",
+                 "# TYPE medevac_span_seconds histogram"]
+        for name in sorted(hist):
+            values = hist[name]
+            cumulative = 0
+            for le, n in zip(BUCKETS, values):
+                cumulative += n
+                lines.append(f'medevac_span_seconds_bucket{{span="{name}",le="{le}"}} {cumulative}')
+            lines.append(f'medevac_span_seconds_bucket{{span="{name}",le="+Inf"}} {values[-2]}')
+            lines.append(f'medevac_span_seconds_count{{span="{name}"}} {values[-2]}')
+            lines.append(f'medevac_span_seconds_sum{{span="{name}"}} {values[-1]:.6f}')
+
+        path = os.path.join(directory, "metrics.prom")
+        with open(f"{path}.tmp", "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(f"{path}.tmp", path)
+
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def _emit(self, span):
+        record = {"trace": span.trace, "span": span.id, "parent": span.parent,
+                  "name": span.name, "start": round(span.start, 6),
+                  "duration": round(span.duration, 6),
+                  "thread": threading.current_thread().name}
+        if span.attrs:
+            record["attrs"] = span.attrs
+        line = json.dumps(record, default=str) + "\n"
+
+        with self._lock:
+            if self._file is None or self._file.closed:
+                return
+            self._file.write(line)
+            values = self._hist[span.name]
+            bucket = next((i for i, le in enumerate(BUCKETS) if span.duration <= le), len(BUCKETS))
+            if bucket < len(BUCKETS):
+                values[bucket] += 1
+            values[-2] += 1
+            values[-1] += span.duration
+
+        # Top-level spans end a stage; keep the scrape file current
+        if span.parent is None:
+            self.write_metrics()
+
+    def _begin_profile(self):
+        if not self._profiling.acquire(blocking=False):
+            return None  # another stage is being profiled right now
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler, tracemalloc.take_snapshot()
+
+    def _end_profile(self, span, profiler, snapshot):
+        profiler.disable()
+        try:
+            stem = os.path.join(self.directory, "profiles", f"{span.trace}-{span.id}-{span.name}")
+            profiler.dump_stats(f"{stem}.prof")
+            diff = tracemalloc.take_snapshot().compare_to(snapshot, "lineno")
+            with open(f"{stem}.alloc.txt", "w") as f:
+                for stat in diff[:TRACEMALLOC_TOP]:
+                    f.write(f"{stat}\n")
+        finally:
+            self._profiling.release()
+
+tracer = Tracer()
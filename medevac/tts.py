@@ -0,0 +1,432 @@
+"""
+MedEvac-Gemma text-to-speech
+Sentence chunking, pluggable synthesis backends and a speaker that plays
+one chunk while synthesizing the next, so playback can start while the LLM
+is still generating
+
+Synthesized audio is kept in a content-addressed WAV cache (hash of voice
++ text). Section headers and list numbers are cached apart from the
+sentence they introduce, so recurring guidance ("Apply tourniquet high
+and tight.") plays from disk wherever it appears in a response.
+
+Speaker.cancel() drops everything queued and cuts off the clip that is
+playing within one PLAY_BLOCK_S (barge-in).
+"""
+
+import hashlib
+import io
+import os
+import queue
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import wave
+
+import numpy as np
+
+from medevac.config import (ESPEAK_VOICE, PIPER_VOICE, TTS_BACKEND, TTS_CACHE_DIR,
+                            TTS_FILE_DIR, TTS_OUTPUT, VOICE)
+from medevac.trace import tracer
+
+# =========================
+# CONFIGURATION
+# =========================
+SECTION_HEADERS = ("ASSESSMENT:", "ACTION:", "WARNING:")
+
+# Sentence end or line break; "1." list numbers are filtered out in feed()
+SENTENCE_BOUNDARY = re.compile(r"[.!?](?=\s)|\n")
+
+# Leading section header and list number of a chunk, synthesized and cached on their own
+SPEECH_PREFIX = re.compile(r"^\s*((?:ASSESSMENT|ACTION|WARNING):)?\s*(\d+\.(?=\s))?\s*", re.I)
+PREFETCH = SECTION_HEADERS + ("1.", "2.", "3.", "4.")  # Spoken in every response
+SAY_SAMPLE_RATE = 22050
+PLAY_BLOCK_S = 0.05  # Device writes are this long, so a cancel lands within one
+
+# =========================
+# SYNTHESIS BACKENDS
+# =========================
+# A backend has a sample_rate and synthesize(text) -> int16 samples
+
+class SayBackend:
+    """macOS say, rendered to a WAV instead of the speakers"""
+
+    def __init__(self, voice=VOICE):
+        if shutil.which("say") is None:
+            raise RuntimeError("say not found (macOS only)")
+        self.voice = voice
+        self.sample_rate = SAY_SAMPLE_RATE
+
+    def synthesize(self, text):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "say.wav")
+            subprocess.run(["say", "-v", self.voice, "-o", path, "--file-format=WAVE",
+                            f"--data-format=LEI16@{self.sample_rate}", text],
+                           check=True, capture_output=True)
+            samples, self.sample_rate = read_wav(path)
+        return samples
+
+class EspeakBackend:
+    """espeak-ng writing a WAV to stdout"""
+
+    def __init__(self, voice=ESPEAK_VOICE, words_per_minute=160):
+        if shutil.which("espeak-ng") is None:
+            raise RuntimeError("espeak-ng not found (apt install espeak-ng)")
+        self.voice = voice
+        self.words_per_minute = words_per_minute
+        self.sample_rate = SAY_SAMPLE_RATE
+
+    def synthesize(self, text):
+        result = subprocess.run(["espeak-ng", "-v", self.voice, "-s", str(self.words_per_minute),
+                                 "--stdout", text], check=True, capture_output=True)
+        samples, self.sample_rate = parse_wav(result.stdout)
+        return samples
+
+class NullBackend:
+    """No audio at all; responses are only printed"""
+
+    sample_rate = SAY_SAMPLE_RATE
+
+    def synthesize(self, text):
+        return np.zeros(0, dtype=np.int16)
+
+def make_backend(name=TTS_BACKEND):
+    """(backend, cache namespace) for a backend name"""
+    if name == "say":
+        return SayBackend(), f"say:{VOICE}"
+    if name == "espeak":
+        backend = EspeakBackend()
+        return backend, f"espeak-ng:{backend.voice}:{backend.words_per_minute}"
+    if name == "piper":
+        from medevac.synth import PiperBackend
+        return PiperBackend(PIPER_VOICE), f"piper:{os.path.basename(PIPER_VOICE)}"
+    if name == "stub":
+        from medevac.synth import StubBackend
+        return StubBackend(), "stub"
+    if name == "null":
+        return NullBackend(), None
+    raise ValueError(f"Unknown TTS backend: {name}")
+
+def read_wav(path):
+    with open(path, "rb") as f:
+        return parse_wav(f.read())
+
+def parse_wav(data):
+    """(int16 mono samples, sample rate) from 16-bit WAV bytes
+
+    espeak-ng streams its WAV with placeholder chunk sizes, so the data
+    chunk is taken to run to the end of the bytes.
+    """
+    with wave.open(io.BytesIO(data[:data.index(b"data") + 8])) as f:
+        channels, sample_rate = f.getnchannels(), f.getframerate()
+    samples = np.frombuffer(data[data.index(b"data") + 8:], dtype=np.int16)
+    samples = samples[:len(samples) - len(samples) % channels]
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1).astype(np.int16)
+    return samples, sample_rate
+
+# =========================
+# OUTPUTS
+# =========================
+# An output has play(samples, sample_rate, stop=None), which returns once the
+# audio is handed off, or soon after the `stop` Event is set
+
+class DeviceOutput:
+    """Default output device via sounddevice; one open stream per sample rate"""
+
+    def __init__(self):
+        import sounddevice
+
+        self._sd = sounddevice
+        self._stream = None
+
+    def play(self, samples, sample_rate, stop=None):
+        if self._stream is None or self._stream.samplerate != sample_rate:
+            self.close()
+            self._stream = self._sd.OutputStream(samplerate=sample_rate, channels=1, dtype="int16")
+            self._stream.start()
+        samples = np.ascontiguousarray(samples.reshape(-1, 1))
+        block = max(1, int(PLAY_BLOCK_S * sample_rate))
+        for i in range(0, len(samples), block):
+            if stop is not None and stop.is_set():
+                # Drop what the device still has buffered instead of playing it out
+                self._stream.abort()
+                self._stream.close()
+                self._stream = None
+                return
+            # Blocks until the device has room, i.e. in real time
+            self._stream.write(samples[i:i + block])
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.stop()  # plays out what is buffered
+            self._stream.close()
+            self._stream = None
+
+class FileOutput:
+    """Numbered WAVs in a directory instead of the speakers"""
+
+    def __init__(self, directory=TTS_FILE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.paths = []
+
+    def play(self, samples, sample_rate, stop=None):
+        from medevac.synth import write_wav
+
+        path = os.path.join(self.directory, f"speech_{len(self.paths):05d}.wav")
+        write_wav(path, samples, sample_rate)
+        self.paths.append(path)
+
+    def close(self):
+        pass
+
+class NullOutput:
+    """Discards audio"""
+
+    def play(self, samples, sample_rate, stop=None):
+        pass
+
+    def close(self):
+        pass
+
+OUTPUTS = {"device": DeviceOutput, "file": FileOutput, "null": NullOutput}
+
+# =========================
+# AUDIO CACHE
+# =========================
+
+class AudioCache:
+    """Content-addressed WAVs: one file per (voice, text), named by its hash"""
+
+    def __init__(self, directory, namespace):
+        self.directory = directory
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, text):
+        digest = hashlib.sha256(f"{self.namespace}\n{text}".encode()).hexdigest()
+        return os.path.join(self.directory, digest[:2], f"{digest}.wav")
+
+    def get(self, text):
+        """(samples, sample rate) or None"""
+        path = self.path(text)
+        try:
+            clip = read_wav(path)
+        except (OSError, ValueError, EOFError, wave.Error):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return clip
+
+    def put(self, text, samples, sample_rate):
+        from medevac.synth import write_wav
+
+        path = self.path(text)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_wav(path, samples, sample_rate)
+
+    def stats(self):
+        total = self.hits + self.misses
+        rate = self.hits / total if total else 0.0
+        return f"TTS cache: {self.hits}/{total} phrases from disk ({rate:.0%})"
+
+def speech_parts(text):
+    """Header, list number and sentence of a chunk, each cached on its own"""
+    match = SPEECH_PREFIX.match(text)
+    parts = (match.group(1), match.group(2), text[match.end():])
+    return [" ".join(p.split()) for p in parts if p and p.strip()]
+
+# =========================
+# SENTENCE CHUNKING
+# =========================
+
+class SentenceChunker:
+    """Cut a token stream into speakable chunks
+
+    Chunks end at sentence ends and line breaks, so every numbered ACTION
+    item is its own chunk. A section header on its own line is held back
+    and spoken together with the first sentence of its section.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._header = ""
+
+    def feed(self, piece):
+        """Add streamed text, return the chunks it completed"""
+        self._buffer += piece
+        chunks = []
+        start = 0
+        for match in SENTENCE_BOUNDARY.finditer(self._buffer):
+            line = self._buffer[self._buffer.rfind("\n", 0, match.start()) + 1:match.start()]
+            if match.group() != "\n" and line.strip().isdigit():
+                continue
+            chunks.extend(self._emit(self._buffer[start:match.end()]))
+            start = match.end()
+        self._buffer = self._buffer[start:]
+        return chunks
+
+    def flush(self):
+        """Return whatever is left once the stream has ended"""
+        part, self._buffer = self._buffer, ""
+        chunks = self._emit(part)
+        if self._header:
+            chunks.append(self._header)
+            self._header = ""
+        return chunks
+
+    def _emit(self, part):
+        text = part.strip()
+        if not text:
+            return []
+        if text.upper() in SECTION_HEADERS:
+            self._header = f"{self._header} {text}".strip()
+            return []
+        if self._header:
+            text = f"{self._header} {text}"
+            self._header = ""
+        return [text]
+
+# =========================
+# SPEAKER
+# =========================
+
+_CLOSE = object()
+
+class Speaker:
+    """Speech output that synthesizes the next chunk while the current one plays
+
+    Calling the speaker queues a chunk and returns at once; wait() blocks
+    until everything queued has been played. Chunks are tagged with the
+    current epoch, an Event that cancel() sets to discard them.
+    """
+
+    def __init__(self, backend, output, cache=None):
+        self.backend = backend
+        self.output = output
+        self.cache = cache
+        self._texts = queue.Queue()
+        self._clips = queue.Queue(maxsize=2)  # Synthesis runs at most two chunks ahead
+        self._pending = 0
+        self._idle = threading.Condition()
+        self._epoch = threading.Event()
+        self._cancelled_at = None
+        self.cancel_latency = None  # seconds from the last cancel() to silence
+        self._backend_lock = threading.Lock()
+        self._threads = [threading.Thread(target=self._synth_worker, name="tts-synth", daemon=True),
+                         threading.Thread(target=self._play_worker, name="tts-play", daemon=True)]
+        for thread in self._threads:
+            thread.start()
+
+    def __call__(self, text):
+        with self._idle:
+            self._pending += 1
+            epoch = self._epoch
+        self._texts.put((epoch, text))
+
+    def wait(self):
+        """Block until every queued chunk has been played"""
+        with self._idle:
+            self._idle.wait_for(lambda: self._pending == 0)
+
+    def cancel(self):
+        """Drop queued chunks and stop the one playing (barge-in)"""
+        with self._idle:
+            self._epoch.set()
+            self._epoch = threading.Event()
+            self._cancelled_at = time.time()
+            self._pending = 0
+            self._idle.notify_all()
+
+    def close(self):
+        """Play what is queued, then stop"""
+        self._texts.put(_CLOSE)
+        for thread in self._threads:
+            thread.join()
+        self.output.close()
+
+    def prefetch(self, phrases=PREFETCH):
+        """Fill the cache with phrases in the background"""
+        if self.cache is not None:
+            threading.Thread(target=lambda: [self.synthesize(p) for p in phrases],
+                             name="tts-prefetch", daemon=True).start()
+
+    def synthesize(self, text):
+        """(samples, sample rate) for a chunk, from the cache where possible"""
+        clips = [self._synthesize_part(part) for part in speech_parts(text)]
+        if not clips:
+            return np.zeros(0, dtype=np.int16), self.backend.sample_rate
+        return np.concatenate([c[0] for c in clips]), clips[0][1]
+
+    def _synthesize_part(self, text):
+        clip = self.cache.get(text) if self.cache is not None else None
+        if clip is not None:
+            return clip
+        with self._backend_lock:
+            samples = self.backend.synthesize(text)
+            sample_rate = self.backend.sample_rate
+        if self.cache is not None and len(samples):
+            self.cache.put(text, samples, sample_rate)
+        return samples, sample_rate
+
+    def _synth_worker(self):
+        while True:
+            item = self._texts.get()
+            if item is _CLOSE:
+                self._clips.put(_CLOSE)
+                return
+            epoch, text = item
+            if epoch.is_set():
+                continue
+            clip = None
+            try:
+                with tracer.span("tts.synth", chars=len(text)):
+                    clip = self.synthesize(text)
+            except Exception as e:
+                print(f"❌ TTS failed: {e}")
+            self._clips.put((epoch, clip))
+
+    def _play_worker(self):
+        while True:
+            item = self._clips.get()
+            if item is _CLOSE:
+                return
+            epoch, clip = item
+            if epoch.is_set():
+                continue
+            try:
+                if clip is not None and len(clip[0]):
+                    with tracer.span("tts.play", seconds=len(clip[0]) / clip[1]):
+                        self.output.play(*clip, stop=epoch)
+            except Exception as e:
+                print(f"❌ Audio output failed: {e}")
+            with self._idle:
+                if epoch.is_set():
+                    # Cut off by cancel(), which already reset the pending count
+                    now = time.time()
+                    self.cancel_latency = now - self._cancelled_at
+                    tracer.record("cancel.tts", self._cancelled_at, now)
+                    continue
+                self._pending -= 1
+                self._idle.notify_all()
+
+def make_speaker(backend=TTS_BACKEND, output=TTS_OUTPUT, cache_dir=TTS_CACHE_DIR):
+    """Speaker from the config; a backend or output that can't run falls back to null"""
+    try:
+        synth, namespace = make_backend(backend)
+    except Exception as e:
+        print(f"⚠ TTS backend '{backend}' unavailable ({e}); responses will only be printed")
+        synth, namespace = NullBackend(), None
+    try:
+        sink = OUTPUTS[output]()
+    except Exception as e:
+        print(f"⚠ Audio output '{output}' unavailable ({e}); speech will not be played")
+        sink = NullOutput()
+    cache = AudioCache(cache_dir, namespace) if cache_dir and namespace else None
+    speaker = Speaker(synth, sink, cache)
+    speaker.prefetch()
+    return speaker
@@ -3,6 +3,7 @@
 
 echo "🚀 Starting MedGemma-TCCC Server..."
 
+# python -m medevac.supervisor runs the same server with per-host tuned settings (--autotune) and restarts it on a crash.
 # Adjust the model path base on where you downloaded it from hf. After testing different configurations, this produced the most speed and stability
 
 /Users/fiercecoyote/llama.cpp/build/bin/llama-server \